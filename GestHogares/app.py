@@ -1,13 +1,25 @@
-import datetime
-from fastapi import FastAPI, Depends, HTTPException, status
+from datetime import date, datetime
+from types import SimpleNamespace
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 import models, db_config
+import chat
+from comun import asincrono, condicional, exportar, metricas, paginacion, perfilador, serializacion, totales
+from comun.actividad import Registro
+from comun.actualizacion import actualizar_parcial
+from presencia import presencia
 from models import (
     HogarDB, MiembroHogarDB,  # Modelos SQLAlchemy
-    HogarCreate, HogarResponse,  # Esquemas Pydantic
+    HogarCreate, HogarResponse, HogarUpdate,  # Esquemas Pydantic
     MiembroHogarBase, MiembroHogarResponse,
-    InvitacionRequest, RolMiembro
+    InvitacionRequest, RolMiembro,
+    PaginaActividad, ResumenActividadResponse,
+    MensajeCreate, MensajeResponse, PaginaMensajes,
+    PresenciaResponse
 )
 from uuid import uuid4
 import secrets
@@ -17,15 +29,24 @@ app = FastAPI(
     description="Microservicio para administración de hogares compartidos",
     version="1.0.0"
 )
+# Con DB_MODO=async los endpoints se registran como async def (ver comun/asincrono.py)
+app.router.route_class = asincrono.ruta(db_config)
+# Métricas por ruta y GET /metrics (ver comun/metricas.py)
+metricas.instalar(app)
+# Perfil SQL por petición y avisos de N+1 (ver comun/perfilador.py)
+perfilador.instalar(app)
 
 # Crear tablas (solo desarrollo)
 models.Base.metadata.create_all(bind=db_config.engine)
 
+# Registro de actividad del hogar sobre las tablas de este servicio (ver comun/actividad.py)
+actividad = Registro(models.ActividadDB, models.ResumenActividadDB)
+
 # --- Funciones auxiliares ---
 def obtener_usuario_por_email(db: Session, email: str):
     """Función simulada - deberías integrar con tu servicio de usuarios"""
     # Esto es un mock - en producción usa tu servicio real de usuarios
-    usuario_mock = models.UsuarioDB(
+    usuario_mock = SimpleNamespace(
         id=str(uuid4()),
         nombre="Usuario Mock",
         correo=email,
@@ -78,22 +99,109 @@ def crear_hogar(
         rol='propietario'
     )
     db.add(miembro_db)
+    actividad.registrar(db, hogar_db.id, "hogar_creado", hogar_db.id, usuario_id, hogar_db.nombre)
     db.commit()
     
     return hogar_db
 
 @app.get("/hogares/", response_model=List[HogarResponse])
-def listar_hogares(db: Session = Depends(db_config.get_db)):
-    return db.query(HogarDB).all()
+def listar_hogares(
+    request: Request,
+    response: Response,
+    limite: int = Query(paginacion.LIMITE_POR_DEFECTO, ge=1, le=paginacion.LIMITE_MAXIMO),
+    cursor: Optional[str] = None,  # X-Siguiente-Cursor de la página anterior
+    total: bool = False,           # Añadir X-Total-Count
+    formato: Optional[str] = Query(None, pattern=exportar.PATRON_FORMATO),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(db_config.get_db)
+):
+    # Solo las columnas de la respuesta, como filas simples (ver comun/serializacion.py),
+    # más la versión para el ETag
+    fuentes = [(
+        select(*serializacion.columnas(HogarDB, HogarResponse), HogarDB.version),
+        HogarDB.fecha_creacion, HogarDB.id
+    )]
+    # Exportación en streaming (json, ndjson o csv): todas las filas, sin paginar
+    formato = exportar.formato_pedido(formato, accept)
+    if formato:
+        return exportar.respuesta(db_config.SessionLocal, [paginacion.ordenar(fuentes[0])], HogarResponse, formato, "hogares")
+    if total:
+        # Total global sin filtro: estimación del optimizador
+        totales.anunciar(response, totales.estimado(db, HogarDB))
+    if if_none_match:
+        # Primero solo ids y versiones: si el cliente ya tiene la página, 304 sin leer el resto
+        estrecha = paginacion.paginar(db, condicional.estrechar(fuentes), cursor, limite)
+        no_modificado = condicional.comprobar(response, if_none_match, condicional.de_pagina(request, response, estrecha))
+        if no_modificado:
+            return no_modificado
+    pagina = paginacion.paginar(db, fuentes, cursor, limite)
+    condicional.anunciar(response, condicional.de_pagina(request, response, pagina))
+    return serializacion.listado(response, HogarResponse, paginacion.anunciar(request, response, pagina))
 
 @app.get("/hogares/{hogar_id}", response_model=HogarResponse)
-def obtener_hogar(hogar_id: str, db: Session = Depends(db_config.get_db)):
+def obtener_hogar(
+    hogar_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(db_config.get_db)
+):
+    if if_none_match:
+        # Solo la versión: si el cliente ya tiene el hogar, 304 sin leerlo
+        version = db.execute(select(HogarDB.version).where(HogarDB.id == hogar_id)).scalar()
+        if version is not None:
+            no_modificado = condicional.comprobar(response, if_none_match, condicional.etag(hogar_id, version))
+            if no_modificado:
+                return no_modificado
     hogar = db.query(HogarDB).filter(HogarDB.id == hogar_id).first()
     if not hogar:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Hogar no encontrado"
         )
+    condicional.anunciar(response, condicional.etag(hogar.id, hogar.version))
+    return hogar
+
+@app.patch("/hogares/{hogar_id}", response_model=HogarResponse)
+def actualizar_hogar(
+    hogar_id: str,
+    cambios: HogarUpdate,
+    usuario_actual_id: str = "usuario-temporal-id",  # En producción, obtener del token JWT
+    db: Session = Depends(db_config.get_db)
+):
+    valores = {
+        campo: valor for campo, valor in cambios.model_dump(exclude_unset=True).items()
+        if valor is not None
+    }
+    # El permiso de administrador va en el propio UPDATE para no consultarlo antes
+    es_admin = select(MiembroHogarDB.id).where(
+        MiembroHogarDB.hogar_id == hogar_id,
+        MiembroHogarDB.usuario_id == usuario_actual_id,
+        MiembroHogarDB.rol.in_(['administrador', 'propietario'])
+    ).exists()
+
+    try:
+        hogar = actualizar_parcial(db, HogarDB, hogar_id, valores, [es_admin])
+        if hogar and valores:
+            actividad.registrar(db, hogar_id, "hogar_actualizado", hogar_id, usuario_actual_id, hogar.nombre)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Ya existe un hogar con este nombre"
+        )
+    if not hogar:
+        # Solo en el caso de error se distingue entre hogar inexistente y falta de permisos
+        if db.query(HogarDB.id).filter(HogarDB.id == hogar_id).first() is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Hogar no encontrado"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tiene permisos de administrador"
+        )
     return hogar
 
 # --- Endpoints de Miembros ---
@@ -131,11 +239,15 @@ def invitar_miembro(
     
     # Crear la membresía
     miembro_db = MiembroHogarDB(
+        id=str(uuid4()),
         usuario_id=db_usuario.id,
         hogar_id=hogar_id,
         rol=invitacion.rol
     )
     db.add(miembro_db)
+    actividad.registrar(
+        db, hogar_id, "miembro_invitado", miembro_db.id, db_usuario.id, invitacion.email_invitado
+    )
     db.commit()
     db.refresh(miembro_db)
     
@@ -144,12 +256,36 @@ def invitar_miembro(
 @app.get("/hogares/{hogar_id}/miembros", response_model=List[MiembroHogarResponse])
 def listar_miembros(
     hogar_id: str,
+    request: Request,
+    response: Response,
+    limite: int = Query(paginacion.LIMITE_POR_DEFECTO, ge=1, le=paginacion.LIMITE_MAXIMO),
+    cursor: Optional[str] = None,  # X-Siguiente-Cursor de la página anterior
+    total: bool = False,           # Añadir X-Total-Count
+    formato: Optional[str] = Query(None, pattern=exportar.PATRON_FORMATO),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(db_config.get_db)
 ):
-    miembros = db.query(MiembroHogarDB).filter(
-        MiembroHogarDB.hogar_id == hogar_id
-    ).all()
-    return miembros
+    # Las filas de miembros no cambian: el ETag de la página sale de sus ids
+    fuentes = [(
+        select(*serializacion.columnas(MiembroHogarDB, MiembroHogarResponse))
+        .where(MiembroHogarDB.hogar_id == hogar_id),
+        MiembroHogarDB.id, MiembroHogarDB.id
+    )]
+    formato = exportar.formato_pedido(formato, accept)
+    if formato:
+        return exportar.respuesta(db_config.SessionLocal, [paginacion.ordenar(fuentes[0])], MiembroHogarResponse, formato, "miembros")
+    if total:
+        totales.anunciar(response, totales.exacto(db, [fuentes[0][0]]))
+    if if_none_match:
+        # Primero solo ids y versiones: si el cliente ya tiene la página, 304 sin leer el resto
+        estrecha = paginacion.paginar(db, condicional.estrechar(fuentes), cursor, limite)
+        no_modificado = condicional.comprobar(response, if_none_match, condicional.de_pagina(request, response, estrecha))
+        if no_modificado:
+            return no_modificado
+    pagina = paginacion.paginar(db, fuentes, cursor, limite)
+    condicional.anunciar(response, condicional.de_pagina(request, response, pagina))
+    return serializacion.listado(response, MiembroHogarResponse, paginacion.anunciar(request, response, pagina))
 
 @app.delete("/hogares/{hogar_id}", status_code=status.HTTP_204_NO_CONTENT)
 def eliminar_hogar(
@@ -172,9 +308,108 @@ def eliminar_hogar(
     db.query(MiembroHogarDB).filter(
         MiembroHogarDB.hogar_id == hogar_id
     ).delete()
+    db.query(models.ActividadDB).filter(
+        models.ActividadDB.hogar_id == hogar_id
+    ).delete()
+    db.query(models.ResumenActividadDB).filter(
+        models.ResumenActividadDB.hogar_id == hogar_id
+    ).delete()
     
     # Eliminar el hogar
     db.delete(db_hogar)
     db.commit()
     
-    return None
\ No newline at end of file
+    return None
+
+# --- Endpoints de Actividad ---
+@app.get("/hogares/{hogar_id}/actividad", response_model=PaginaActividad)
+def listar_actividad(
+    hogar_id: str,
+    cursor: Optional[int] = None,  # id del último evento recibido
+    limite: int = Query(50, ge=1, le=200),
+    db: Session = Depends(db_config.get_db)
+):
+    eventos = actividad.listar(db, hogar_id, cursor, limite)
+    siguiente = eventos[-1].id if len(eventos) == limite else None
+    return {"eventos": eventos, "siguiente_cursor": siguiente}
+
+@app.get("/hogares/{hogar_id}/actividad/resumen", response_model=List[ResumenActividadResponse])
+def resumen_actividad(
+    hogar_id: str,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    db: Session = Depends(db_config.get_db)
+):
+    return actividad.listar_resumen(db, hogar_id, desde, hasta)
+
+# --- Endpoints de Chat ---
+@app.get("/hogares/{hogar_id}/chat/mensajes", response_model=PaginaMensajes)
+def listar_mensajes(
+    hogar_id: str,
+    cursor: Optional[str] = None,
+    limite: int = Query(50, ge=1, le=200),
+    db: Session = Depends(db_config.get_db)
+):
+    try:
+        mensajes, siguiente = chat.listar_mensajes(db, hogar_id, cursor, limite)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor no válido"
+        )
+    return {"mensajes": mensajes, "siguiente_cursor": siguiente}
+
+@app.post("/hogares/{hogar_id}/chat/mensajes", response_model=MensajeResponse, status_code=status.HTTP_201_CREATED)
+async def enviar_mensaje(
+    hogar_id: str,
+    mensaje: MensajeCreate,
+    usuario_id: str = "usuario-temporal-id"  # En producción, obtener del token JWT
+):
+    guardado = await run_in_threadpool(chat.guardar_mensaje, hogar_id, usuario_id, mensaje.contenido)
+    chat.hub.difundir(hogar_id, guardado)
+    return guardado
+
+@app.websocket("/hogares/{hogar_id}/chat")
+async def chat_hogar(
+    websocket: WebSocket,
+    hogar_id: str,
+    usuario_id: str = "usuario-temporal-id"  # En producción, obtener del token JWT
+):
+    await websocket.accept()
+    conexion = chat.hub.conectar(hogar_id, websocket)
+    await presencia.latido(hogar_id, usuario_id)
+    try:
+        while True:
+            contenido = (await websocket.receive_text()).strip()
+            # Cualquier trama del cliente (incluidas las vacías) cuenta como latido
+            await presencia.latido(hogar_id, usuario_id)
+            if not contenido:
+                continue
+            # Solo se ocupa un hilo (y una conexión a la BD) mientras se guarda el mensaje
+            guardado = await run_in_threadpool(chat.guardar_mensaje, hogar_id, usuario_id, contenido)
+            chat.hub.difundir(hogar_id, guardado)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        chat.hub.desconectar(hogar_id, conexion)
+
+# --- Endpoints de Presencia (solo memoria, sin base de datos) ---
+@app.post("/hogares/{hogar_id}/presencia/latido", status_code=status.HTTP_204_NO_CONTENT)
+async def registrar_latido(
+    hogar_id: str,
+    usuario_id: str = "usuario-temporal-id"  # En producción, obtener del token JWT
+):
+    await presencia.latido(hogar_id, usuario_id)
+    return None
+
+@app.get("/hogares/{hogar_id}/presencia", response_model=PresenciaResponse)
+async def obtener_presencia(hogar_id: str):
+    usuarios = await presencia.en_linea(hogar_id)
+    return {
+        "hogar_id": hogar_id,
+        "ttl_segundos": presencia.ttl,
+        "en_linea": [
+            {"usuario_id": usuario_id, "ultimo_latido": datetime.fromtimestamp(instante)}
+            for usuario_id, instante in sorted(usuarios.items())
+        ]
+    }
\ No newline at end of file
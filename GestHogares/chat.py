@@ -0,0 +1,143 @@
+"""Chat de hogar: mensajes persistidos y difusión por WebSocket.
+
+Cada conexión tiene una cola acotada y una tarea asyncio que le envía los
+mensajes; no hay un hilo ni una conexión a la base de datos por socket.
+Cada mensaje se serializa una vez y se encola en todas las conexiones del
+hogar. Si la cola de un cliente lento se llena, se cierra su conexión en
+lugar de retener memoria o frenar al resto.
+"""
+import asyncio
+import base64
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from fastapi import WebSocket, status
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+
+import db_config
+from models import MensajeDB, MensajeResponse
+
+logger = logging.getLogger(__name__)
+
+MAX_LONGITUD_MENSAJE = 1000
+MAX_PENDIENTES_POR_CONEXION = 100
+
+# --- Persistencia ---
+def guardar_mensaje(hogar_id: str, usuario_id: str, contenido: str) -> MensajeResponse:
+    """Inserta el mensaje con una sesión de vida corta (se llama desde el threadpool)."""
+    db = db_config.SessionLocal()
+    try:
+        mensaje = MensajeDB(
+            hogar_id=hogar_id,
+            usuario_id=usuario_id,
+            contenido=contenido[:MAX_LONGITUD_MENSAJE],
+            fecha_creacion=datetime.now().replace(microsecond=0)
+        )
+        db.add(mensaje)
+        db.flush()
+        respuesta = MensajeResponse.model_validate(mensaje)
+        db.commit()
+        return respuesta
+    finally:
+        db.close()
+
+def codificar_cursor(mensaje: MensajeDB) -> str:
+    valor = f"{mensaje.fecha_creacion.isoformat()}|{mensaje.id}"
+    return base64.urlsafe_b64encode(valor.encode()).decode()
+
+def decodificar_cursor(cursor: str) -> Tuple[datetime, int]:
+    fecha, id_ = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    return datetime.fromisoformat(fecha), int(id_)
+
+def listar_mensajes(
+    db: Session,
+    hogar_id: str,
+    cursor: Optional[str] = None,
+    limite: int = 50
+) -> Tuple[List[MensajeDB], Optional[str]]:
+    """Mensajes del más reciente al más antiguo usando paginación por clave (fecha_creacion, id)."""
+    consulta = select(MensajeDB).where(MensajeDB.hogar_id == hogar_id)
+    if cursor:
+        fecha, id_ = decodificar_cursor(cursor)
+        consulta = consulta.where(or_(
+            MensajeDB.fecha_creacion < fecha,
+            and_(MensajeDB.fecha_creacion == fecha, MensajeDB.id < id_)
+        ))
+    consulta = consulta.order_by(
+        MensajeDB.fecha_creacion.desc(), MensajeDB.id.desc()
+    ).limit(limite)
+    mensajes = db.execute(consulta).scalars().all()
+    siguiente = codificar_cursor(mensajes[-1]) if len(mensajes) == limite else None
+    return mensajes, siguiente
+
+# --- Difusión en proceso ---
+class Conexion:
+    def __init__(self, websocket: WebSocket, max_pendientes: int = MAX_PENDIENTES_POR_CONEXION):
+        self.websocket = websocket
+        self.pendientes: "asyncio.Queue[str]" = asyncio.Queue(maxsize=max_pendientes)
+        self.tarea = asyncio.create_task(self._enviar())
+
+    async def _enviar(self) -> None:
+        try:
+            while True:
+                texto = await self.pendientes.get()
+                await self.websocket.send_text(texto)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # El socket ya está cerrado; la limpieza la hace el endpoint
+            pass
+
+    def encolar(self, texto: str) -> bool:
+        try:
+            self.pendientes.put_nowait(texto)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def cerrar(self, codigo: int = status.WS_1000_NORMAL_CLOSURE) -> None:
+        self.tarea.cancel()
+        asyncio.create_task(self._cerrar(codigo))
+
+    async def _cerrar(self, codigo: int) -> None:
+        try:
+            await self.websocket.close(code=codigo)
+        except Exception:
+            pass
+
+class HubChat:
+    def __init__(self):
+        self.salas: Dict[str, Set[Conexion]] = {}
+
+    def conectar(self, hogar_id: str, websocket: WebSocket) -> Conexion:
+        conexion = Conexion(websocket)
+        self.salas.setdefault(hogar_id, set()).add(conexion)
+        return conexion
+
+    def desconectar(self, hogar_id: str, conexion: Conexion) -> None:
+        sala = self.salas.get(hogar_id)
+        if sala is not None:
+            sala.discard(conexion)
+            if not sala:
+                del self.salas[hogar_id]
+        conexion.tarea.cancel()
+
+    def difundir(self, hogar_id: str, mensaje: MensajeResponse) -> int:
+        """Envía el mensaje a todas las conexiones del hogar. Devuelve a cuántas llegó."""
+        texto = mensaje.model_dump_json()  # Se serializa una sola vez
+        entregados = 0
+        for conexion in list(self.salas.get(hogar_id, ())):
+            if conexion.encolar(texto):
+                entregados += 1
+            else:
+                logger.warning("Cliente lento en el hogar %s: se cierra la conexión", hogar_id)
+                self.desconectar(hogar_id, conexion)
+                conexion.cerrar(status.WS_1013_TRY_AGAIN_LATER)
+        return entregados
+
+    def conexiones(self, hogar_id: str) -> int:
+        return len(self.salas.get(hogar_id, ()))
+
+hub = HubChat()
@@ -1,10 +1,13 @@
-from sqlalchemy import Column, String, TIMESTAMP, ForeignKey
-from sqlalchemy.sql import func
+from sqlalchemy import Column, String, Text, TIMESTAMP, ForeignKey, Index, BigInteger, Integer
+from sqlalchemy.sql import func, literal_column
 from uuid import uuid4
 from db_config import Base
+from comun.actividad import (  # Columnas y esquemas de la actividad, comunes a los servicios
+    ColumnasActividad, ColumnasResumen, ActividadResponse, PaginaActividad, ResumenActividadResponse
+)
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from enum import Enum
 
 # --- Modelos de SQLAlchemy ---
@@ -14,7 +17,13 @@ class HogarDB(Base):
     id = Column(String(36), primary_key=True, default=lambda: str(uuid4()))
     nombre = Column(String(100), unique=True, nullable=False)
     fecha_creacion = Column(TIMESTAMP, server_default=func.now())
-    propietario_id = Column(String(5))  
+    propietario_id = Column(String(36))
+    version = Column(Integer, nullable=False, default=1, server_default="1", onupdate=literal_column("version") + 1)  # Sube con cada UPDATE (ETag, ver comun/condicional.py)
+
+    __table_args__ = (
+        # Listado por páginas en orden de creación
+        Index("ix_hogar_fecha_creacion", "fecha_creacion", "id"),
+    )
 
 
 class MiembroHogarDB(Base):
@@ -25,6 +34,35 @@ class MiembroHogarDB(Base):
     hogar_id = Column(String(36), ForeignKey('Hogar.id'), nullable=False)  
     rol = Column(String(50), default='miembro')
 
+    __table_args__ = (
+        # Miembros de un hogar por páginas
+        Index("ix_miembro_hogar", "hogar_id", "id"),
+        # Hogares de un usuario y comprobación de pertenencia/permisos
+        Index("ix_miembro_usuario", "usuario_id", "hogar_id"),
+    )
+
+# Actividad del hogar (solo inserción) y su compactación por día
+class ActividadDB(ColumnasActividad, Base):
+    __tablename__ = "Actividad"
+
+class ResumenActividadDB(ColumnasResumen, Base):
+    __tablename__ = "ResumenActividad"
+
+# Mensajes del chat del hogar (solo inserción)
+class MensajeDB(Base):
+    __tablename__ = "Mensaje"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    hogar_id = Column(String(36), nullable=False)
+    usuario_id = Column(String(36), nullable=False)
+    contenido = Column(Text, nullable=False)
+    fecha_creacion = Column(TIMESTAMP, server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        # Historial por páginas: (hogar_id, fecha_creacion, id)
+        Index("ix_mensaje_hogar_fecha", "hogar_id", "fecha_creacion", "id"),
+    )
+
 # --- Esquemas Pydantic ---
 class RolMiembro(str, Enum):
     miembro = "miembro"
@@ -37,13 +75,16 @@ class HogarBase(BaseModel):
 class HogarCreate(HogarBase):
     pass
 
+class HogarUpdate(BaseModel):
+    nombre: Optional[str] = None
+
 class HogarResponse(HogarBase):
     id: str
     fecha_creacion: datetime
     propietario_id: str
 
     class Config:
-        orm_mode = True
+        from_attributes = True
 
 class MiembroHogarBase(BaseModel):
     usuario_id: str
@@ -54,7 +95,33 @@ class MiembroHogarResponse(MiembroHogarBase):
     id: str
 
     class Config:
-        orm_mode = True
+        from_attributes = True
+
+class MensajeCreate(BaseModel):
+    contenido: str
+
+class MensajeResponse(BaseModel):
+    id: int
+    hogar_id: str
+    usuario_id: str
+    contenido: str
+    fecha_creacion: datetime
+
+    class Config:
+        from_attributes = True
+
+class PaginaMensajes(BaseModel):
+    mensajes: List[MensajeResponse]
+    siguiente_cursor: Optional[str] = None
+
+class UsuarioEnLinea(BaseModel):
+    usuario_id: str
+    ultimo_latido: datetime
+
+class PresenciaResponse(BaseModel):
+    hogar_id: str
+    ttl_segundos: float
+    en_linea: List[UsuarioEnLinea]
 
 class InvitacionRequest(BaseModel):
     email_invitado: EmailStr
@@ -0,0 +1,158 @@
+"""Presencia de los miembros de un hogar (quién está en línea).
+
+Los latidos se guardan en memoria en una rueda temporal: registrar un
+latido es O(1) y las entradas caducan solas al pasar `ttl` segundos sin
+renovarse. Nunca se consulta MySQL.
+
+Con varios workers, cada uno publica sus latidos en un backend compartido
+(PRESENCIA_BACKEND=redis, con PRESENCIA_REDIS_URL) y las lecturas combinan
+la rueda local con ese backend. Por defecto se usa un backend en memoria
+que solo ve el propio proceso. El backend de Redis necesita el paquete
+`redis` (en requirements.txt).
+
+Los endpoints que registran latidos y leen la presencia son async, así que
+el backend también lo es (redis.asyncio): una llamada a Redis cede el bucle
+de eventos en lugar de bloquearlo.
+"""
+import math
+import os
+from abc import ABC, abstractmethod
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+Clave = Tuple[str, str]  # (hogar_id, usuario_id)
+
+class RuedaTemporal:
+    def __init__(self, ttl: float = 30.0, resolucion: float = 1.0, reloj: Callable[[], float] = time.time):
+        self.ttl = ttl
+        self.resolucion = resolucion
+        self.reloj = reloj
+        self._ttl_ticks = max(1, math.ceil(ttl / resolucion))
+        self._ranuras: List[Set[Clave]] = [set() for _ in range(self._ttl_ticks + 2)]
+        # hogar_id -> usuario_id -> (tick en que caduca, instante del último latido)
+        self._hogares: Dict[str, Dict[str, Tuple[int, float]]] = {}
+        self._tick = self._tick_actual()
+        self._lock = threading.Lock()
+
+    def _tick_actual(self) -> int:
+        return int(self.reloj() / self.resolucion)
+
+    def _avanzar(self) -> None:
+        ahora = self._tick_actual()
+        if ahora - self._tick > len(self._ranuras):
+            # Ha pasado más de una vuelta completa: todo ha caducado
+            for ranura in self._ranuras:
+                ranura.clear()
+            self._hogares.clear()
+            self._tick = ahora
+            return
+        while self._tick < ahora:
+            self._tick += 1
+            ranura = self._ranuras[self._tick % len(self._ranuras)]
+            for hogar_id, usuario_id in ranura:
+                usuarios = self._hogares.get(hogar_id)
+                # Solo se borra si no se renovó después de encolarse en esta ranura
+                if usuarios and usuarios.get(usuario_id, (None,))[0] == self._tick:
+                    del usuarios[usuario_id]
+                    if not usuarios:
+                        del self._hogares[hogar_id]
+            ranura.clear()
+
+    def latido(self, hogar_id: str, usuario_id: str, instante: Optional[float] = None) -> None:
+        with self._lock:
+            self._avanzar()
+            # +1 para que nadie caduque antes de `ttl` (vive entre ttl y ttl + resolucion)
+            caduca = self._tick + self._ttl_ticks + 1
+            self._hogares.setdefault(hogar_id, {})[usuario_id] = (caduca, instante or self.reloj())
+            self._ranuras[caduca % len(self._ranuras)].add((hogar_id, usuario_id))
+
+    def presentes(self, hogar_id: str) -> Dict[str, float]:
+        """usuario_id -> instante (epoch) del último latido."""
+        with self._lock:
+            self._avanzar()
+            return {
+                usuario_id: instante
+                for usuario_id, (_, instante) in self._hogares.get(hogar_id, {}).items()
+            }
+
+# --- Backends compartidos entre workers ---
+class BackendPresencia(ABC):
+    """Interfaz para sincronizar la presencia entre procesos."""
+
+    @abstractmethod
+    async def publicar(self, hogar_id: str, usuario_id: str, instante: float) -> None:
+        ...
+
+    @abstractmethod
+    async def leer(self, hogar_id: str) -> Dict[str, float]:
+        ...
+
+class BackendMemoria(BackendPresencia):
+    """Sustituto local: no comparte nada; la rueda del propio proceso ya tiene sus latidos."""
+
+    async def publicar(self, hogar_id: str, usuario_id: str, instante: float) -> None:
+        pass
+
+    async def leer(self, hogar_id: str) -> Dict[str, float]:
+        return {}
+
+class BackendRedis(BackendPresencia):
+    """Un sorted set por hogar (miembro = usuario, puntuación = instante del latido)."""
+
+    def __init__(self, url: str, ttl: float):
+        try:
+            from redis import asyncio as redis
+        except ImportError as e:
+            raise ImportError(
+                "PRESENCIA_BACKEND=redis necesita el paquete 'redis' (pip install redis)"
+            ) from e
+
+        self.cliente = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def _clave(self, hogar_id: str) -> str:
+        return f"presencia:{hogar_id}"
+
+    async def publicar(self, hogar_id: str, usuario_id: str, instante: float) -> None:
+        clave = self._clave(hogar_id)
+        async with self.cliente.pipeline(transaction=False) as pipe:
+            pipe.zadd(clave, {usuario_id: instante})
+            pipe.zremrangebyscore(clave, "-inf", instante - self.ttl)
+            pipe.expire(clave, int(self.ttl) + 1)
+            await pipe.execute()
+
+    async def leer(self, hogar_id: str) -> Dict[str, float]:
+        desde = time.time() - self.ttl
+        return {
+            usuario.decode(): instante
+            for usuario, instante in await self.cliente.zrangebyscore(
+                self._clave(hogar_id), desde, "+inf", withscores=True
+            )
+        }
+
+class Presencia:
+    def __init__(self, ttl: float = 30.0, backend: Optional[BackendPresencia] = None):
+        self.ttl = ttl
+        self.rueda = RuedaTemporal(ttl)
+        self.backend = backend or BackendMemoria()
+
+    async def latido(self, hogar_id: str, usuario_id: str) -> None:
+        instante = time.time()
+        self.rueda.latido(hogar_id, usuario_id, instante)
+        await self.backend.publicar(hogar_id, usuario_id, instante)
+
+    async def en_linea(self, hogar_id: str) -> Dict[str, float]:
+        usuarios = await self.backend.leer(hogar_id)
+        for usuario_id, instante in self.rueda.presentes(hogar_id).items():
+            usuarios[usuario_id] = max(instante, usuarios.get(usuario_id, 0.0))
+        return usuarios
+
+def crear_presencia() -> Presencia:
+    ttl = float(os.getenv("PRESENCIA_TTL", "30"))
+    if os.getenv("PRESENCIA_BACKEND", "memoria") == "redis":
+        url = os.getenv("PRESENCIA_REDIS_URL", "redis://localhost:6379/0")
+        return Presencia(ttl, BackendRedis(url, ttl))
+    return Presencia(ttl)
+
+presencia = crear_presencia()
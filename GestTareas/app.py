@@ -1,59 +1,232 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, BackgroundTasks, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from typing import List
-from datetime import datetime
+from typing import List, Optional
+from datetime import date, datetime
+from uuid import uuid4
 import models
 import db_config
+import archivo
+import calendario
+import conteos
+import estadisticas
+import orden
+import subtareas
+from comun import asincrono, condicional, exportar, metricas, paginacion, perfilador, serializacion, totales
+from comun.actividad import Registro
+from comun.actualizacion import actualizar_parcial
+from ingesta import PERSISTIDA, ColaLlena, escritor
 from models import (
     TareaDB, AsignacionDB,
-    TareaCreate, TareaResponse,
-    AsignacionBase, AsignacionResponse
+    TareaCreate, TareaResponse, TareaUpdate, TareaArbolResponse, MovimientoTarea,
+    AsignacionBase, AsignacionResponse,
+    ConteoTareasResponse, EstadisticaSemanalResponse, PaginaActividad, ResumenActividadResponse
 )
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    escritor.iniciar()
+    yield
+    # Vaciar la cola de ingesta asíncrona antes de salir, sin bloquear el bucle de eventos
+    await run_in_threadpool(escritor.detener)
+
 app = FastAPI(
     title="API de Gestión de Tareas",
     description="Microservicio para administración de tareas en hogares compartidos",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
+# Con DB_MODO=async los endpoints se registran como async def (ver comun/asincrono.py)
+app.router.route_class = asincrono.ruta(db_config)
+# Métricas por ruta y GET /metrics (ver comun/metricas.py)
+metricas.instalar(app)
+# Perfil SQL por petición y avisos de N+1 (ver comun/perfilador.py)
+perfilador.instalar(app)
 
 # Crear tablas (solo desarrollo)
 models.Base.metadata.create_all(bind=db_config.engine)
 
+# Registro de actividad del hogar sobre las tablas de este servicio (ver comun/actividad.py)
+actividad = Registro(models.ActividadDB, models.ResumenActividadDB)
+
+# Las tareas ingeridas por lotes reciben su clave de orden, su fila de cierre,
+# sus contadores y registran su actividad en la misma transacción
+escritor.al_preparar.append(orden.asignar_rangos)
+escritor.al_volcar.append(lambda db, filas: subtareas.registrar_raices(db, [fila["id"] for fila in filas]))
+escritor.al_volcar.append(lambda db, filas: conteos.aplicar(db, (
+    conteos.estado(fila["hogar_id"], fila["fecha_limite"], False) for fila in filas
+)))
+escritor.al_volcar.append(lambda db, filas: actividad.registrar_varios(db, (
+    {
+        "hogar_id": fila["hogar_id"],
+        "tipo": "tarea_creada",
+        "entidad_id": fila["id"],
+        "usuario_id": fila["creador_id"],
+        "detalle": fila["titulo"][:255]
+    }
+    for fila in filas
+)))
+
+# --- Funciones auxiliares ---
+def valores_tarea(cambios: TareaUpdate) -> dict:
+    # Solo los campos enviados; descripcion y fecha_limite se pueden vaciar con null
+    valores = {
+        campo: valor for campo, valor in cambios.model_dump(exclude_unset=True).items()
+        if valor is not None or campo in ("descripcion", "fecha_limite")
+    }
+    if "completada" in valores:
+        valores["fecha_completada"] = datetime.now() if valores["completada"] else None
+    return valores
+
 # --- Endpoints de Tareas ---
 @app.post("/tareas/", response_model=TareaResponse, status_code=status.HTTP_201_CREATED)
 def crear_tarea(
     tarea: TareaCreate,
     creador_id: str = "usuario-temporal-id",  # En producción, obtener del token JWT
+    en_cola: bool = Query(False, alias="async"),
     db: Session = Depends(db_config.get_db)
 ):
     # Verificar que el hogar existe (deberías tener esta verificación)
     
+    if en_cola:
+        if tarea.padre_id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Las subtareas no se pueden crear en modo asíncrono"
+            )
+        # Se encola para el escritor por lotes; el estado se consulta en /ingesta/tareas/{id}
+        tarea_id = str(uuid4())
+        try:
+            escritor.encolar({
+                "id": tarea_id,
+                "titulo": tarea.titulo,
+                "descripcion": tarea.descripcion,
+                "fecha_limite": tarea.fecha_limite,
+                "hogar_id": tarea.hogar_id,
+                "creador_id": creador_id,
+                "completada": False
+            })
+        except ColaLlena:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="La cola de ingesta está llena; reintente más tarde",
+                headers={"Retry-After": "1"}
+            )
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={"id": tarea_id, "estado": escritor.estado(tarea_id)}
+        )
+
+    if tarea.padre_id:
+        padre = db.query(TareaDB.hogar_id).filter(TareaDB.id == tarea.padre_id).first()
+        if not padre:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Tarea padre no encontrada"
+            )
+        if padre.hogar_id != tarea.hogar_id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="La subtarea debe pertenecer al mismo hogar que su tarea padre"
+            )
+
     tarea_db = TareaDB(
+        id=str(uuid4()),
         titulo=tarea.titulo,
         descripcion=tarea.descripcion,
         fecha_limite=tarea.fecha_limite,
         hogar_id=tarea.hogar_id,
-        creador_id=creador_id
+        creador_id=creador_id,
+        padre_id=tarea.padre_id,
+        rango=orden.siguiente_clave(db, tarea.hogar_id)  # Al final de la lista
     )
     
     db.add(tarea_db)
+    db.flush()
+    subtareas.registrar(db, tarea_db.id, tarea.padre_id)
+    conteos.aplicar(db, [conteos.estado(tarea.hogar_id, tarea.fecha_limite, False)])
+    actividad.registrar(db, tarea.hogar_id, "tarea_creada", tarea_db.id, creador_id, tarea.titulo)
     db.commit()
     db.refresh(tarea_db)
     
     return tarea_db
 
 @app.get("/tareas/", response_model=List[TareaResponse])
-def listar_tareas(hogar_id: str, db: Session = Depends(db_config.get_db)):
-    return db.query(TareaDB).filter(TareaDB.hogar_id == hogar_id).all()
+def listar_tareas(
+    hogar_id: str,
+    request: Request,
+    response: Response,
+    incluir_historial: bool = False,  # Incluir tareas archivadas
+    orden_manual: bool = False,       # Ordenar por la posición que eligió el usuario
+    incluir_descripcion: bool = False,  # La descripción (texto largo) solo si se pide
+    limite: int = Query(paginacion.LIMITE_POR_DEFECTO, ge=1, le=paginacion.LIMITE_MAXIMO),
+    cursor: Optional[str] = None,  # X-Siguiente-Cursor de la página anterior
+    total: bool = False,           # Añadir X-Total-Count
+    formato: Optional[str] = Query(None, pattern=exportar.PATRON_FORMATO),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(db_config.get_db)
+):
+    # Exportación en streaming (json, ndjson o csv): todas las filas y columnas, sin paginar
+    formato = exportar.formato_pedido(formato, accept)
+    excluir = () if incluir_descripcion or formato else ("descripcion",)
+    fuentes = archivo.fuentes_tareas(hogar_id, incluir_historial, orden_manual, excluir)
+    if formato:
+        return exportar.respuesta(
+            db_config.SessionLocal, [paginacion.ordenar(fuente) for fuente in fuentes], TareaResponse, formato, "tareas"
+        )
+    # La versión del hogar (ver conteos.py) sube con cualquier cambio en sus tareas:
+    # con ella y los parámetros basta para el ETag, leída por clave primaria
+    no_modificado = condicional.comprobar(
+        response, if_none_match, condicional.etag(request.url.query, conteos.version(db, hogar_id))
+    )
+    if no_modificado:
+        return no_modificado
+    if total:
+        # Total del hogar según la tabla de contadores, sin recorrer las tareas
+        totales.anunciar(response, (conteos.total(db, hogar_id, incluir_historial), totales.CONTADOR))
+    pagina = paginacion.anunciar(request, response, paginacion.paginar(db, fuentes, cursor, limite))
+    return serializacion.listado(response, TareaResponse, pagina, excluir=excluir)
+
+@app.get("/tareas/conteos", response_model=List[ConteoTareasResponse])
+def conteos_por_hogar(
+    hogar_ids: str = Query(..., description="Ids de hogar separados por comas"),
+    db: Session = Depends(db_config.get_db)
+):
+    # Se sirve de la tabla de contadores, sin recorrer las tareas
+    ids = list(dict.fromkeys(i.strip() for i in hogar_ids.split(",") if i.strip()))
+    if not ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Indica al menos un hogar"
+        )
+    return conteos.obtener(db, ids)
 
 @app.get("/tareas/{tarea_id}", response_model=TareaResponse)
-def obtener_tarea(tarea_id: str, db: Session = Depends(db_config.get_db)):
-    tarea = db.query(TareaDB).filter(TareaDB.id == tarea_id).first()
+def obtener_tarea(
+    tarea_id: str,
+    response: Response,
+    incluir_historial: bool = False,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(db_config.get_db)
+):
+    if if_none_match:
+        # Solo la versión: si el cliente ya tiene la tarea, 304 sin leerla
+        version = archivo.version_tarea(db, tarea_id, incluir_historial)
+        if version is not None:
+            no_modificado = condicional.comprobar(response, if_none_match, condicional.etag(tarea_id, version))
+            if no_modificado:
+                return no_modificado
+    tarea = archivo.obtener_tarea(db, tarea_id, incluir_historial)
     if not tarea:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Tarea no encontrada"
         )
+    condicional.anunciar(response, condicional.etag(tarea.id, tarea.version))
     return tarea
 
 @app.put("/tareas/{tarea_id}/completar", response_model=TareaResponse)
@@ -61,19 +234,189 @@ def marcar_como_completada(
     tarea_id: str,
     db: Session = Depends(db_config.get_db)
 ):
-    tarea = db.query(TareaDB).filter(TareaDB.id == tarea_id).first()
+    return actualizar_tarea(tarea_id, TareaUpdate(completada=True), db)
+
+@app.patch("/tareas/{tarea_id}", response_model=TareaResponse)
+def actualizar_tarea(
+    tarea_id: str,
+    cambios: TareaUpdate,
+    db: Session = Depends(db_config.get_db)
+):
+    valores = valores_tarea(cambios)
+    anterior = None
+    if "fecha_limite" in valores or valores.get("completada") is False:
+        # Hace falta el estado anterior para mover la tarea en los contadores y estadísticas
+        anterior = db.query(
+            TareaDB.fecha_limite, TareaDB.completada, TareaDB.fecha_completada
+        ).filter(TareaDB.id == tarea_id).first()
+    transicion = False
+    tarea = None
+    tipo = "tarea_actualizada"
+    if "completada" in valores:
+        # Solo un cambio real de estado mueve los contadores de los antepasados
+        tarea = actualizar_parcial(
+            db, TareaDB, tarea_id, valores, [TareaDB.completada.is_not(valores["completada"])]
+        )
+        if tarea:
+            transicion = True
+            subtareas.propagar_completada(db, tarea.id, valores["completada"])
+            tipo = "tarea_completada" if valores["completada"] else "tarea_reabierta"
+        else:
+            # Ya estaba en ese estado: se conserva su fecha_completada
+            del valores["completada"], valores["fecha_completada"]
+    if tarea is None:
+        tarea = actualizar_parcial(db, TareaDB, tarea_id, valores)
     if not tarea:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Tarea no encontrada"
         )
-    
-    tarea.completada = True
+
+    if valores:
+        if anterior:
+            completada_antes, fecha_antes = anterior.completada, anterior.fecha_limite
+            finalizacion_antes = (anterior.fecha_limite, anterior.fecha_completada) if anterior.completada else None
+        else:
+            # Sin lectura previa solo puede haber cambiado la completada (de abierta a completada)
+            completada_antes = (not tarea.completada) if transicion else tarea.completada
+            fecha_antes = tarea.fecha_limite
+            finalizacion_antes = None if transicion or not tarea.completada else (
+                tarea.fecha_limite, tarea.fecha_completada
+            )
+        conteos.aplicar(db, [
+            conteos.estado(tarea.hogar_id, fecha_antes, completada_antes, -1),
+            conteos.estado(tarea.hogar_id, tarea.fecha_limite, tarea.completada)
+        ])
+        estadisticas.cambio_tarea(
+            db, tarea.id, tarea.hogar_id, finalizacion_antes,
+            (tarea.fecha_limite, tarea.fecha_completada) if tarea.completada else None
+        )
+        actividad.registrar(db, tarea.hogar_id, tipo, tarea.id, detalle=tarea.titulo)
+        db.commit()
+    return tarea
+
+@app.delete("/tareas/{tarea_id}", status_code=status.HTTP_204_NO_CONTENT)
+def eliminar_tarea(
+    tarea_id: str,
+    db: Session = Depends(db_config.get_db)
+):
+    # Se borra con todas sus subtareas
+    borradas = subtareas.leer_subarbol(db, tarea_id)
+    if not borradas:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Tarea no encontrada"
+        )
+
+    estadisticas.quitar_tareas(db, borradas)
+    subtareas.eliminar_subarbol(db, tarea_id, borradas)
+
+    conteos.aplicar(db, (
+        conteos.estado(fila.hogar_id, fila.fecha_limite, fila.completada, -1) for fila in borradas
+    ))
+    raiz = next(fila for fila in borradas if fila.id == tarea_id)
+    actividad.registrar(db, raiz.hogar_id, "tarea_eliminada", tarea_id, detalle=raiz.titulo)
     db.commit()
-    db.refresh(tarea)
-    
+    return None
+
+@app.get("/tareas/{tarea_id}/subtareas", response_model=TareaArbolResponse)
+def obtener_subarbol(
+    tarea_id: str,
+    db: Session = Depends(db_config.get_db)
+):
+    # Tarea con todas sus subtareas anidadas, leídas con una sola consulta
+    nodo = subtareas.cargar_subarbol(db, tarea_id)
+    if not nodo:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Tarea no encontrada"
+        )
+
+    def convertir(nodo: dict) -> TareaArbolResponse:
+        return TareaArbolResponse(
+            **TareaResponse.model_validate(nodo["tarea"]).model_dump(),
+            subtareas=[convertir(hijo) for hijo in nodo["subtareas"]]
+        )
+    return convertir(nodo)
+
+@app.put("/tareas/{tarea_id}/mover", response_model=TareaResponse)
+def mover_tarea(
+    tarea_id: str,
+    movimiento: MovimientoTarea,
+    tareas_fondo: BackgroundTasks,
+    db: Session = Depends(db_config.get_db)
+):
+    vecinos = [i for i in (movimiento.anterior_id, movimiento.siguiente_id) if i]
+
+    def leer_rangos():
+        return {
+            fila.id: fila for fila in db.execute(
+                select(TareaDB.id, TareaDB.hogar_id, TareaDB.rango)
+                .where(TareaDB.id.in_([tarea_id] + vecinos))
+            )
+        }
+
+    filas = leer_rangos()
+    if tarea_id not in filas:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Tarea no encontrada"
+        )
+    hogar_id = filas[tarea_id].hogar_id
+    if any(v not in filas or filas[v].hogar_id != hogar_id for v in vecinos):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Las tareas vecinas deben existir y pertenecer al mismo hogar"
+        )
+
+    def calcular_clave():
+        anterior = filas[movimiento.anterior_id].rango if movimiento.anterior_id else None
+        siguiente = filas[movimiento.siguiente_id].rango if movimiento.siguiente_id else None
+        if (movimiento.anterior_id and anterior is None) or (movimiento.siguiente_id and siguiente is None):
+            raise ValueError("Vecino sin clave de orden")
+        return orden.clave_entre(anterior, siguiente)
+
+    try:
+        clave = calcular_clave()
+    except ValueError:
+        # Vecinos sin clave o con claves iguales: se reparten de nuevo y se reintenta
+        orden.rebalancear(db, hogar_id)
+        filas = leer_rangos()
+        try:
+            clave = calcular_clave()
+        except ValueError:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="El orden de las tareas vecinas ha cambiado"
+            )
+
+    tarea = actualizar_parcial(db, TareaDB, tarea_id, {"rango": clave})
+    conteos.tocar(db, hogar_id)
+    db.commit()
+    if orden.necesita_rebalanceo(clave):
+        tareas_fondo.add_task(orden.rebalancear_en_segundo_plano, hogar_id)
     return tarea
 
+# --- Endpoints de Ingesta asíncrona ---
+@app.get("/ingesta/")
+def estado_ingesta():
+    return escritor.estadisticas()
+
+@app.get("/ingesta/tareas/{tarea_id}")
+def estado_tarea_encolada(tarea_id: str, db: Session = Depends(db_config.get_db)):
+    estado = escritor.estado(tarea_id)
+    if estado is None:
+        # El escritor solo recuerda los ids de este proceso (y los últimos
+        # max_estados): si la fila ya está en la tabla, está persistida
+        if db.query(TareaDB.id).filter(TareaDB.id == tarea_id).first() is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Tarea no encontrada en la cola de ingesta"
+            )
+        estado = PERSISTIDA
+    return {"id": tarea_id, "estado": estado}
+
 # --- Endpoints de Asignaciones ---
 @app.post("/tareas/{tarea_id}/asignar", response_model=AsignacionResponse)
 def asignar_tarea(
@@ -93,11 +436,19 @@ def asignar_tarea(
     
     # Crear la asignación
     asignacion_db = AsignacionDB(
+        id=str(uuid4()),
         tarea_id=tarea_id,
         usuario_id=asignacion.usuario_id
     )
     
     db.add(asignacion_db)
+    if tarea.completada and tarea.fecha_completada:
+        estadisticas.cambio_asignacion(
+            db, tarea.hogar_id, asignacion.usuario_id, (tarea.fecha_limite, tarea.fecha_completada), 1
+        )
+    actividad.registrar(
+        db, tarea.hogar_id, "tarea_asignada", asignacion_db.id, asignacion.usuario_id, tarea.titulo
+    )
     db.commit()
     db.refresh(asignacion_db)
     
@@ -106,9 +457,35 @@ def asignar_tarea(
 @app.get("/tareas/{tarea_id}/asignaciones", response_model=List[AsignacionResponse])
 def listar_asignaciones(
     tarea_id: str,
+    request: Request,
+    response: Response,
+    incluir_historial: bool = False,
+    limite: int = Query(paginacion.LIMITE_POR_DEFECTO, ge=1, le=paginacion.LIMITE_MAXIMO),
+    cursor: Optional[str] = None,  # X-Siguiente-Cursor de la página anterior
+    total: bool = False,           # Añadir X-Total-Count
+    formato: Optional[str] = Query(None, pattern=exportar.PATRON_FORMATO),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(db_config.get_db)
 ):
-    return db.query(AsignacionDB).filter(AsignacionDB.tarea_id == tarea_id).all()
+    # Las asignaciones no cambian: el ETag de la página sale de sus ids
+    fuentes = archivo.fuentes_asignaciones(tarea_id, incluir_historial)
+    formato = exportar.formato_pedido(formato, accept)
+    if formato:
+        return exportar.respuesta(
+            db_config.SessionLocal, [paginacion.ordenar(fuente) for fuente in fuentes], AsignacionResponse, formato, "asignaciones"
+        )
+    if total:
+        totales.anunciar(response, totales.exacto(db, [consulta for consulta, _, _ in fuentes]))
+    if if_none_match:
+        # Primero solo los ids: si el cliente ya tiene la página, 304 sin leer el resto
+        estrecha = paginacion.paginar(db, condicional.estrechar(fuentes), cursor, limite)
+        no_modificado = condicional.comprobar(response, if_none_match, condicional.de_pagina(request, response, estrecha))
+        if no_modificado:
+            return no_modificado
+    pagina = paginacion.paginar(db, fuentes, cursor, limite)
+    condicional.anunciar(response, condicional.de_pagina(request, response, pagina))
+    return serializacion.listado(response, AsignacionResponse, paginacion.anunciar(request, response, pagina))
 
 @app.delete("/asignaciones/{asignacion_id}", status_code=status.HTTP_204_NO_CONTENT)
 def eliminar_asignacion(
@@ -122,7 +499,83 @@ def eliminar_asignacion(
             detail="Asignación no encontrada"
         )
     
+    tarea = db.query(
+        TareaDB.hogar_id, TareaDB.titulo, TareaDB.fecha_limite, TareaDB.completada, TareaDB.fecha_completada
+    ).filter(TareaDB.id == asignacion.tarea_id).first()
+    if tarea:
+        if tarea.completada and tarea.fecha_completada:
+            estadisticas.cambio_asignacion(
+                db, tarea.hogar_id, asignacion.usuario_id, (tarea.fecha_limite, tarea.fecha_completada), -1
+            )
+        actividad.registrar(
+            db, tarea.hogar_id, "asignacion_eliminada", asignacion.id, asignacion.usuario_id, tarea.titulo
+        )
     db.delete(asignacion)
     db.commit()
     
-    return None
\ No newline at end of file
+    return None
+
+# --- Endpoints de Actividad ---
+@app.get("/hogares/{hogar_id}/actividad", response_model=PaginaActividad)
+def listar_actividad(
+    hogar_id: str,
+    cursor: Optional[int] = None,  # id del último evento recibido
+    limite: int = Query(50, ge=1, le=200),
+    db: Session = Depends(db_config.get_db)
+):
+    eventos = actividad.listar(db, hogar_id, cursor, limite)
+    siguiente = eventos[-1].id if len(eventos) == limite else None
+    return {"eventos": eventos, "siguiente_cursor": siguiente}
+
+@app.get("/hogares/{hogar_id}/actividad/resumen", response_model=List[ResumenActividadResponse])
+def resumen_actividad(
+    hogar_id: str,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    db: Session = Depends(db_config.get_db)
+):
+    return actividad.listar_resumen(db, hogar_id, desde, hasta)
+
+# --- Endpoints de Estadísticas ---
+@app.get("/hogares/{hogar_id}/estadisticas", response_model=List[EstadisticaSemanalResponse])
+def estadisticas_hogar(
+    hogar_id: str,
+    semanas: int = Query(12, ge=1, le=104),
+    usuario_id: Optional[str] = None,  # Solo un miembro
+    por_miembro: bool = False,         # Una fila por semana y miembro
+    db: Session = Depends(db_config.get_db)
+):
+    # Se leen las tablas de agregados, no las tareas
+    return estadisticas.consultar(db, hogar_id, semanas, usuario_id, por_miembro)
+
+# --- Calendario (iCalendar) ---
+@app.get("/hogares/{hogar_id}/calendario.ics")
+def calendario_hogar(
+    hogar_id: str,
+    if_none_match: Optional[str] = Header(None)
+):
+    # Dentro del plazo de validez de la caché no se consulta la base de datos
+    entrada = calendario.cache.vigente(hogar_id)
+    if entrada is None:
+        # La generación se lee antes que la versión: si un commit cae entre las
+        # dos lecturas, el feed generado no se guarda con una versión antigua
+        generacion = calendario.cache.generacion(hogar_id)
+        db = db_config.SessionLocal()
+        try:
+            version = conteos.version(db, hogar_id)
+        finally:
+            db.close()
+        entrada = calendario.cache.validar(hogar_id, version)
+    else:
+        version = entrada.version
+
+    cabeceras = {"ETag": calendario.etag(version), "Cache-Control": "no-cache"}
+    if condicional.coincide(if_none_match, cabeceras["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cabeceras)
+    if entrada is not None:
+        return Response(entrada.cuerpo, media_type="text/calendar; charset=utf-8", headers=cabeceras)
+    return StreamingResponse(
+        calendario.generar(hogar_id, version, generacion),
+        media_type="text/calendar; charset=utf-8",
+        headers=cabeceras
+    )
\ No newline at end of file
@@ -0,0 +1,188 @@
+"""Archivado de tareas completadas (separación de datos calientes y fríos).
+
+Las tareas completadas hace más de N días se mueven, junto con sus
+asignaciones, a las tablas TareaArchivada/AsignacionArchivada en lotes
+pequeños con una pausa entre lotes para no bloquear la tabla Tarea.
+
+Uso (cron): python archivo.py --dias 90 --lote 500 --pausa 0.2
+"""
+import argparse
+import logging
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+from sqlalchemy import delete, insert, literal, or_, select
+from sqlalchemy.orm import Session
+
+import conteos
+import db_config
+from comun import serializacion
+from comun.paginacion import Fuente
+from models import (
+    TareaDB, AsignacionDB, TareaRelacionDB,
+    TareaArchivadaDB, AsignacionArchivadaDB,
+    TareaResponse, AsignacionResponse
+)
+
+logger = logging.getLogger(__name__)
+
+COLUMNAS_TAREA = [
+    "id", "titulo", "descripcion", "fecha_asignacion", "fecha_limite",
+    "completada", "fecha_completada", "creador_id", "hogar_id", "rango",
+    "padre_id", "total_subtareas", "subtareas_completadas", "version"
+]
+COLUMNAS_ASIGNACION = ["id", "tarea_id", "usuario_id"]
+
+def archivables(limite: datetime) -> list:
+    """Condiciones de una tarea raíz archivable: completada antes de `limite` y con todo su árbol completado."""
+    return [
+        TareaDB.completada == True,
+        TareaDB.fecha_completada < limite,
+        TareaDB.padre_id.is_(None),
+        TareaDB.subtareas_completadas == TareaDB.total_subtareas
+    ]
+
+def archivar_lote(db: Session, raices: List[str], limite: datetime) -> int:
+    """Copia las tareas indicadas, sus subtareas y sus asignaciones al archivo y las borra de las tablas calientes."""
+    # Entre la selección de candidatas y este lote una tarea puede haberse
+    # reabierto o haber ganado una subtarea: se vuelve a comprobar con las raíces
+    # bloqueadas (completar o crear una subtarea actualiza los contadores de la
+    # raíz, así que espera a que termine el lote). Las que otra transacción tiene
+    # bloqueadas se saltan y quedan para el siguiente lote.
+    raices = db.execute(
+        select(TareaDB.id).where(TareaDB.id.in_(raices), *archivables(limite))
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+    if not raices:
+        return 0
+    ids = db.execute(
+        select(TareaRelacionDB.descendiente_id).where(TareaRelacionDB.ancestro_id.in_(raices))
+    ).scalars().all()
+    ids = list(set(ids) | set(raices))
+    # Las tareas archivadas pasan de completadas a archivadas en los contadores del hogar
+    filas = db.execute(
+        select(TareaDB.hogar_id, TareaDB.fecha_limite, TareaDB.completada).where(TareaDB.id.in_(ids))
+    ).all()
+    conteos.aplicar(db, (
+        conteos.estado(fila.hogar_id, fila.fecha_limite, fila.completada, -1) for fila in filas
+    ))
+    conteos.sumar_archivadas(db, Counter(fila.hogar_id for fila in filas))
+    ahora = datetime.now()
+    db.execute(
+        insert(TareaArchivadaDB).from_select(
+            COLUMNAS_TAREA + ["fecha_archivado"],
+            select(
+                *[getattr(TareaDB, c) for c in COLUMNAS_TAREA],
+                literal(ahora)
+            ).where(TareaDB.id.in_(ids))
+        )
+    )
+    db.execute(
+        insert(AsignacionArchivadaDB).from_select(
+            COLUMNAS_ASIGNACION,
+            select(*[getattr(AsignacionDB, c) for c in COLUMNAS_ASIGNACION])
+            .where(AsignacionDB.tarea_id.in_(ids))
+        )
+    )
+    db.execute(delete(AsignacionDB).where(AsignacionDB.tarea_id.in_(ids)))
+    db.execute(delete(TareaRelacionDB).where(or_(
+        TareaRelacionDB.ancestro_id.in_(ids), TareaRelacionDB.descendiente_id.in_(ids)
+    )))
+    db.execute(delete(TareaDB).where(TareaDB.id.in_(ids)))
+    return len(ids)
+
+def archivar_tareas(
+    db: Session,
+    dias: int = 90,
+    tamano_lote: int = 500,
+    pausa: float = 0.1,
+    max_lotes: Optional[int] = None
+) -> int:
+    """Archiva las tareas completadas hace más de `dias` días. Devuelve cuántas se movieron.
+    Solo se archivan árboles completos: tareas raíz con todas sus subtareas completadas."""
+    limite = datetime.now() - timedelta(days=dias)
+    total = 0
+    lotes = 0
+    while max_lotes is None or lotes < max_lotes:
+        ids = db.execute(
+            select(TareaDB.id)
+            .where(*archivables(limite))
+            .order_by(TareaDB.fecha_completada)
+            .limit(tamano_lote)
+        ).scalars().all()
+        if not ids:
+            break
+
+        # Cada lote es una transacción corta
+        movidas = archivar_lote(db, ids, limite)
+        db.commit()
+        if not movidas:
+            # Todas las candidatas estaban bloqueadas por otras transacciones
+            break
+        total += movidas
+        lotes += 1
+        logger.info("Lote %d archivado (%d tareas, %d en total)", lotes, movidas, total)
+
+        if len(ids) < tamano_lote:
+            break
+        time.sleep(pausa)
+    return total
+
+# --- Lectura con historial ---
+def fuentes_tareas(
+    hogar_id: str,
+    incluir_historial: bool = False,
+    orden_manual: bool = False,
+    excluir: Iterable[str] = ()
+) -> List[Fuente]:
+    """Consultas del listado de un hogar (activas y, si se pide, archivadas) con su orden.
+    Leen solo las columnas de TareaResponse menos las de `excluir`."""
+    return [
+        (
+            select(*serializacion.columnas(modelo, TareaResponse, excluir)).where(modelo.hogar_id == hogar_id),
+            modelo.rango if orden_manual else modelo.fecha_asignacion,
+            modelo.id
+        )
+        for modelo in ((TareaDB, TareaArchivadaDB) if incluir_historial else (TareaDB,))
+    ]
+
+def obtener_tarea(db: Session, tarea_id: str, incluir_historial: bool = False):
+    tarea = db.query(TareaDB).filter(TareaDB.id == tarea_id).first()
+    if tarea is None and incluir_historial:
+        tarea = db.query(TareaArchivadaDB).filter(TareaArchivadaDB.id == tarea_id).first()
+    return tarea
+
+def version_tarea(db: Session, tarea_id: str, incluir_historial: bool = False) -> Optional[int]:
+    """Solo la versión de la tarea (ETag), o None si no existe."""
+    version = db.execute(select(TareaDB.version).where(TareaDB.id == tarea_id)).scalar()
+    if version is None and incluir_historial:
+        version = db.execute(select(TareaArchivadaDB.version).where(TareaArchivadaDB.id == tarea_id)).scalar()
+    return version
+
+def fuentes_asignaciones(tarea_id: str, incluir_historial: bool = False) -> List[Fuente]:
+    return [
+        (
+            select(*serializacion.columnas(modelo, AsignacionResponse)).where(modelo.tarea_id == tarea_id),
+            modelo.id, modelo.id
+        )
+        for modelo in ((AsignacionDB, AsignacionArchivadaDB) if incluir_historial else (AsignacionDB,))
+    ]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archiva tareas completadas antiguas")
+    parser.add_argument("--dias", type=int, default=90, help="Antigüedad mínima de la tarea completada")
+    parser.add_argument("--lote", type=int, default=500, help="Tareas por lote")
+    parser.add_argument("--pausa", type=float, default=0.1, help="Segundos de espera entre lotes")
+    parser.add_argument("--max-lotes", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    db_config.Base.metadata.create_all(bind=db_config.engine)
+    db = db_config.SessionLocal()
+    try:
+        movidas = archivar_tareas(db, args.dias, args.lote, args.pausa, args.max_lotes)
+    finally:
+        db.close()
+    print(f"Tareas archivadas: {movidas}")
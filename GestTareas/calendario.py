@@ -0,0 +1,213 @@
+"""Suscripción iCalendar (ICS) a las fechas límite de las tareas de un hogar.
+
+Los clientes de calendario consultan el feed cada pocos minutos, casi siempre
+sin cambios. El feed generado se guarda en memoria junto con la `version`
+del hogar (ver conteos.py), que también es su ETag fuerte:
+
+- cuando un commit de este proceso cambia tareas de un hogar, su entrada se
+  descarta en el acto (evento after_commit de la sesión);
+- una entrada se da por buena sin consultar la base de datos durante
+  CALENDARIO_VALIDEZ segundos; pasado ese tiempo se comprueba la versión con
+  una lectura por clave primaria, para ver los cambios hechos por otros
+  workers.
+
+Una consulta sin cambios dentro de ese plazo no toca la base de datos y, con
+If-None-Match, se responde con 304.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+import db_config
+from conteos import HOGARES_MODIFICADOS
+from models import TareaDB
+
+PRODID = "-//GestTareas//Calendario de tareas//ES"
+
+# --- Formato iCalendar (RFC 5545) ---
+def _escapar(texto: str) -> str:
+    return (
+        texto.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+        .replace("\r\n", "\\n").replace("\n", "\\n")
+    )
+
+def _plegar(linea: str) -> str:
+    """Corta la línea en trozos de 75 octetos como máximo (sin partir caracteres UTF-8)."""
+    datos = linea.encode("utf-8")
+    if len(datos) <= 75:
+        return linea + "\r\n"
+    trozos, actual, tamano = [], [], 0
+    for caracter in linea:
+        largo = len(caracter.encode("utf-8"))
+        # Las líneas de continuación empiezan con un espacio que también cuenta
+        if tamano + largo > (75 if not trozos else 74):
+            trozos.append("".join(actual))
+            actual, tamano = [], 0
+        actual.append(caracter)
+        tamano += largo
+    trozos.append("".join(actual))
+    return "\r\n ".join(trozos) + "\r\n"
+
+def _fecha_utc(fecha: datetime) -> str:
+    if fecha.tzinfo is not None:
+        fecha = fecha.astimezone(timezone.utc).replace(tzinfo=None)
+    return fecha.strftime("%Y%m%dT%H%M%SZ")
+
+def _fecha_local(fecha: datetime) -> str:
+    # Hora "flotante": el cliente la muestra en su zona horaria, igual que la guarda la API
+    return fecha.strftime("%Y%m%dT%H%M%S")
+
+def cabecera(hogar_id: str) -> str:
+    return "".join(_plegar(linea) for linea in (
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escapar(f'Tareas del hogar {hogar_id}')}"
+    ))
+
+def evento(tarea) -> str:
+    lineas = [
+        "BEGIN:VEVENT",
+        f"UID:{tarea.id}@gesttareas",
+        # Fijo por tarea para que el mismo contenido produzca siempre los mismos bytes
+        f"DTSTAMP:{_fecha_utc(tarea.fecha_asignacion or tarea.fecha_limite)}",
+        f"DTSTART:{_fecha_local(tarea.fecha_limite)}",
+        f"SUMMARY:{_escapar(tarea.titulo)}"
+    ]
+    if tarea.descripcion:
+        lineas.append(f"DESCRIPTION:{_escapar(tarea.descripcion)}")
+    lineas.append("END:VEVENT")
+    return "".join(_plegar(linea) for linea in lineas)
+
+PIE = _plegar("END:VCALENDAR")
+
+def etag(version: int) -> str:
+    return f'"v{version}"'
+
+# --- Caché de feeds generados ---
+@dataclass
+class Entrada:
+    version: int
+    cuerpo: bytes
+    comprobada: float  # time.monotonic() de la última comprobación de versión
+
+    @property
+    def etag(self) -> str:
+        return etag(self.version)
+
+class CacheCalendario:
+    def __init__(self, validez: float = 300.0, max_entradas: int = 1000):
+        self.validez = validez
+        self.max_entradas = max_entradas
+        self._entradas: "OrderedDict[str, Entrada]" = OrderedDict()
+        # Número (de un contador global) de la última invalidación de cada hogar:
+        # un feed que empezó a generarse antes de una invalidación no se guarda.
+        # Como las entradas, solo se recuerdan los `max_entradas` hogares
+        # invalidados más recientes; los olvidados valen `_generacion_minima`,
+        # la mayor olvidada, así que un feed en curso de un hogar olvidado
+        # tampoco se guarda
+        self._generaciones: "OrderedDict[str, int]" = OrderedDict()
+        self._invalidaciones = 0
+        self._generacion_minima = 0
+        self._lock = threading.Lock()
+
+    def vigente(self, hogar_id: str) -> Optional[Entrada]:
+        """Entrada comprobada hace menos de `validez` segundos, o None."""
+        with self._lock:
+            entrada = self._entradas.get(hogar_id)
+            if entrada is None or time.monotonic() - entrada.comprobada > self.validez:
+                return None
+            self._entradas.move_to_end(hogar_id)
+            return entrada
+
+    def validar(self, hogar_id: str, version: int) -> Optional[Entrada]:
+        """Renueva la entrada si sigue en `version`; si no, la descarta."""
+        with self._lock:
+            entrada = self._entradas.get(hogar_id)
+            if entrada is None:
+                return None
+            if entrada.version != version:
+                del self._entradas[hogar_id]
+                return None
+            entrada.comprobada = time.monotonic()
+            return entrada
+
+    def generacion(self, hogar_id: str) -> int:
+        """Se lee antes que la versión del hogar y se pasa a guardar()."""
+        with self._lock:
+            return self._generaciones.get(hogar_id, self._generacion_minima)
+
+    def guardar(self, hogar_id: str, version: int, cuerpo: bytes, generacion: int) -> None:
+        with self._lock:
+            if self._generaciones.get(hogar_id, self._generacion_minima) != generacion:
+                return
+            self._entradas[hogar_id] = Entrada(version, cuerpo, time.monotonic())
+            self._entradas.move_to_end(hogar_id)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self, hogar_ids) -> None:
+        with self._lock:
+            for hogar_id in hogar_ids:
+                self._entradas.pop(hogar_id, None)
+                self._invalidaciones += 1
+                self._generaciones[hogar_id] = self._invalidaciones
+                self._generaciones.move_to_end(hogar_id)
+            while len(self._generaciones) > self.max_entradas:
+                _, self._generacion_minima = self._generaciones.popitem(last=False)
+
+cache = CacheCalendario(float(os.getenv("CALENDARIO_VALIDEZ", "300")))
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_tras_commit(session: Session) -> None:
+    hogares = session.info.pop(HOGARES_MODIFICADOS, None)
+    if hogares:
+        cache.invalidar(hogares)
+
+@event.listens_for(Session, "after_rollback")
+def _olvidar_tras_rollback(session: Session) -> None:
+    session.info.pop(HOGARES_MODIFICADOS, None)
+
+# --- Generación ---
+def generar(hogar_id: str, version: int, generacion: int, tamano_lote: int = 500) -> Iterator[bytes]:
+    """Genera el feed por trozos leyendo las tareas por lotes y, si se completa, lo guarda en caché
+    (si el hogar sigue en `generacion`, leída antes que `version`).
+    Abre su propia sesión porque se consume después de que termine la petición."""
+    partes: List[bytes] = []
+
+    def trozo(texto: str) -> bytes:
+        datos = texto.encode("utf-8")
+        partes.append(datos)
+        return datos
+
+    yield trozo(cabecera(hogar_id))
+    db = db_config.SessionLocal()
+    try:
+        resultado = db.execute(
+            select(
+                TareaDB.id, TareaDB.titulo, TareaDB.descripcion,
+                TareaDB.fecha_limite, TareaDB.fecha_asignacion
+            )
+            .where(
+                TareaDB.hogar_id == hogar_id,
+                TareaDB.completada == False,
+                TareaDB.fecha_limite.is_not(None)
+            )
+            .order_by(TareaDB.fecha_limite, TareaDB.id)
+            .execution_options(yield_per=tamano_lote)
+        )
+        for lote in resultado.partitions():
+            yield trozo("".join(evento(tarea) for tarea in lote))
+    finally:
+        db.close()
+    yield trozo(PIE)
+    cache.guardar(hogar_id, version, b"".join(partes), generacion)
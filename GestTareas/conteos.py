@@ -0,0 +1,221 @@
+"""Contadores de tareas por hogar para los paneles.
+
+ConteoTareas guarda, por hogar, cuántas tareas hay abiertas, completadas y
+archivadas; ConteoVencimiento guarda las abiertas agrupadas por fecha límite,
+de modo que las vencidas son la suma de un rango de su clave primaria. Ambas tablas se
+actualizan en la misma transacción que crea, completa, reabre o borra la
+tarea, con un INSERT ... ON DUPLICATE KEY UPDATE que suma la diferencia.
+
+Cada cambio sube además la `version` del hogar, que sirve para saber si
+algo cambió sin mirar las tareas. Los hogares cambiados en una sesión quedan
+en `db.info[HOGARES_MODIFICADOS]` para quien quiera enterarse tras el commit.
+
+Reconciliación periódica (cron): python conteos.py --reconciliar
+"""
+import argparse
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+
+import db_config
+from models import TareaDB, TareaArchivadaDB, ConteoTareasDB, ConteoVencimientoDB
+
+logger = logging.getLogger(__name__)
+
+HOGARES_MODIFICADOS = "hogares_modificados"
+
+# (hogar_id, fecha_limite, diferencia de abiertas, diferencia de completadas)
+Cambio = Tuple[str, Optional[datetime], int, int]
+
+def incrementar(db: Session, modelo, filas: List[dict], columnas: List[str]) -> None:
+    """Inserta las filas o, si la clave primaria ya existe, suma sus `columnas` a las guardadas."""
+    if not filas:
+        return
+    tabla = modelo.__table__
+    dialecto = db.bind.dialect.name
+    if dialecto == "mysql":
+        sentencia = mysql.insert(tabla)
+        sentencia = sentencia.on_duplicate_key_update({
+            columna: tabla.c[columna] + sentencia.inserted[columna] for columna in columnas
+        })
+    else:
+        sentencia = (postgresql if dialecto == "postgresql" else sqlite).insert(tabla)
+        sentencia = sentencia.on_conflict_do_update(
+            index_elements=[columna.name for columna in tabla.primary_key],
+            set_={columna: tabla.c[columna] + sentencia.excluded[columna] for columna in columnas}
+        )
+    db.execute(sentencia, filas)
+
+def marcar_modificados(db: Session, hogar_ids: Iterable[str]) -> None:
+    db.info.setdefault(HOGARES_MODIFICADOS, set()).update(hogar_ids)
+
+def estado(hogar_id: str, fecha_limite: Optional[datetime], completada: bool, signo: int = 1) -> Cambio:
+    """Cambio que suma (signo=1) o resta (signo=-1) una tarea en ese estado."""
+    return (hogar_id, fecha_limite, 0 if completada else signo, signo if completada else 0)
+
+def aplicar(db: Session, cambios: Iterable[Cambio]) -> None:
+    """Suma los cambios a los contadores y sube la versión de cada hogar afectado (no hace commit)."""
+    hogares: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+    vencimientos: Dict[Tuple[str, datetime], int] = defaultdict(int)
+    for hogar_id, fecha_limite, abiertas, completadas in cambios:
+        hogares[hogar_id][0] += abiertas
+        hogares[hogar_id][1] += completadas
+        if fecha_limite is not None and abiertas:
+            vencimientos[(hogar_id, fecha_limite)] += abiertas
+
+    incrementar(db, ConteoTareasDB, [
+        {"hogar_id": hogar_id, "abiertas": abiertas, "completadas": completadas, "archivadas": 0, "version": 1}
+        for hogar_id, (abiertas, completadas) in hogares.items()
+    ], ["abiertas", "completadas", "version"])
+    incrementar(db, ConteoVencimientoDB, [
+        {"hogar_id": hogar_id, "fecha_limite": fecha_limite, "abiertas": abiertas}
+        for (hogar_id, fecha_limite), abiertas in vencimientos.items() if abiertas
+    ], ["abiertas"])
+    marcar_modificados(db, hogares)
+
+def sumar_archivadas(db: Session, por_hogar: Dict[str, int]) -> None:
+    incrementar(db, ConteoTareasDB, [
+        {"hogar_id": hogar_id, "abiertas": 0, "completadas": 0, "archivadas": cantidad, "version": 0}
+        for hogar_id, cantidad in por_hogar.items() if cantidad
+    ], ["archivadas"])
+
+def tocar(db: Session, hogar_id: str) -> None:
+    """Sube la versión del hogar sin cambiar los contadores (p. ej. al reordenar)."""
+    aplicar(db, [(hogar_id, None, 0, 0)])
+
+def total(db: Session, hogar_id: str, incluir_historial: bool = False) -> int:
+    """Número de tareas del hogar (activas y, si se pide, archivadas) según los contadores."""
+    fila = db.execute(
+        select(ConteoTareasDB.abiertas, ConteoTareasDB.completadas, ConteoTareasDB.archivadas)
+        .where(ConteoTareasDB.hogar_id == hogar_id)
+    ).first()
+    if fila is None:
+        return 0
+    return fila.abiertas + fila.completadas + (fila.archivadas if incluir_historial else 0)
+
+def version(db: Session, hogar_id: str) -> int:
+    return db.execute(
+        select(ConteoTareasDB.version).where(ConteoTareasDB.hogar_id == hogar_id)
+    ).scalar() or 0
+
+def obtener(db: Session, hogar_ids: List[str], ahora: Optional[datetime] = None) -> List[dict]:
+    """Contadores de cada hogar pedido (ceros si no tiene ninguna tarea), en una sola consulta
+    por clave primaria."""
+    ahora = ahora or datetime.now()
+    vencidas = (
+        select(func.coalesce(func.sum(ConteoVencimientoDB.abiertas), 0))
+        .where(
+            ConteoVencimientoDB.hogar_id == ConteoTareasDB.hogar_id,
+            ConteoVencimientoDB.fecha_limite < ahora
+        )
+        .scalar_subquery()
+    )
+    filas = {
+        fila.hogar_id: fila for fila in db.execute(
+            select(
+                ConteoTareasDB.hogar_id,
+                ConteoTareasDB.abiertas,
+                ConteoTareasDB.completadas,
+                vencidas.label("vencidas")
+            ).where(ConteoTareasDB.hogar_id.in_(hogar_ids))
+        )
+    }
+    return [
+        dict(filas[hogar_id]._mapping) if hogar_id in filas else {"hogar_id": hogar_id}
+        for hogar_id in hogar_ids
+    ]
+
+# --- Reconciliación ---
+def reconciliar_hogares(db: Session, hogar_ids: List[str]) -> int:
+    """Recalcula desde Tarea los contadores de los hogares indicados. Devuelve cuántos estaban mal.
+    No hace commit."""
+    # Bloquear primero los contadores: quien cree o complete una tarea de estos
+    # hogares espera a que termine la reconciliación en lugar de perder su cambio
+    guardados = {
+        conteo.hogar_id: conteo for conteo in db.execute(
+            select(ConteoTareasDB).where(ConteoTareasDB.hogar_id.in_(hogar_ids)).with_for_update()
+        ).scalars()
+    }
+    reales = {
+        fila.hogar_id: fila for fila in db.execute(
+            select(
+                TareaDB.hogar_id,
+                func.sum(case((TareaDB.completada == True, 0), else_=1)).label("abiertas"),
+                func.sum(case((TareaDB.completada == True, 1), else_=0)).label("completadas")
+            ).where(TareaDB.hogar_id.in_(hogar_ids)).group_by(TareaDB.hogar_id)
+        )
+    }
+
+    archivadas_reales = dict(db.execute(
+        select(TareaArchivadaDB.hogar_id, func.count())
+        .where(TareaArchivadaDB.hogar_id.in_(hogar_ids))
+        .group_by(TareaArchivadaDB.hogar_id)
+    ).all())
+
+    corregidos = 0
+    for hogar_id in hogar_ids:
+        real = reales.get(hogar_id)
+        abiertas, completadas = (int(real.abiertas), int(real.completadas)) if real else (0, 0)
+        archivadas = archivadas_reales.get(hogar_id, 0)
+        conteo = guardados.get(hogar_id)
+        if conteo is None:
+            if not (real or archivadas):
+                continue
+            conteo = ConteoTareasDB(hogar_id=hogar_id, abiertas=0, completadas=0, archivadas=0, version=0)
+            db.add(conteo)
+        if (conteo.abiertas, conteo.completadas, conteo.archivadas) != (abiertas, completadas, archivadas):
+            conteo.abiertas, conteo.completadas, conteo.archivadas = abiertas, completadas, archivadas
+            conteo.version += 1
+            corregidos += 1
+            marcar_modificados(db, [hogar_id])
+
+    db.execute(delete(ConteoVencimientoDB).where(ConteoVencimientoDB.hogar_id.in_(hogar_ids)))
+    db.execute(
+        insert(ConteoVencimientoDB).from_select(
+            ["hogar_id", "fecha_limite", "abiertas"],
+            select(TareaDB.hogar_id, TareaDB.fecha_limite, func.count())
+            .where(
+                TareaDB.hogar_id.in_(hogar_ids),
+                TareaDB.completada != True,
+                TareaDB.fecha_limite.is_not(None)
+            )
+            .group_by(TareaDB.hogar_id, TareaDB.fecha_limite)
+        )
+    )
+    db.flush()
+    return corregidos
+
+def reconciliar(db: Session, hogar_ids: Optional[List[str]] = None, tamano_lote: int = 200) -> int:
+    """Reconcilia los hogares indicados, o todos, en transacciones de `tamano_lote` hogares."""
+    if hogar_ids is None:
+        hogar_ids = sorted(
+            set(db.execute(select(TareaDB.hogar_id).distinct()).scalars())
+            | set(db.execute(select(ConteoTareasDB.hogar_id)).scalars())
+        )
+    corregidos = 0
+    for inicio in range(0, len(hogar_ids), tamano_lote):
+        corregidos += reconciliar_hogares(db, hogar_ids[inicio:inicio + tamano_lote])
+        db.commit()
+    if corregidos:
+        logger.warning("Contadores corregidos en %d hogares", corregidos)
+    return corregidos
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcilia los contadores de tareas por hogar")
+    parser.add_argument("--reconciliar", action="store_true", help="Recalcular los contadores desde Tarea")
+    parser.add_argument("hogar_ids", nargs="*", help="Hogares a reconciliar (por defecto, todos)")
+    args = parser.parse_args()
+
+    if args.reconciliar:
+        logging.basicConfig(level=logging.INFO)
+        db_config.Base.metadata.create_all(bind=db_config.engine)
+        db = db_config.SessionLocal()
+        try:
+            print(f"Hogares corregidos: {reconciliar(db, args.hogar_ids or None)}")
+        finally:
+            db.close()
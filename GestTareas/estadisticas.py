@@ -0,0 +1,272 @@
+"""Estadísticas semanales de finalización por hogar y por miembro.
+
+EstadisticaSemanal acumula por (hogar_id, usuario_id, semana ISO) cuántas
+tareas se completaron, cuántas tenían fecha límite, cuántas llegaron a
+tiempo y los segundos de retraso de las demás. Se mantiene de forma
+incremental en la transacción que completa, reabre, reprograma, asigna o
+borra la tarea, así que las consultas leen un número fijo de filas sin
+importar cuánto historial haya. La fila con usuario_id vacío es el total del
+hogar; cada tarea suma además en la fila de cada persona asignada.
+
+Reconstrucción desde el historial (incluye las tareas archivadas), por
+lotes de hogares y con un INSERT ... SELECT ... GROUP BY por lote:
+python estadisticas.py --recalcular
+"""
+import argparse
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Integer, and_, case, cast, delete, func, insert, literal, literal_column, select, union, union_all
+from sqlalchemy.orm import Session
+
+import db_config
+from conteos import incrementar
+from models import (
+    TareaDB, AsignacionDB, TareaArchivadaDB, AsignacionArchivadaDB, EstadisticaSemanalDB
+)
+
+logger = logging.getLogger(__name__)
+
+HOGAR = ""  # usuario_id de la fila con el total del hogar
+COLUMNAS = ["completadas", "con_limite", "a_tiempo", "retraso_total"]
+
+# (fecha_limite, fecha_completada) de una tarea completada; None si está abierta
+Finalizacion = Optional[Tuple[Optional[datetime], datetime]]
+
+def semana_iso(fecha: date) -> str:
+    anio, semana, _ = fecha.isocalendar()
+    return f"{anio}-W{semana:02d}"
+
+def _aportacion(finalizacion: Finalizacion, signo: int) -> Tuple[str, dict]:
+    fecha_limite, fecha_completada = finalizacion
+    valores = {"completadas": signo, "con_limite": 0, "a_tiempo": 0, "retraso_total": 0}
+    if fecha_limite is not None:
+        valores["con_limite"] = signo
+        retraso = (fecha_completada - fecha_limite).total_seconds()
+        if retraso <= 0:
+            valores["a_tiempo"] = signo
+        else:
+            valores["retraso_total"] = signo * int(retraso)
+    return semana_iso(fecha_completada), valores
+
+def _filas(hogar_id: str, usuarios: Iterable[str], finalizacion: Finalizacion, signo: int) -> List[dict]:
+    if finalizacion is None:
+        return []
+    semana, valores = _aportacion(finalizacion, signo)
+    return [
+        {"hogar_id": hogar_id, "usuario_id": usuario_id, "semana": semana, **valores}
+        for usuario_id in usuarios
+    ]
+
+def _combinar(filas: List[dict]) -> List[dict]:
+    """Junta las filas con la misma clave (un mismo INSERT no debe tocar dos veces una fila)."""
+    combinadas: Dict[Tuple[str, str, str], dict] = {}
+    for fila in filas:
+        clave = (fila["hogar_id"], fila["usuario_id"], fila["semana"])
+        if clave in combinadas:
+            for columna in COLUMNAS:
+                combinadas[clave][columna] += fila[columna]
+        else:
+            combinadas[clave] = dict(fila)
+    return list(combinadas.values())
+
+def asignados(db: Session, tarea_id: str) -> List[str]:
+    return db.execute(
+        select(AsignacionDB.usuario_id).where(AsignacionDB.tarea_id == tarea_id)
+    ).scalars().all()
+
+def cambio_tarea(
+    db: Session,
+    tarea_id: str,
+    hogar_id: str,
+    antes: Finalizacion,
+    despues: Finalizacion
+) -> None:
+    """Resta la aportación anterior de la tarea y suma la nueva (no hace commit)."""
+    if antes == despues:
+        return
+    usuarios = [HOGAR] + asignados(db, tarea_id)
+    incrementar(
+        db, EstadisticaSemanalDB,
+        _combinar(_filas(hogar_id, usuarios, antes, -1) + _filas(hogar_id, usuarios, despues, 1)),
+        COLUMNAS
+    )
+
+def cambio_asignacion(
+    db: Session,
+    hogar_id: str,
+    usuario_id: str,
+    finalizacion: Finalizacion,
+    signo: int
+) -> None:
+    """Suma (signo=1) o resta (signo=-1) una tarea completada en la fila de un miembro."""
+    incrementar(db, EstadisticaSemanalDB, _filas(hogar_id, [usuario_id], finalizacion, signo), COLUMNAS)
+
+def quitar_tareas(db: Session, filas: Iterable) -> None:
+    """Resta las tareas que se van a borrar (filas con id, hogar_id, fecha_limite, fecha_completada,
+    completada). Debe llamarse antes de borrar sus asignaciones."""
+    completadas = [fila for fila in filas if fila.completada and fila.fecha_completada]
+    if not completadas:
+        return
+    usuarios: Dict[str, List[str]] = defaultdict(list)
+    for tarea_id, usuario_id in db.execute(
+        select(AsignacionDB.tarea_id, AsignacionDB.usuario_id)
+        .where(AsignacionDB.tarea_id.in_([fila.id for fila in completadas]))
+    ):
+        usuarios[tarea_id].append(usuario_id)
+    incrementar(db, EstadisticaSemanalDB, _combinar([
+        fila_estadistica
+        for fila in completadas
+        for fila_estadistica in _filas(
+            fila.hogar_id, [HOGAR] + usuarios[fila.id], (fila.fecha_limite, fila.fecha_completada), -1
+        )
+    ]), COLUMNAS)
+
+# --- Consultas ---
+def semanas_recientes(semanas: int, hasta: Optional[date] = None) -> List[str]:
+    hasta = hasta or date.today()
+    return [semana_iso(hasta - timedelta(weeks=i)) for i in range(semanas)]
+
+def _respuesta(fila: EstadisticaSemanalDB) -> dict:
+    retrasadas = fila.con_limite - fila.a_tiempo
+    return {
+        "semana": fila.semana,
+        "usuario_id": fila.usuario_id or None,
+        "completadas": fila.completadas,
+        "con_limite": fila.con_limite,
+        "a_tiempo": fila.a_tiempo,
+        "tasa_a_tiempo": round(fila.a_tiempo / fila.con_limite, 4) if fila.con_limite else None,
+        "retraso_medio_horas": round(fila.retraso_total / retrasadas / 3600, 2) if retrasadas else None
+    }
+
+def consultar(
+    db: Session,
+    hogar_id: str,
+    semanas: int = 12,
+    usuario_id: Optional[str] = None,
+    por_miembro: bool = False
+) -> List[dict]:
+    """Últimas `semanas` semanas del hogar (o de un miembro, o de todos los miembros).
+    Lee como mucho una fila por semana y miembro, por clave primaria."""
+    consulta = select(EstadisticaSemanalDB).where(
+        EstadisticaSemanalDB.hogar_id == hogar_id,
+        EstadisticaSemanalDB.semana.in_(semanas_recientes(semanas))
+    )
+    if por_miembro:
+        consulta = consulta.where(EstadisticaSemanalDB.usuario_id != HOGAR)
+    else:
+        consulta = consulta.where(EstadisticaSemanalDB.usuario_id == (usuario_id or HOGAR))
+    consulta = consulta.order_by(EstadisticaSemanalDB.semana.desc(), EstadisticaSemanalDB.usuario_id)
+    return [_respuesta(fila) for fila in db.execute(consulta).scalars()]
+
+# --- Reconstrucción ---
+def _semana_sql(db: Session, fecha):
+    """semana_iso() en SQL."""
+    if db.bind.dialect.name == "mysql":
+        return func.date_format(fecha, "%x-W%v")
+    # SQLite: la semana ISO es la de su jueves (el año también)
+    jueves = func.date(fecha, "-3 days", "weekday 4")
+    return func.printf(
+        "%s-W%02d", func.strftime("%Y", jueves), (cast(func.strftime("%j", jueves), Integer) - 1) // 7 + 1
+    )
+
+def _segundos_sql(db: Session, desde, hasta):
+    """Segundos enteros de `desde` a `hasta` en SQL (truncados, como int(timedelta.total_seconds()))."""
+    if db.bind.dialect.name == "mysql":
+        return func.timestampdiff(literal_column("SECOND"), desde, hasta)
+    # SQLite: julianday tiene precisión de milisegundos
+    return cast(func.round((func.julianday(hasta) - func.julianday(desde)) * 86400000), Integer) // 1000
+
+def _aportaciones_sql(db: Session, modelo_tarea, modelo_asignacion, hogares: List[str]) -> list:
+    """_aportacion() en SQL: una fila por tarea completada de los hogares en la del hogar
+    y otra en la de cada persona asignada."""
+    con_limite = modelo_tarea.fecha_limite.is_not(None)
+    a_tiempo = and_(con_limite, modelo_tarea.fecha_completada <= modelo_tarea.fecha_limite)
+    columnas = [
+        _semana_sql(db, modelo_tarea.fecha_completada).label("semana"),
+        literal(1).label("completadas"),
+        case((con_limite, 1), else_=0).label("con_limite"),
+        case((a_tiempo, 1), else_=0).label("a_tiempo"),
+        case(
+            (
+                and_(con_limite, ~a_tiempo),
+                _segundos_sql(db, modelo_tarea.fecha_limite, modelo_tarea.fecha_completada)
+            ),
+            else_=0
+        ).label("retraso_total"),
+    ]
+    completadas = and_(
+        modelo_tarea.hogar_id.in_(hogares),
+        modelo_tarea.completada == True,
+        modelo_tarea.fecha_completada.is_not(None)
+    )
+    return [
+        select(modelo_tarea.hogar_id, literal(HOGAR).label("usuario_id"), *columnas).where(completadas),
+        select(modelo_tarea.hogar_id, modelo_asignacion.usuario_id, *columnas)
+        .join(modelo_asignacion, modelo_asignacion.tarea_id == modelo_tarea.id)
+        .where(completadas),
+    ]
+
+def _siguientes_hogares(db: Session, ultimo: Optional[str], tamano_lote: int) -> List[str]:
+    """Hogares con tareas (activas o archivadas) o con estadísticas, en orden, después de `ultimo`."""
+    todos = union(
+        select(TareaDB.hogar_id),
+        select(TareaArchivadaDB.hogar_id),
+        select(EstadisticaSemanalDB.hogar_id)
+    ).subquery()
+    consulta = select(todos.c.hogar_id)
+    if ultimo is not None:
+        consulta = consulta.where(todos.c.hogar_id > ultimo)
+    return db.execute(consulta.order_by(todos.c.hogar_id).limit(tamano_lote)).scalars().all()
+
+def recalcular_hogares(db: Session, hogares: List[str]) -> int:
+    """Rehace las filas de estos hogares con un DELETE y un INSERT ... SELECT ... GROUP BY.
+    Devuelve cuántas tareas completadas se contaron (no hace commit)."""
+    db.execute(delete(EstadisticaSemanalDB).where(EstadisticaSemanalDB.hogar_id.in_(hogares)))
+    aportaciones = union_all(
+        *_aportaciones_sql(db, TareaDB, AsignacionDB, hogares),
+        *_aportaciones_sql(db, TareaArchivadaDB, AsignacionArchivadaDB, hogares)
+    ).subquery()
+    claves = [aportaciones.c.hogar_id, aportaciones.c.usuario_id, aportaciones.c.semana]
+    db.execute(insert(EstadisticaSemanalDB).from_select(
+        ["hogar_id", "usuario_id", "semana", *COLUMNAS],
+        select(*claves, *(func.sum(aportaciones.c[columna]) for columna in COLUMNAS)).group_by(*claves)
+    ))
+    return db.execute(
+        select(func.coalesce(func.sum(EstadisticaSemanalDB.completadas), 0)).where(
+            EstadisticaSemanalDB.hogar_id.in_(hogares), EstadisticaSemanalDB.usuario_id == HOGAR
+        )
+    ).scalar()
+
+def recalcular(db: Session, tamano_lote: int = 100) -> int:
+    """Rehace la tabla desde Tarea y TareaArchivada, `tamano_lote` hogares por transacción.
+    Devuelve cuántas tareas completadas se contaron."""
+    tareas = 0
+    ultimo = None
+    while True:
+        hogares = _siguientes_hogares(db, ultimo, tamano_lote)
+        if not hogares:
+            break
+        tareas += recalcular_hogares(db, hogares)
+        db.commit()
+        ultimo = hogares[-1]
+        logger.info(
+            "Estadísticas de %d hogares recalculadas (hasta %s; %d tareas en total)", len(hogares), ultimo, tareas
+        )
+    return tareas
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estadísticas semanales de tareas completadas")
+    parser.add_argument("--recalcular", action="store_true", help="Reconstruir las estadísticas desde el historial")
+    args = parser.parse_args()
+
+    if args.recalcular:
+        logging.basicConfig(level=logging.INFO)
+        db_config.Base.metadata.create_all(bind=db_config.engine)
+        db = db_config.SessionLocal()
+        try:
+            print(f"Tareas completadas contadas: {recalcular(db)}")
+        finally:
+            db.close()
@@ -0,0 +1,211 @@
+"""Ingesta asíncrona de tareas por lotes.
+
+`POST /tareas/?async=true` no escribe en la base de datos: encola la fila
+(con el id ya asignado) y un hilo escritor la inserta junto con las demás
+pendientes en un único INSERT multi-fila cuando se llena el lote o pasa el
+intervalo máximo de espera. Así el coste de la transacción se reparte entre
+todas las filas del lote.
+
+La cola está acotada (`max_pendientes`): si el escritor no da abasto,
+`encolar` lanza ColaLlena y el endpoint responde 503 en lugar de acumular
+filas en memoria sin límite. Un lote que falla se reintenta y, si vuelve a
+fallar, se parte en mitades hasta aislar las filas que fallan: solo esas
+quedan en ERROR.
+
+Al apagar, `detener` espera a que el escritor vuelque todo lo encolado: las
+filas ya respondidas con 202 no se pierden. Si se le da un `timeout` y el
+escritor no termina a tiempo, registra cuántas filas quedan sin escribir.
+"""
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+import db_config
+from models import TareaDB
+
+logger = logging.getLogger(__name__)
+
+PENDIENTE = "pendiente"
+PERSISTIDA = "persistida"
+ERROR = "error"
+
+class ColaLlena(Exception):
+    """La cola de ingesta está llena; la fila no se ha encolado."""
+
+class EscritorTareas:
+    def __init__(
+        self,
+        crear_sesion: Callable[[], Session],
+        max_filas: int = 500,
+        intervalo: float = 0.005,
+        max_estados: int = 100_000,
+        max_pendientes: int = 10_000,
+        reintentos: int = 1,
+        pausa_reintento: float = 0.05
+    ):
+        self.crear_sesion = crear_sesion
+        self.max_filas = max_filas
+        self.intervalo = intervalo  # Segundos máximos que espera una fila antes de volcarse
+        self.max_estados = max_estados
+        self.reintentos = reintentos  # Reintentos del lote completo antes de partirlo
+        self.pausa_reintento = pausa_reintento
+        # Funciones extra a ejecutar en la transacción de cada lote: f(db, filas),
+        # antes del INSERT (pueden completar las filas) y después
+        self.al_preparar: List[Callable[[Session, List[dict]], None]] = []
+        self.al_volcar: List[Callable[[Session, List[dict]], None]] = []
+
+        self._cola: "queue.Queue[dict]" = queue.Queue(maxsize=max_pendientes)
+        self._estados: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hilo: Optional[threading.Thread] = None
+        self._en_curso = 0  # Filas del lote que se está escribiendo
+        self._parar = threading.Event()
+        self._stats = {
+            "encoladas": 0, "rechazadas": 0, "persistidas": 0, "errores": 0, "lotes": 0, "reintentos": 0
+        }
+
+    # --- API pública ---
+    def iniciar(self) -> None:
+        with self._lock:
+            if self._hilo is not None and self._hilo.is_alive():
+                return
+            self._parar.clear()
+            self._hilo = threading.Thread(target=self._bucle, name="escritor-tareas", daemon=True)
+            self._hilo.start()
+
+    def detener(self, timeout: Optional[float] = None) -> int:
+        """Vuelca todo lo pendiente y detiene el hilo escritor.
+
+        Sin `timeout` espera a que la cola quede vacía. Con él, devuelve (y
+        registra) cuántas filas aceptadas quedaron sin escribir al agotarlo."""
+        self._parar.set()
+        hilo, self._hilo = self._hilo, None
+        if hilo is None:
+            return 0
+        hilo.join(timeout)
+        if not hilo.is_alive():
+            return 0
+        perdidas = self._cola.qsize() + self._en_curso
+        logger.error(
+            "El escritor de tareas no terminó en %.1f s: %d tareas aceptadas quedan sin escribir",
+            timeout, perdidas
+        )
+        return perdidas
+
+    def encolar(self, fila: dict) -> None:
+        """Encola la fila sin esperar; lanza ColaLlena si ya hay `max_pendientes`."""
+        self.iniciar()
+        # Con el lock: el escritor no puede marcarla antes de que quede PENDIENTE
+        with self._lock:
+            try:
+                self._cola.put_nowait(fila)
+            except queue.Full:
+                self._stats["rechazadas"] += 1
+                raise ColaLlena() from None
+            self._marcar(fila["id"], PENDIENTE)
+            self._stats["encoladas"] += 1
+
+    def estado(self, tarea_id: str) -> Optional[str]:
+        with self._lock:
+            return self._estados.get(tarea_id)
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["pendientes"] = self._cola.qsize()
+        stats["filas_por_lote"] = (
+            round(stats["persistidas"] / stats["lotes"], 1) if stats["lotes"] else 0
+        )
+        return stats
+
+    # --- Hilo escritor ---
+    def _marcar(self, tarea_id: str, estado: str) -> None:
+        # Solo se recuerdan los últimos `max_estados` ids
+        self._estados[tarea_id] = estado
+        self._estados.move_to_end(tarea_id)
+        while len(self._estados) > self.max_estados:
+            self._estados.popitem(last=False)
+
+    def _siguiente_lote(self) -> List[dict]:
+        try:
+            lote = [self._cola.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        limite = time.monotonic() + self.intervalo
+        while len(lote) < self.max_filas:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                lote.append(self._cola.get(timeout=restante))
+            except queue.Empty:
+                break
+        return lote
+
+    def _bucle(self) -> None:
+        while not (self._parar.is_set() and self._cola.empty()):
+            lote = self._siguiente_lote()
+            if lote:
+                self._en_curso = len(lote)
+                self._volcar(lote)
+                self._en_curso = 0
+
+    def _escribir(self, lote: List[dict]) -> bool:
+        """Inserta el lote en una transacción; False (con rollback) si falla."""
+        db = self.crear_sesion()
+        try:
+            for funcion in self.al_preparar:
+                funcion(db, lote)
+            # executemany: el driver lo envía como un INSERT multi-fila
+            db.execute(insert(TareaDB), lote)
+            for funcion in self.al_volcar:
+                funcion(db, lote)
+            db.commit()
+            return True
+        except Exception:
+            db.rollback()
+            if len(lote) == 1:
+                logger.exception("Error al volcar la tarea %s", lote[0]["id"])
+            else:
+                logger.warning("Error al volcar un lote de %d tareas", len(lote), exc_info=True)
+            return False
+        finally:
+            db.close()
+
+    def _volcar(self, lote: List[dict], reintentos: Optional[int] = None) -> None:
+        """Escribe el lote, reintentándolo si falla (errores transitorios: bloqueos,
+        conexión). Si sigue fallando lo parte en mitades, sin más reintentos, hasta
+        aislar las filas que fallan."""
+        reintentos = self.reintentos if reintentos is None else reintentos
+        for intento in range(reintentos + 1):
+            if intento:
+                time.sleep(self.pausa_reintento)
+                with self._lock:
+                    self._stats["reintentos"] += 1
+            if self._escribir(lote):
+                self._terminar(lote, PERSISTIDA)
+                return
+        if len(lote) == 1:
+            self._terminar(lote, ERROR)
+            return
+        mitad = len(lote) // 2
+        self._volcar(lote[:mitad], 0)
+        self._volcar(lote[mitad:], 0)
+
+    def _terminar(self, lote: List[dict], estado: str) -> None:
+        with self._lock:
+            for fila in lote:
+                self._marcar(fila["id"], estado)
+            if estado == PERSISTIDA:
+                self._stats["persistidas"] += len(lote)
+                self._stats["lotes"] += 1
+            else:
+                self._stats["errores"] += len(lote)
+
+escritor = EscritorTareas(lambda: db_config.SessionLocal())
@@ -1,10 +1,17 @@
-from sqlalchemy import Column, String, Text, TIMESTAMP, Boolean, ForeignKey
-from sqlalchemy.sql import func
+from sqlalchemy import Column, String, Text, TIMESTAMP, Boolean, ForeignKey, Index, BigInteger, Integer
+from sqlalchemy.dialects import mysql
+from sqlalchemy.sql import func, literal_column
 from uuid import uuid4
 from db_config import Base
+from comun.actividad import (  # Columnas y esquemas de la actividad, comunes a los servicios
+    ColumnasActividad, ColumnasResumen, ActividadResponse, PaginaActividad, ResumenActividadResponse
+)
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
+
+# Clave de orden manual: se compara byte a byte (en MySQL, collation binaria)
+ClaveOrden = String(64).with_variant(mysql.VARCHAR(64, collation="ascii_bin"), "mysql")
 
 class TareaDB(Base):
     __tablename__ = "Tarea"
@@ -14,14 +21,109 @@ class TareaDB(Base):
     fecha_asignacion = Column(TIMESTAMP, server_default=func.now())
     fecha_limite = Column(TIMESTAMP)
     completada = Column(Boolean, default=False)
+    fecha_completada = Column(TIMESTAMP, nullable=True)
     creador_id = Column(String(36), nullable=False)  # Usuario externo
     hogar_id = Column(String(36), nullable=False)    # Hogar externo
+    rango = Column(ClaveOrden, nullable=True)        # Orden manual (ver orden.py)
+    padre_id = Column(String(36), nullable=True, index=True)  # Subtareas (ver subtareas.py)
+    total_subtareas = Column(Integer, nullable=False, default=0)        # Descendientes
+    subtareas_completadas = Column(Integer, nullable=False, default=0)  # Descendientes completados
+    version = Column(Integer, nullable=False, default=1, server_default="1", onupdate=literal_column("version") + 1)  # Sube con cada UPDATE (ETag, ver comun/condicional.py)
+
+    __table_args__ = (
+        # Selección de candidatas a archivar
+        Index("ix_tarea_completada_fecha", "completada", "fecha_completada"),
+        # Listado en orden manual y última clave del hogar
+        Index("ix_tarea_hogar_rango", "hogar_id", "rango", "id"),
+        # Listado por páginas en orden de creación
+        Index("ix_tarea_hogar_fecha", "hogar_id", "fecha_asignacion", "id"),
+        # Calendario: pendientes con fecha límite, en orden de vencimiento
+        Index("ix_tarea_hogar_pendiente_limite", "hogar_id", "completada", "fecha_limite", "id"),
+    )
 
 class AsignacionDB(Base):
     __tablename__ = "Asignacion"
     id = Column(String(36), primary_key=True, default=lambda: str(uuid4()))
     tarea_id = Column(String(36), nullable=False)     # Tarea interna
     usuario_id = Column(String(36), nullable=False)   # Usuario externo
+
+    __table_args__ = (
+        # Asignaciones de una tarea por páginas
+        Index("ix_asignacion_tarea", "tarea_id", "id"),
+    )
+
+# Tabla de cierre de subtareas: una fila por cada par (antepasado, descendiente)
+class TareaRelacionDB(Base):
+    __tablename__ = "TareaRelacion"
+    ancestro_id = Column(String(36), primary_key=True)
+    descendiente_id = Column(String(36), primary_key=True, index=True)
+    profundidad = Column(Integer, nullable=False)
+
+# Tablas de archivo (datos fríos): tareas completadas hace más de N días
+class TareaArchivadaDB(Base):
+    __tablename__ = "TareaArchivada"
+    id = Column(String(36), primary_key=True)
+    titulo = Column(String(150), nullable=False)
+    descripcion = Column(Text)
+    fecha_asignacion = Column(TIMESTAMP)
+    fecha_limite = Column(TIMESTAMP)
+    completada = Column(Boolean, default=True)
+    fecha_completada = Column(TIMESTAMP, nullable=True)
+    creador_id = Column(String(36), nullable=False)
+    hogar_id = Column(String(36), nullable=False, index=True)
+    rango = Column(ClaveOrden, nullable=True)
+    padre_id = Column(String(36), nullable=True)
+    total_subtareas = Column(Integer, nullable=False, default=0)
+    subtareas_completadas = Column(Integer, nullable=False, default=0)
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # La que tenía al archivarse
+    fecha_archivado = Column(TIMESTAMP, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_tarea_archivada_hogar_fecha", "hogar_id", "fecha_asignacion", "id"),
+        Index("ix_tarea_archivada_hogar_rango", "hogar_id", "rango", "id"),
+    )
+
+class AsignacionArchivadaDB(Base):
+    __tablename__ = "AsignacionArchivada"
+    id = Column(String(36), primary_key=True)
+    tarea_id = Column(String(36), nullable=False, index=True)
+    usuario_id = Column(String(36), nullable=False)
+
+# Actividad del hogar (solo inserción) y su compactación por día
+class ActividadDB(ColumnasActividad, Base):
+    __tablename__ = "Actividad"
+
+class ResumenActividadDB(ColumnasResumen, Base):
+    __tablename__ = "ResumenActividad"
+
+# Contadores por hogar para los paneles (ver conteos.py)
+class ConteoTareasDB(Base):
+    __tablename__ = "ConteoTareas"
+    hogar_id = Column(String(36), primary_key=True)
+    abiertas = Column(Integer, nullable=False, default=0)
+    completadas = Column(Integer, nullable=False, default=0)
+    archivadas = Column(Integer, nullable=False, default=0)  # En TareaArchivada
+    version = Column(BigInteger, nullable=False, default=0)  # Sube con cada cambio en las tareas del hogar
+
+# Tareas abiertas por fecha límite: las vencidas son un rango de la clave primaria
+class ConteoVencimientoDB(Base):
+    __tablename__ = "ConteoVencimiento"
+    hogar_id = Column(String(36), primary_key=True)
+    fecha_limite = Column(TIMESTAMP, primary_key=True)
+    abiertas = Column(Integer, nullable=False, default=0)
+
+# Estadísticas de finalización por semana ISO (ver estadisticas.py).
+# usuario_id vacío = total del hogar
+class EstadisticaSemanalDB(Base):
+    __tablename__ = "EstadisticaSemanal"
+    hogar_id = Column(String(36), primary_key=True)
+    usuario_id = Column(String(36), primary_key=True, default="")
+    semana = Column(String(8), primary_key=True)  # "2026-W07"
+    completadas = Column(Integer, nullable=False, default=0)
+    con_limite = Column(Integer, nullable=False, default=0)  # Completadas que tenían fecha límite
+    a_tiempo = Column(Integer, nullable=False, default=0)
+    retraso_total = Column(BigInteger, nullable=False, default=0)  # Segundos de retraso sumados
+
 # Esquemas Pydantic
 
 
@@ -30,19 +132,53 @@ class TareaBase(BaseModel):
     descripcion: Optional[str] = None
     fecha_limite: Optional[datetime] = None
     hogar_id: str
+    padre_id: Optional[str] = None  # Tarea de la que es subtarea
 
 class TareaCreate(TareaBase):
     pass
 
+class TareaUpdate(BaseModel):
+    titulo: Optional[str] = None
+    descripcion: Optional[str] = None
+    fecha_limite: Optional[datetime] = None
+    completada: Optional[bool] = None
+
+class MovimientoTarea(BaseModel):
+    # Vecinos tras soltar la tarea (None = principio o final de la lista)
+    anterior_id: Optional[str] = None
+    siguiente_id: Optional[str] = None
+
 class TareaResponse(TareaBase):
     id: str
     fecha_asignacion: datetime
     completada: bool
+    fecha_completada: Optional[datetime] = None
     creador_id: str
+    rango: Optional[str] = None
+    total_subtareas: int = 0
+    subtareas_completadas: int = 0
     
     class Config:
         from_attributes = True
 
+class TareaArbolResponse(TareaResponse):
+    subtareas: List["TareaArbolResponse"] = []
+
+class ConteoTareasResponse(BaseModel):
+    hogar_id: str
+    abiertas: int = 0
+    completadas: int = 0
+    vencidas: int = 0
+
+class EstadisticaSemanalResponse(BaseModel):
+    semana: str
+    usuario_id: Optional[str] = None
+    completadas: int = 0
+    con_limite: int = 0
+    a_tiempo: int = 0
+    tasa_a_tiempo: Optional[float] = None        # a_tiempo / con_limite
+    retraso_medio_horas: Optional[float] = None  # Entre las que se completaron tarde
+
 class AsignacionBase(BaseModel):
     tarea_id: str
     usuario_id: str
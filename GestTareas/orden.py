@@ -0,0 +1,226 @@
+"""Orden manual de las tareas (arrastrar y soltar) con índices fraccionarios.
+
+Cada tarea tiene una clave `rango` que se compara como texto. Para mover una
+tarea basta con darle una clave entre las de sus nuevos vecinos, así que
+mover es un único UPDATE de una fila. Las claves crecen poco a poco; cuando
+superan LONGITUD_MAXIMA se reparten de nuevo las del hogar (rebalanceo),
+lo que ocurre rara vez y en segundo plano.
+
+Claves: parte entera de longitud variable + parte fraccionaria en base 62
+(algoritmo de "fractional-indexing" de rocicorp, dominio público).
+"""
+import argparse
+from itertools import groupby
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+import conteos
+import db_config
+from models import TareaDB
+
+DIGITOS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+ENTERO_MINIMO = "A" + DIGITOS[0] * 26
+LONGITUD_MAXIMA = 32  # A partir de aquí se rebalancea el hogar
+
+# --- Generación de claves ---
+def _punto_medio(a: str, b: Optional[str]) -> str:
+    """Fracción estrictamente entre a y b (b=None es el límite superior)."""
+    cero = DIGITOS[0]
+    if b is not None:
+        # Prefijo común (a se completa con ceros)
+        n = 0
+        while (a[n] if n < len(a) else cero) == b[n]:
+            n += 1
+        if n > 0:
+            return b[:n] + _punto_medio(a[n:], b[n:])
+    digito_a = DIGITOS.index(a[0]) if a else 0
+    digito_b = DIGITOS.index(b[0]) if b is not None else len(DIGITOS)
+    if digito_b - digito_a > 1:
+        return DIGITOS[round(0.5 * (digito_a + digito_b))]
+    if b is not None and len(b) > 1:
+        return b[:1]
+    return DIGITOS[digito_a] + _punto_medio(a[1:], None)
+
+def _longitud_entero(cabeza: str) -> int:
+    if "a" <= cabeza <= "z":
+        return ord(cabeza) - ord("a") + 2
+    if "A" <= cabeza <= "Z":
+        return ord("Z") - ord(cabeza) + 2
+    raise ValueError(f"Cabeza de clave no válida: {cabeza!r}")
+
+def _parte_entera(clave: str) -> str:
+    longitud = _longitud_entero(clave[0])
+    if longitud > len(clave):
+        raise ValueError(f"Clave no válida: {clave!r}")
+    return clave[:longitud]
+
+def _validar(clave: str) -> None:
+    if clave == ENTERO_MINIMO:
+        raise ValueError(f"Clave no válida: {clave!r}")
+    fraccion = clave[len(_parte_entera(clave)):]
+    if fraccion.endswith(DIGITOS[0]):
+        raise ValueError(f"Clave no válida: {clave!r}")
+
+def _incrementar_entero(x: str) -> Optional[str]:
+    cabeza, digitos = x[0], list(x[1:])
+    acarreo = True
+    i = len(digitos) - 1
+    while acarreo and i >= 0:
+        d = DIGITOS.index(digitos[i]) + 1
+        if d == len(DIGITOS):
+            digitos[i] = DIGITOS[0]
+        else:
+            digitos[i] = DIGITOS[d]
+            acarreo = False
+        i -= 1
+    if acarreo:
+        if cabeza == "Z":
+            return "a" + DIGITOS[0]
+        if cabeza == "z":
+            return None
+        cabeza = chr(ord(cabeza) + 1)
+        if cabeza > "a":
+            digitos.append(DIGITOS[0])
+        else:
+            digitos.pop()
+    return cabeza + "".join(digitos)
+
+def _decrementar_entero(x: str) -> Optional[str]:
+    cabeza, digitos = x[0], list(x[1:])
+    prestamo = True
+    i = len(digitos) - 1
+    while prestamo and i >= 0:
+        d = DIGITOS.index(digitos[i]) - 1
+        if d == -1:
+            digitos[i] = DIGITOS[-1]
+        else:
+            digitos[i] = DIGITOS[d]
+            prestamo = False
+        i -= 1
+    if prestamo:
+        if cabeza == "a":
+            return "Z" + DIGITOS[-1]
+        if cabeza == "A":
+            return None
+        cabeza = chr(ord(cabeza) - 1)
+        if cabeza < "Z":
+            digitos.append(DIGITOS[-1])
+        else:
+            digitos.pop()
+    return cabeza + "".join(digitos)
+
+def clave_entre(a: Optional[str], b: Optional[str]) -> str:
+    """Clave estrictamente entre a y b; None significa "sin límite" por ese lado."""
+    if a is not None:
+        _validar(a)
+    if b is not None:
+        _validar(b)
+    if a is not None and b is not None and a >= b:
+        raise ValueError(f"{a!r} no es menor que {b!r}")
+
+    if a is None:
+        if b is None:
+            return "a" + DIGITOS[0]
+        entero_b = _parte_entera(b)
+        if entero_b == ENTERO_MINIMO:
+            return entero_b + _punto_medio("", b[len(entero_b):])
+        if entero_b < b:
+            return entero_b
+        anterior = _decrementar_entero(entero_b)
+        if anterior is None:
+            raise ValueError("No quedan claves por debajo")
+        return anterior
+
+    entero_a = _parte_entera(a)
+    fraccion_a = a[len(entero_a):]
+    if b is None:
+        siguiente = _incrementar_entero(entero_a)
+        return entero_a + _punto_medio(fraccion_a, None) if siguiente is None else siguiente
+
+    entero_b = _parte_entera(b)
+    if entero_a == entero_b:
+        return entero_a + _punto_medio(fraccion_a, b[len(entero_b):])
+    siguiente = _incrementar_entero(entero_a)
+    if siguiente is not None and siguiente < b:
+        return siguiente
+    return entero_a + _punto_medio(fraccion_a, None)
+
+def claves_consecutivas(ultima: Optional[str], cantidad: int) -> List[str]:
+    claves = []
+    for _ in range(cantidad):
+        ultima = clave_entre(ultima, None)
+        claves.append(ultima)
+    return claves
+
+# --- Acceso a datos ---
+def ultimas_claves(db: Session, hogar_ids: List[str]) -> Dict[str, Optional[str]]:
+    """Clave más alta de cada hogar (usa el índice (hogar_id, rango))."""
+    filas = db.execute(
+        select(TareaDB.hogar_id, func.max(TareaDB.rango))
+        .where(TareaDB.hogar_id.in_(hogar_ids))
+        .group_by(TareaDB.hogar_id)
+    ).all()
+    return dict(filas)
+
+def siguiente_clave(db: Session, hogar_id: str) -> str:
+    """Clave para añadir una tarea al final del hogar."""
+    return clave_entre(ultimas_claves(db, [hogar_id]).get(hogar_id), None)
+
+def asignar_rangos(db: Session, filas: List[dict]) -> None:
+    """Pone `rango` al final de su hogar a cada fila nueva (antes del INSERT)."""
+    por_hogar = sorted(filas, key=lambda fila: fila["hogar_id"])
+    ultimas = ultimas_claves(db, list({fila["hogar_id"] for fila in filas}))
+    for hogar_id, grupo in groupby(por_hogar, key=lambda fila: fila["hogar_id"]):
+        grupo = list(grupo)
+        for fila, clave in zip(grupo, claves_consecutivas(ultimas.get(hogar_id), len(grupo))):
+            fila["rango"] = clave
+
+def necesita_rebalanceo(clave: str) -> bool:
+    return len(clave) > LONGITUD_MAXIMA
+
+def rebalancear(db: Session, hogar_id: str) -> int:
+    """Reasigna claves cortas y consecutivas a todas las tareas del hogar, conservando el orden.
+    Las tareas sin clave (anteriores a esta función) quedan al final por fecha. No hace commit."""
+    ids = db.execute(
+        select(TareaDB.id)
+        .where(TareaDB.hogar_id == hogar_id)
+        .order_by(TareaDB.rango.is_(None), TareaDB.rango, TareaDB.fecha_asignacion, TareaDB.id)
+    ).scalars().all()
+    if ids:
+        db.execute(
+            update(TareaDB),
+            [
+                {"id": tarea_id, "rango": clave}
+                for tarea_id, clave in zip(ids, claves_consecutivas(None, len(ids)))
+            ]
+        )
+        # Cambian los rangos del listado: nueva versión del hogar (ETag)
+        conteos.tocar(db, hogar_id)
+    return len(ids)
+
+def rebalancear_en_segundo_plano(hogar_id: str) -> None:
+    db = db_config.SessionLocal()
+    try:
+        rebalancear(db, hogar_id)
+        db.commit()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebalancea las claves de orden de las tareas")
+    parser.add_argument("hogar_ids", nargs="*", help="Hogares a rebalancear (por defecto, los que tengan claves largas)")
+    args = parser.parse_args()
+
+    db = db_config.SessionLocal()
+    try:
+        hogar_ids = args.hogar_ids or db.execute(
+            select(TareaDB.hogar_id).distinct()
+            .where(func.length(TareaDB.rango) > LONGITUD_MAXIMA)
+        ).scalars().all()
+        for hogar_id in hogar_ids:
+            print(f"{hogar_id}: {rebalancear(db, hogar_id)} tareas")
+            db.commit()
+    finally:
+        db.close()
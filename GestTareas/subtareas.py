@@ -0,0 +1,149 @@
+"""Subtareas (listas de comprobación) con tabla de cierre.
+
+TareaRelacion guarda un par (ancestro, descendiente, profundidad) por cada
+antepasado de cada tarea, incluida ella misma con profundidad 0. Con eso:
+
+- el subárbol completo de cualquier tarea es una sola consulta por la clave
+  primaria (ancestro_id, descendiente_id);
+- cada tarea lleva contadores de descendientes totales y completados, que
+  se actualizan con un único UPDATE sobre sus antepasados al crear o
+  completar una subtarea, sin volver a contar hijos.
+
+Tareas creadas antes de esta tabla: python subtareas.py --migrar
+"""
+import argparse
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, insert, literal, or_, select, update
+from sqlalchemy.orm import Session
+
+import db_config
+from models import TareaDB, AsignacionDB, TareaRelacionDB
+
+def registrar(db: Session, tarea_id: str, padre_id: Optional[str] = None) -> None:
+    """Crea las filas de cierre de una tarea nueva y suma 1 al total de sus antepasados."""
+    db.execute(insert(TareaRelacionDB).values(
+        ancestro_id=tarea_id, descendiente_id=tarea_id, profundidad=0
+    ))
+    if padre_id is None:
+        return
+    db.execute(
+        insert(TareaRelacionDB).from_select(
+            ["ancestro_id", "descendiente_id", "profundidad"],
+            select(
+                TareaRelacionDB.ancestro_id,
+                literal(tarea_id),
+                TareaRelacionDB.profundidad + 1
+            ).where(TareaRelacionDB.descendiente_id == padre_id)
+        )
+    )
+    db.execute(
+        update(TareaDB)
+        .where(TareaDB.id.in_(ancestros(padre_id, incluir_propia=True)))
+        .values(total_subtareas=TareaDB.total_subtareas + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+def registrar_raices(db: Session, tarea_ids: List[str]) -> None:
+    """Filas de cierre de varias tareas sin padre en un INSERT multi-fila."""
+    if tarea_ids:
+        db.execute(insert(TareaRelacionDB), [
+            {"ancestro_id": tarea_id, "descendiente_id": tarea_id, "profundidad": 0}
+            for tarea_id in tarea_ids
+        ])
+
+def ancestros(tarea_id: str, incluir_propia: bool = False):
+    consulta = select(TareaRelacionDB.ancestro_id).where(TareaRelacionDB.descendiente_id == tarea_id)
+    if not incluir_propia:
+        consulta = consulta.where(TareaRelacionDB.profundidad > 0)
+    return consulta
+
+def propagar_completada(db: Session, tarea_id: str, completada: bool) -> None:
+    """Ajusta en +1/-1 los completados de todos los antepasados de la tarea."""
+    delta = 1 if completada else -1
+    db.execute(
+        update(TareaDB)
+        .where(TareaDB.id.in_(ancestros(tarea_id)))
+        .values(subtareas_completadas=TareaDB.subtareas_completadas + delta)
+        .execution_options(synchronize_session=False)
+    )
+
+def leer_subarbol(db: Session, tarea_id: str) -> list:
+    """Filas (id, hogar_id, titulo, fecha_limite, completada, fecha_completada) de la tarea y
+    todas sus subtareas; vacía si no existe."""
+    ids = select(TareaRelacionDB.descendiente_id).where(TareaRelacionDB.ancestro_id == tarea_id)
+    return db.execute(
+        select(
+            TareaDB.id, TareaDB.hogar_id, TareaDB.titulo,
+            TareaDB.fecha_limite, TareaDB.completada, TareaDB.fecha_completada
+        )
+        .where(or_(TareaDB.id == tarea_id, TareaDB.id.in_(ids)))
+    ).all()
+
+def eliminar_subarbol(db: Session, tarea_id: str, filas: list) -> None:
+    """Borra las filas leídas con leer_subarbol, con sus asignaciones, y descuenta los borrados
+    de los antepasados de la tarea."""
+    borradas = [fila.id for fila in filas]
+    completadas = sum(1 for fila in filas if fila.completada)
+    db.execute(
+        update(TareaDB)
+        .where(TareaDB.id.in_(ancestros(tarea_id)))
+        .values(
+            total_subtareas=TareaDB.total_subtareas - len(borradas),
+            subtareas_completadas=TareaDB.subtareas_completadas - completadas
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(delete(AsignacionDB).where(AsignacionDB.tarea_id.in_(borradas)))
+    db.execute(delete(TareaRelacionDB).where(TareaRelacionDB.descendiente_id.in_(borradas)))
+    db.execute(delete(TareaDB).where(TareaDB.id.in_(borradas)).execution_options(synchronize_session=False))
+
+def cargar_subarbol(db: Session, tarea_id: str) -> Optional[dict]:
+    """Devuelve la tarea con sus descendientes anidados en `subtareas` (una consulta)."""
+    filas = db.execute(
+        select(TareaDB)
+        .join(TareaRelacionDB, TareaRelacionDB.descendiente_id == TareaDB.id)
+        .where(TareaRelacionDB.ancestro_id == tarea_id)
+        .order_by(TareaRelacionDB.profundidad, TareaDB.rango, TareaDB.id)
+    ).scalars().all()
+    if not filas:
+        return None
+
+    nodos: Dict[str, dict] = {}
+    for tarea in filas:
+        nodos[tarea.id] = {"tarea": tarea, "subtareas": []}
+        if tarea.id != tarea_id and tarea.padre_id in nodos:
+            nodos[tarea.padre_id]["subtareas"].append(nodos[tarea.id])
+    return nodos[tarea_id]
+
+def migrar(db: Session, tamano_lote: int = 1000) -> int:
+    """Crea la fila propia (profundidad 0) de las tareas que aún no la tienen."""
+    total = 0
+    while True:
+        sin_relacion = db.execute(
+            select(TareaDB.id)
+            .outerjoin(
+                TareaRelacionDB,
+                (TareaRelacionDB.ancestro_id == TareaDB.id) & (TareaRelacionDB.descendiente_id == TareaDB.id)
+            )
+            .where(TareaRelacionDB.ancestro_id.is_(None))
+            .limit(tamano_lote)
+        ).scalars().all()
+        if not sin_relacion:
+            return total
+        registrar_raices(db, sin_relacion)
+        db.commit()
+        total += len(sin_relacion)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mantenimiento de la tabla de cierre de subtareas")
+    parser.add_argument("--migrar", action="store_true", help="Registrar las tareas existentes como raíces")
+    args = parser.parse_args()
+
+    if args.migrar:
+        db_config.Base.metadata.create_all(bind=db_config.engine)
+        db = db_config.SessionLocal()
+        try:
+            print(f"Tareas registradas: {migrar(db)}")
+        finally:
+            db.close()
@@ -1,9 +1,13 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from uuid import UUID
 import models, db_config
-from models import UsuarioCreate, UsuarioResponse, SessionResponse
+from comun import asincrono, condicional, exportar, metricas, paginacion, perfilador, serializacion, totales
+from comun.actualizacion import actualizar_parcial
+from models import UsuarioCreate, UsuarioResponse, UsuarioUpdate, SessionResponse
 import uuid
 from datetime import datetime, timedelta
 import secrets
@@ -14,6 +18,12 @@ app = FastAPI(
     description="Microservicio para gestión de usuarios con autenticación",
     version="0.2.0"
 )
+# Con DB_MODO=async los endpoints se registran como async def (ver comun/asincrono.py)
+app.router.route_class = asincrono.ruta(db_config)
+# Métricas por ruta y GET /metrics (ver comun/metricas.py)
+metricas.instalar(app)
+# Perfil SQL por petición y avisos de N+1 (ver comun/perfilador.py)
+perfilador.instalar(app)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -41,6 +51,7 @@ def read_root():
         "documentación": "Visite /docs o /redoc para la interfaz interactiva"
     }
 @app.post("/usuarios/", response_model=UsuarioResponse, status_code=status.HTTP_201_CREATED)
+@asincrono.en_hilo  # bcrypt: CPU
 def crear_usuario(usuario: UsuarioCreate, db: Session = Depends(db_config.get_db)):
     # Verificar si el correo ya existe
     db_usuario = db.query(models.UsuarioDB).filter(models.UsuarioDB.correo == usuario.correo).first()
@@ -65,21 +76,66 @@ def crear_usuario(usuario: UsuarioCreate, db: Session = Depends(db_config.get_db
     return usuario_db
 
 @app.get("/usuarios/", response_model=List[UsuarioResponse])
-def listar_usuarios(db: Session = Depends(db_config.get_db)):
-    return db.query(models.UsuarioDB).all()
+def listar_usuarios(
+    request: Request,
+    response: Response,
+    limite: int = Query(paginacion.LIMITE_POR_DEFECTO, ge=1, le=paginacion.LIMITE_MAXIMO),
+    cursor: Optional[str] = None,  # X-Siguiente-Cursor de la página anterior
+    total: bool = False,           # Añadir X-Total-Count
+    formato: Optional[str] = Query(None, pattern=exportar.PATRON_FORMATO),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(db_config.get_db)
+):
+    # Solo las columnas de la respuesta, como filas simples (ver comun/serializacion.py),
+    # más la versión para el ETag
+    fuentes = [(
+        select(*serializacion.columnas(models.UsuarioDB, UsuarioResponse), models.UsuarioDB.version),
+        models.UsuarioDB.fecha_registro, models.UsuarioDB.id
+    )]
+    # Exportación en streaming (json, ndjson o csv): todas las filas, sin paginar
+    formato = exportar.formato_pedido(formato, accept)
+    if formato:
+        return exportar.respuesta(db_config.SessionLocal, [paginacion.ordenar(fuentes[0])], UsuarioResponse, formato, "usuarios")
+    if total:
+        # Total global sin filtro: estimación del optimizador
+        totales.anunciar(response, totales.estimado(db, models.UsuarioDB))
+    if if_none_match:
+        # Primero solo ids y versiones: si el cliente ya tiene la página, 304 sin leer el resto
+        estrecha = paginacion.paginar(db, condicional.estrechar(fuentes), cursor, limite)
+        no_modificado = condicional.comprobar(response, if_none_match, condicional.de_pagina(request, response, estrecha))
+        if no_modificado:
+            return no_modificado
+    pagina = paginacion.paginar(db, fuentes, cursor, limite)
+    condicional.anunciar(response, condicional.de_pagina(request, response, pagina))
+    return serializacion.listado(response, UsuarioResponse, paginacion.anunciar(request, response, pagina))
 
 @app.get("/usuarios/{usuario_id}", response_model=UsuarioResponse)
-def obtener_usuario(usuario_id: str, db: Session = Depends(db_config.get_db)):
+def obtener_usuario(
+    usuario_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(db_config.get_db)
+):
+    if if_none_match:
+        # Solo la versión: si el cliente ya tiene el usuario, 304 sin leerlo
+        version = db.execute(select(models.UsuarioDB.version).where(models.UsuarioDB.id == usuario_id)).scalar()
+        if version is not None:
+            no_modificado = condicional.comprobar(response, if_none_match, condicional.etag(usuario_id, version))
+            if no_modificado:
+                return no_modificado
     usuario = db.query(models.UsuarioDB).filter(models.UsuarioDB.id == usuario_id).first()
     if not usuario:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Usuario no encontrado"
         )
+    condicional.anunciar(response, condicional.etag(usuario.id, usuario.version))
     return usuario
 
 # --- Endpoints de Autenticación ---
 @app.post("/login/", response_model=SessionResponse)
+@asincrono.en_hilo  # bcrypt: CPU
 def iniciar_sesion(correo: str, contraseña: str, db: Session = Depends(db_config.get_db)):
     # Verificar credenciales 
     usuario = db.query(models.UsuarioDB).filter(
@@ -127,6 +183,7 @@ def cerrar_sesion(session_id: str, db: Session = Depends(db_config.get_db)):
     return {"message": "Sesión cerrada correctamente"}
 
 @app.put("/usuarios/{usuario_id}", response_model=UsuarioResponse)
+@asincrono.en_hilo  # bcrypt: CPU
 def actualizar_usuario(
     usuario_id: str,
     usuario_actualizado: UsuarioCreate,
@@ -165,6 +222,38 @@ def actualizar_usuario(
     
     return db_usuario
 
+@app.patch("/usuarios/{usuario_id}", response_model=UsuarioResponse)
+@asincrono.en_hilo  # bcrypt: CPU
+def actualizar_usuario_parcial(
+    usuario_id: str,
+    cambios: UsuarioUpdate,
+    db: Session = Depends(db_config.get_db)
+):
+    valores = {
+        campo: valor for campo, valor in cambios.model_dump(exclude_unset=True).items()
+        if valor is not None
+    }
+    # Solo se hashea si se envía una contraseña nueva
+    if "contraseña" in valores:
+        valores["contraseña"] = obtener_hashed_contraseña(valores["contraseña"])
+
+    try:
+        usuario = actualizar_parcial(db, models.UsuarioDB, usuario_id, valores)
+        db.commit()
+    except IntegrityError:
+        # El índice único de correo sustituye a la consulta previa de duplicados
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El correo ya está en uso por otro usuario"
+        )
+    if not usuario:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Usuario no encontrado"
+        )
+    return usuario
+
 @app.delete("/usuarios/{usuario_id}", status_code=status.HTTP_204_NO_CONTENT)
 def eliminar_usuario(
     usuario_id: str,
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, Boolean, TIMESTAMP, ForeignKey
-from sqlalchemy.sql import func
+from sqlalchemy import Column, String, Boolean, TIMESTAMP, ForeignKey, Index, Integer
+from sqlalchemy.sql import func, literal_column
 from uuid import uuid4
 from db_config import Base
 from pydantic import BaseModel, EmailStr
@@ -15,6 +15,12 @@ class UsuarioDB(Base):
     correo = Column(String(100), unique=True, nullable=False)
     contraseña = Column(String(255), nullable=False)
     fecha_registro = Column(TIMESTAMP, server_default=func.now())
+    version = Column(Integer, nullable=False, default=1, server_default="1", onupdate=literal_column("version") + 1)  # Sube con cada UPDATE (ETag, ver comun/condicional.py)
+
+    __table_args__ = (
+        # Listado por páginas en orden de registro
+        Index("ix_usuario_fecha_registro", "fecha_registro", "id"),
+    )
 
 class SessionDB(Base):
     __tablename__ = "Session"
@@ -26,6 +32,12 @@ class SessionDB(Base):
     fecha_expiracion = Column(TIMESTAMP, nullable=False)
     activa = Column(Boolean, default=True)
 
+    __table_args__ = (
+        # Validación de tokens y cierre de las sesiones activas de un usuario al iniciar sesión
+        Index("ix_session_token", "token", unique=True),
+        Index("ix_session_usuario_activa", "usuario_id", "activa"),
+    )
+
 # Esquemas Pydantic
 class UsuarioBase(BaseModel):
     nombre: str
@@ -39,7 +51,7 @@ class UsuarioResponse(UsuarioBase):
     fecha_registro: datetime
 
     class Config:
-        orm_mode = True
+        from_attributes = True
 
 class SessionBase(BaseModel):
     token: str
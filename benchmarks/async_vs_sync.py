@@ -0,0 +1,113 @@
+"""Compara el modo síncrono (threadpool) y el asíncrono (DB_MODO=async) de un servicio.
+
+Arranca el servicio con uvicorn una vez por modo, lanza `--peticiones`
+peticiones GET con `--concurrencia` conexiones simultáneas y muestra
+peticiones por segundo, errores y latencias p50/p99.
+
+Necesita la base de datos MySQL del servicio levantada, aiomysql instalado
+y httpx en el entorno del benchmark:
+
+    python benchmarks/async_vs_sync.py --servicio GestUsuarios --ruta "/usuarios/?limite=20"
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+async def esperar_arranque(url: str, limite: float = 30.0) -> None:
+    fin = time.monotonic() + limite
+    async with httpx.AsyncClient() as cliente:
+        while time.monotonic() < fin:
+            try:
+                await cliente.get(url + "/docs")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"El servicio no arrancó en {limite} s")
+
+async def carga(url: str, peticiones: int, concurrencia: int):
+    latencias, errores = [], 0
+    limites = httpx.Limits(max_connections=concurrencia, max_keepalive_connections=concurrencia)
+    pendientes = iter(range(peticiones))
+
+    async with httpx.AsyncClient(limits=limites, timeout=60.0) as cliente:
+        async def trabajador():
+            nonlocal errores
+            for _ in pendientes:
+                inicio = time.perf_counter()
+                try:
+                    respuesta = await cliente.get(url)
+                    if respuesta.status_code >= 400:
+                        errores += 1
+                except httpx.HTTPError:
+                    errores += 1
+                latencias.append(time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+        duracion = time.perf_counter() - inicio
+    return latencias, errores, duracion
+
+def medir(modo: str, args) -> dict:
+    entorno = dict(os.environ, DB_MODO=modo)
+    # El directorio del servicio es el de trabajo; comun, desde la raíz
+    entorno["PYTHONPATH"] = os.pathsep.join(filter(None, [str(RAIZ), entorno.get("PYTHONPATH")]))
+    servidor = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app:app",
+            "--port", str(args.puerto), "--log-level", "warning",
+            "--backlog", str(max(2048, args.concurrencia * 2))
+        ],
+        cwd=RAIZ / args.servicio,
+        env=entorno
+    )
+    base = f"http://127.0.0.1:{args.puerto}"
+    try:
+        asyncio.run(esperar_arranque(base))
+        # Calentamiento: conexiones del pool y cachés de SQLAlchemy
+        asyncio.run(carga(base + args.ruta, min(200, args.peticiones), min(50, args.concurrencia)))
+        latencias, errores, duracion = asyncio.run(carga(base + args.ruta, args.peticiones, args.concurrencia))
+    finally:
+        servidor.terminate()
+        servidor.wait()
+    return {
+        "modo": modo,
+        "rps": len(latencias) / duracion,
+        "errores": errores,
+        "p50": percentil(latencias, 50) * 1000,
+        "p99": percentil(latencias, 99) * 1000,
+        "media": statistics.fmean(latencias) * 1000 if latencias else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--servicio", default="GestUsuarios", choices=["GestUsuarios", "GestHogares", "GestTareas"])
+    parser.add_argument("--ruta", default="/usuarios/?limite=20", help="Ruta GET a medir")
+    parser.add_argument("--puerto", type=int, default=8800)
+    parser.add_argument("--concurrencia", type=int, default=1000)
+    parser.add_argument("--peticiones", type=int, default=20000)
+    parser.add_argument("--modos", nargs="+", default=["sync", "async"], choices=["sync", "async"])
+    args = parser.parse_args()
+
+    resultados = [medir(modo, args) for modo in args.modos]
+    print(f"{args.servicio} GET {args.ruta}: {args.peticiones} peticiones, {args.concurrencia} conexiones")
+    print(f"{'modo':<6} {'pet/s':>9} {'errores':>8} {'media ms':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for r in resultados:
+        print(f"{r['modo']:<6} {r['rps']:>9.1f} {r['errores']:>8} {r['media']:>9.1f} {r['p50']:>8.1f} {r['p99']:>8.1f}")
+
+if __name__ == "__main__":
+    main()
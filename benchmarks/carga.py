@@ -0,0 +1,372 @@
+"""Prueba de carga HTTP de los tres servicios a partir de ficheros de escenario.
+
+Cada usuario virtual repite en bucle un escenario (benchmarks/escenarios/*.json)
+durante `--duracion` segundos; con varios escenarios los usuarios se reparten
+entre ellos según su "peso". Al terminar se muestran, por ruta, peticiones
+por segundo, errores y latencias p50/p95/p99.
+
+Objetivos:
+- asgi (por defecto): los tres servicios en este mismo proceso, sin red
+  (httpx.ASGITransport). Mide el coste del código y de la base de datos.
+- uvicorn: arranca un uvicorn por servicio en puertos consecutivos desde
+  `--puerto` y les lanza la carga por HTTP.
+
+La base de datos es la de cada servicio (DB_URL o MySQL local por defecto);
+con `--db-url` se usa otra, sustituyendo `{base}` por la de cada servicio:
+
+    python benchmarks/carga.py --db-url "sqlite:////tmp/carga/{base}.db" \\
+        --concurrencia 50 --duracion 30 --guardar antes
+
+    python benchmarks/carga.py ... --comparar antes
+
+`--guardar NOMBRE` deja los resultados en benchmarks/referencias/NOMBRE.json
+junto con el commit y la máquina; `--comparar NOMBRE` muestra la diferencia
+con esa referencia. Solo tiene sentido comparar ejecuciones de la misma
+máquina, con el mismo objetivo, escenarios y concurrencia.
+
+Formato de un escenario:
+
+    {"descripcion": "...", "peso": 1, "pasos": [
+        {"servicio": "usuarios", "metodo": "POST", "ruta": "/usuarios/",
+         "json": {"correo": "carga-{n}@ejemplo.com", ...},
+         "guardar": {"usuario_id": "id"}},
+        {"servicio": "tareas", "metodo": "PUT", "ruta": "/tareas/{tarea_id}/completar"}
+    ]}
+
+En ruta, params y json se sustituyen {variables}: las guardadas por pasos
+anteriores (campo de la respuesta JSON), {n} (único en la ejecución) e {i}
+(índice dentro de "repetir": N). Las métricas se agrupan por la ruta sin
+sustituir. Un paso con error corta la iteración del escenario.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from contextlib import AsyncExitStack, asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from uuid import uuid4
+
+import httpx
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))  # Paquete comun
+ESCENARIOS = Path(__file__).resolve().parent / "escenarios"
+REFERENCIAS = Path(__file__).resolve().parent / "referencias"
+
+# servicio: (directorio, base de datos)
+SERVICIOS = {
+    "usuarios": ("GestUsuarios", "gestusuarios"),
+    "hogares": ("GestHogares", "gesthogares"),
+    "tareas": ("GestTareas", "gesttareas"),
+}
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+# --- Escenarios ---
+def cargar_escenarios(nombres) -> list:
+    escenarios = []
+    for nombre in nombres:
+        fichero = Path(nombre)
+        if not fichero.exists():
+            fichero = ESCENARIOS / f"{nombre}.json"
+        escenario = json.loads(fichero.read_text(encoding="utf-8"))
+        escenario.setdefault("nombre", fichero.stem)
+        for paso in escenario["pasos"]:
+            if paso["servicio"] not in SERVICIOS:
+                raise SystemExit(f"{fichero}: servicio desconocido {paso['servicio']!r}")
+        escenarios.append(escenario)
+    return escenarios
+
+def sustituir(valor, contexto: dict):
+    if isinstance(valor, str):
+        return valor.format_map(contexto)
+    if isinstance(valor, dict):
+        return {clave: sustituir(v, contexto) for clave, v in valor.items()}
+    if isinstance(valor, list):
+        return [sustituir(v, contexto) for v in valor]
+    return valor
+
+class Resultados:
+    """Latencias y errores por ruta ("servicio MÉTODO /plantilla")."""
+    def __init__(self):
+        self.latencias = defaultdict(list)
+        self.errores = defaultdict(int)
+        self.iteraciones = defaultdict(int)
+        self.activo = True
+
+    def anotar(self, ruta: str, latencia: float, error: bool) -> None:
+        if not self.activo:
+            return
+        self.latencias[ruta].append(latencia)
+        if error:
+            self.errores[ruta] += 1
+
+async def ejecutar(escenario: dict, clientes: dict, contexto: dict, resultados: Resultados) -> bool:
+    """Una iteración del escenario. Devuelve False si algún paso falló."""
+    for paso in escenario["pasos"]:
+        ruta = f"{paso['servicio']} {paso['metodo']} {paso['ruta']}"
+        for i in range(paso.get("repetir", 1)):
+            contexto["i"] = i
+            inicio = time.perf_counter()
+            try:
+                respuesta = await clientes[paso["servicio"]].request(
+                    paso["metodo"],
+                    sustituir(paso["ruta"], contexto),
+                    params=sustituir(paso.get("params"), contexto),
+                    json=sustituir(paso.get("json"), contexto)
+                )
+                error = respuesta.status_code >= 400
+            except (httpx.HTTPError, KeyError):
+                respuesta, error = None, True
+            resultados.anotar(ruta, time.perf_counter() - inicio, error)
+            if error:
+                return False
+            for variable, campo in paso.get("guardar", {}).items():
+                contexto[variable] = respuesta.json()[campo]
+    return True
+
+async def usuario_virtual(numero: int, escenario: dict, clientes: dict, ejecucion: str,
+                          fin: float, resultados: Resultados) -> None:
+    iteracion = 0
+    while time.monotonic() < fin:
+        contexto = {"n": f"{ejecucion}-{numero}-{iteracion}"}
+        if await ejecutar(escenario, clientes, contexto, resultados) and resultados.activo:
+            resultados.iteraciones[escenario["nombre"]] += 1
+        iteracion += 1
+
+async def lanzar(escenarios: list, clientes: dict, concurrencia: int, duracion: float,
+                 calentamiento: float) -> tuple:
+    reparto = [escenario for escenario in escenarios for _ in range(escenario.get("peso", 1))]
+    resultados = Resultados()
+    ejecucion = uuid4().hex[:8]
+    fin = time.monotonic() + calentamiento + duracion
+    usuarios = [
+        asyncio.create_task(usuario_virtual(n, reparto[n % len(reparto)], clientes, ejecucion, fin, resultados))
+        for n in range(concurrencia)
+    ]
+    # Lo medido durante el calentamiento (pools, cachés de SQLAlchemy) se descarta
+    if calentamiento:
+        resultados.activo = False
+        await asyncio.sleep(calentamiento)
+        resultados.activo = True
+    inicio = time.perf_counter()
+    await asyncio.gather(*usuarios)
+    return resultados, time.perf_counter() - inicio
+
+# --- Objetivos ---
+def _url_bd(plantilla, base_datos: str):
+    return plantilla.format(base=base_datos) if plantilla else os.environ.get("DB_URL")
+
+def _importar(directorio: str, url_bd) -> object:
+    """Importa app.py de un servicio aislado de los demás (comparten nombres de módulo)."""
+    ruta = RAIZ / directorio
+    modulos = {fichero.stem for fichero in ruta.glob("*.py")}
+    for modulo in [m for m in sys.modules if m in modulos or m.split(".")[0] == "comun"]:
+        del sys.modules[modulo]
+    anterior = os.environ.get("DB_URL")
+    if url_bd:
+        os.environ["DB_URL"] = url_bd
+    sys.path.insert(0, str(ruta))
+    try:
+        import app
+        return app.app
+    finally:
+        sys.path.remove(str(ruta))
+        for modulo in [m for m in sys.modules if m in modulos or m.split(".")[0] == "comun"]:
+            del sys.modules[modulo]
+        if anterior is None:
+            os.environ.pop("DB_URL", None)
+        else:
+            os.environ["DB_URL"] = anterior
+
+@asynccontextmanager
+async def objetivo_asgi(args, limites):
+    async with AsyncExitStack() as pila:
+        clientes = {}
+        for servicio, (directorio, base_datos) in SERVICIOS.items():
+            app = _importar(directorio, _url_bd(args.db_url, base_datos))
+            await pila.enter_async_context(app.router.lifespan_context(app))
+            clientes[servicio] = await pila.enter_async_context(httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app), base_url="http://carga", limits=limites, timeout=60.0
+            ))
+        yield clientes
+
+async def esperar_arranque(url: str, limite: float = 30.0) -> None:
+    fin = time.monotonic() + limite
+    async with httpx.AsyncClient() as cliente:
+        while time.monotonic() < fin:
+            try:
+                await cliente.get(url + "/docs")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} no arrancó en {limite} s")
+
+@asynccontextmanager
+async def objetivo_uvicorn(args, limites):
+    servidores, clientes = [], {}
+    async with AsyncExitStack() as pila:
+        try:
+            for desplazamiento, (servicio, (directorio, base_datos)) in enumerate(SERVICIOS.items()):
+                puerto = args.puerto + desplazamiento
+                entorno = dict(os.environ)
+                # El directorio del servicio es el de trabajo; comun, desde la raíz
+                entorno["PYTHONPATH"] = os.pathsep.join(filter(None, [str(RAIZ), entorno.get("PYTHONPATH")]))
+                url_bd = _url_bd(args.db_url, base_datos)
+                if url_bd:
+                    entorno["DB_URL"] = url_bd
+                servidores.append(subprocess.Popen(
+                    [
+                        sys.executable, "-m", "uvicorn", "app:app",
+                        "--port", str(puerto), "--log-level", "warning",
+                        "--backlog", str(max(2048, args.concurrencia * 2))
+                    ],
+                    cwd=RAIZ / directorio,
+                    env=entorno
+                ))
+                base = f"http://127.0.0.1:{puerto}"
+                await esperar_arranque(base)
+                clientes[servicio] = await pila.enter_async_context(
+                    httpx.AsyncClient(base_url=base, limits=limites, timeout=60.0)
+                )
+            yield clientes
+        finally:
+            for servidor in servidores:
+                servidor.terminate()
+                servidor.wait()
+
+OBJETIVOS = {"asgi": objetivo_asgi, "uvicorn": objetivo_uvicorn}
+
+# --- Informe y referencias ---
+def resumir(resultados: Resultados, duracion: float) -> dict:
+    rutas = {}
+    for ruta, latencias in sorted(resultados.latencias.items()):
+        rutas[ruta] = {
+            "peticiones": len(latencias),
+            "errores": resultados.errores[ruta],
+            "rps": len(latencias) / duracion,
+            "media": statistics.fmean(latencias) * 1000,
+            "p50": percentil(latencias, 50) * 1000,
+            "p95": percentil(latencias, 95) * 1000,
+            "p99": percentil(latencias, 99) * 1000,
+        }
+    todas = [latencia for latencias in resultados.latencias.values() for latencia in latencias]
+    total = {
+        "peticiones": len(todas),
+        "errores": sum(resultados.errores.values()),
+        "rps": len(todas) / duracion,
+        "p50": percentil(todas, 50) * 1000,
+        "p95": percentil(todas, 95) * 1000,
+        "p99": percentil(todas, 99) * 1000,
+    }
+    iteraciones = {nombre: n / duracion for nombre, n in sorted(resultados.iteraciones.items())}
+    return {"rutas": rutas, "total": total, "iteraciones_por_segundo": iteraciones}
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocido"
+
+def _maquina() -> dict:
+    return {
+        "nodo": platform.node(),
+        "procesador": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+    }
+
+def _fichero_referencia(nombre: str) -> Path:
+    fichero = Path(nombre)
+    return fichero if fichero.suffix == ".json" else REFERENCIAS / f"{nombre}.json"
+
+def _diferencia(actual: float, antes: float) -> str:
+    return f"{(actual - antes) / antes * 100:+7.1f}%" if antes else "      -"
+
+def imprimir(informe: dict, referencia: dict = None) -> None:
+    c = informe["configuracion"]
+    print(f"{c['objetivo']}, {c['concurrencia']} usuarios, {c['duracion']:.0f} s, "
+          f"escenarios: {', '.join(c['escenarios'])} ({informe['commit']})")
+    columnas = f"{'ruta':<52} {'pet':>7} {'err':>5} {'pet/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    if referencia:
+        columnas += f" {'Δpet/s':>8} {'Δp50':>8} {'Δp99':>8}"
+    print(columnas)
+    filas = list(informe["rutas"].items()) + [("TOTAL", informe["total"])]
+    anteriores = dict(referencia["rutas"], TOTAL=referencia["total"]) if referencia else {}
+    for ruta, r in filas:
+        linea = (f"{ruta:<52} {r['peticiones']:>7} {r['errores']:>5} {r['rps']:>8.1f} "
+                 f"{r['p50']:>8.1f} {r['p95']:>8.1f} {r['p99']:>8.1f}")
+        antes = anteriores.get(ruta)
+        if antes:
+            linea += (f" {_diferencia(r['rps'], antes['rps']):>8} {_diferencia(r['p50'], antes['p50']):>8}"
+                      f" {_diferencia(r['p99'], antes['p99']):>8}")
+        print(linea)
+    for nombre, por_segundo in informe["iteraciones_por_segundo"].items():
+        print(f"escenario {nombre}: {por_segundo:.1f} iteraciones/s")
+    if referencia:
+        if referencia["configuracion"] != c:
+            print("Aviso: la referencia se midió con otra configuración")
+        if referencia["maquina"] != informe["maquina"]:
+            print(f"Aviso: la referencia es de otra máquina ({referencia['maquina']['nodo']})")
+
+async def principal(args) -> dict:
+    escenarios = cargar_escenarios(args.escenarios)
+    limites = httpx.Limits(max_connections=args.concurrencia, max_keepalive_connections=args.concurrencia)
+    async with OBJETIVOS[args.objetivo](args, limites) as clientes:
+        resultados, duracion = await lanzar(
+            escenarios, clientes, args.concurrencia, args.duracion, args.calentamiento
+        )
+    informe = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "maquina": _maquina(),
+        "configuracion": {
+            "objetivo": args.objetivo,
+            "concurrencia": args.concurrencia,
+            "duracion": args.duracion,
+            "escenarios": [escenario["nombre"] for escenario in escenarios],
+        },
+    }
+    informe.update(resumir(resultados, duracion))
+    return informe
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("escenarios", nargs="*", help="Nombres en benchmarks/escenarios o rutas a ficheros (por defecto, todos)")
+    parser.add_argument("--objetivo", default="asgi", choices=sorted(OBJETIVOS))
+    parser.add_argument("--db-url", help="URL de base de datos con {base} (por defecto, la de cada servicio)")
+    parser.add_argument("--puerto", type=int, default=8810, help="Primer puerto con --objetivo uvicorn")
+    parser.add_argument("--concurrencia", type=int, default=20, help="Usuarios virtuales simultáneos")
+    parser.add_argument("--duracion", type=float, default=30.0, help="Segundos medidos")
+    parser.add_argument("--calentamiento", type=float, default=5.0, help="Segundos previos sin medir")
+    parser.add_argument("--guardar", metavar="NOMBRE", help="Guarda el resultado en benchmarks/referencias/NOMBRE.json")
+    parser.add_argument("--comparar", metavar="NOMBRE", help="Compara con una referencia guardada")
+    args = parser.parse_args()
+    args.escenarios = args.escenarios or sorted(fichero.stem for fichero in ESCENARIOS.glob("*.json"))
+
+    referencia = None
+    if args.comparar:
+        referencia = json.loads(_fichero_referencia(args.comparar).read_text(encoding="utf-8"))
+    informe = asyncio.run(principal(args))
+    imprimir(informe, referencia)
+    if args.guardar:
+        fichero = _fichero_referencia(args.guardar)
+        fichero.parent.mkdir(parents=True, exist_ok=True)
+        fichero.write_text(json.dumps(informe, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"Referencia guardada en {fichero}")
+
+if __name__ == "__main__":
+    main()
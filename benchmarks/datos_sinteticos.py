@@ -0,0 +1,273 @@
+"""Llena las bases de datos de los tres servicios con datos sintéticos para benchmarks.
+
+Genera usuarios, hogares con un número de miembros muy desigual (pocos hogares
+grandes, muchos de una o dos personas), tareas repartidas también de forma
+desigual entre hogares, con fechas límite e historial de finalización, y
+asignaciones a miembros del hogar. Los datos son coherentes entre servicios:
+propietarios, miembros, creadores y asignados son usuarios generados.
+
+Todo sale de `--semilla` y `--hasta`, así que dos ejecuciones con los mismos
+argumentos producen las mismas filas (ids incluidos). Las filas se insertan
+por lotes con executemany (INSERT multi-fila en MySQL) sin pasar por la API:
+la contraseña se hashea una sola vez y las tablas derivadas de GestTareas se
+rellenan igual que al crear tareas (cierre de subtareas, clave de orden,
+contadores y estadísticas semanales).
+
+    python benchmarks/datos_sinteticos.py --vaciar --tareas 1000000
+    python benchmarks/datos_sinteticos.py --db-url "sqlite:////tmp/datos/{base}.db" --tareas 100000
+
+Sin `--db-url` cada servicio usa su base de datos de siempre (DB_URL o MySQL
+local); `{base}` se sustituye por gestusuarios, gesthogares o gesttareas.
+"""
+import argparse
+import importlib
+import logging
+import os
+import random
+import sys
+import time
+from bisect import bisect
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import accumulate
+from pathlib import Path
+from types import SimpleNamespace
+from uuid import UUID
+
+from sqlalchemy import insert
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))  # Paquete comun
+
+logger = logging.getLogger("datos_sinteticos")
+
+NOMBRES = ["Ana", "Luis", "Marta", "Javier", "Lucía", "Pablo", "Elena", "Carlos", "Sara", "Diego",
+           "Laura", "Hugo", "Paula", "Álvaro", "Irene", "Jorge", "Nerea", "Raúl", "Clara", "Iván"]
+APELLIDOS = ["García", "López", "Martínez", "Sánchez", "Pérez", "Gómez", "Ruiz", "Díaz", "Moreno",
+             "Muñoz", "Álvarez", "Romero", "Navarro", "Torres", "Domínguez", "Vázquez", "Gil", "Ramos"]
+TAREAS = ["Sacar la basura", "Fregar los platos", "Poner la lavadora", "Tender la ropa",
+          "Hacer la compra", "Limpiar el baño", "Barrer la cocina", "Regar las plantas",
+          "Pasar la aspiradora", "Cambiar las sábanas", "Pagar el recibo de la luz",
+          "Llevar el coche al taller", "Limpiar la nevera", "Planchar", "Sacar al perro"]
+LUGARES = ["del salón", "de la cocina", "del pasillo", "del dormitorio", "de la terraza", ""]
+
+MAX_MIEMBROS = 20
+TAMANO_LOTE = 5000
+
+def _uuid(aleatorio: random.Random) -> str:
+    return str(UUID(int=aleatorio.getrandbits(128), version=4))
+
+def _pareto(aleatorio: random.Random, alfa: float, maximo: int) -> int:
+    """Entero >= 1 con cola larga: la mayoría pequeños y unos pocos muy grandes."""
+    return min(maximo, int(aleatorio.paretovariate(alfa)))
+
+@contextmanager
+def servicio(directorio: str, url_bd, vaciar: bool):
+    """Importa los módulos de un servicio aislado de los demás (comparten nombres de módulo)."""
+    ruta = RAIZ / directorio
+    modulos = {fichero.stem for fichero in ruta.glob("*.py")}
+    for modulo in [m for m in sys.modules if m in modulos or m.split(".")[0] == "comun"]:
+        del sys.modules[modulo]
+    anterior = os.environ.get("DB_URL")
+    if url_bd:
+        os.environ["DB_URL"] = url_bd
+    sys.path.insert(0, str(ruta))
+    try:
+        db_config = importlib.import_module("db_config")
+        models = importlib.import_module("models")
+        if vaciar:
+            models.Base.metadata.drop_all(bind=db_config.engine)
+        # Importar la app crea las tablas y deja a mano sus funciones
+        yield SimpleNamespace(
+            db_config=db_config,
+            models=models,
+            app=importlib.import_module("app"),
+            importar=importlib.import_module
+        )
+        db_config.engine.dispose()
+    finally:
+        sys.path.remove(str(ruta))
+        for modulo in [m for m in sys.modules if m in modulos or m.split(".")[0] == "comun"]:
+            del sys.modules[modulo]
+        if anterior is None:
+            os.environ.pop("DB_URL", None)
+        else:
+            os.environ["DB_URL"] = anterior
+
+def insertar(db, modelo, filas: list) -> None:
+    """INSERT por lotes de TAMANO_LOTE filas, con commit tras cada lote."""
+    for inicio in range(0, len(filas), TAMANO_LOTE):
+        db.execute(insert(modelo.__table__), filas[inicio:inicio + TAMANO_LOTE])
+        db.commit()
+
+# --- Usuarios ---
+def generar_usuarios(s, args, aleatorio: random.Random, inicio: datetime, alta: timedelta) -> list:
+    contraseña = s.app.obtener_hashed_contraseña(args.contraseña)
+    ids = [_uuid(aleatorio) for _ in range(args.usuarios)]
+    filas = [
+        {
+            "id": id_,
+            "nombre": f"{aleatorio.choice(NOMBRES)} {aleatorio.choice(APELLIDOS)}",
+            "correo": f"usuario{i}@ejemplo.com",
+            "contraseña": contraseña,
+            "fecha_registro": inicio + alta * i / args.usuarios,
+        }
+        for i, id_ in enumerate(ids)
+    ]
+    db = s.db_config.SessionLocal()
+    try:
+        insertar(db, s.models.UsuarioDB, filas)
+    finally:
+        db.close()
+    logger.info("%d usuarios (contraseña de todos: %s)", len(filas), args.contraseña)
+    return ids
+
+# --- Hogares ---
+def generar_hogares(s, args, aleatorio: random.Random, usuarios: list, inicio: datetime, alta: timedelta) -> dict:
+    """Devuelve {hogar_id: [miembros]}, con el propietario el primero."""
+    hogares, filas_hogar, filas_miembro = {}, [], []
+    for i in range(args.hogares):
+        hogar_id = _uuid(aleatorio)
+        miembros = aleatorio.sample(usuarios, min(len(usuarios), _pareto(aleatorio, 1.2, MAX_MIEMBROS)))
+        hogares[hogar_id] = miembros
+        filas_hogar.append({
+            "id": hogar_id,
+            "nombre": f"Hogar {aleatorio.choice(APELLIDOS)} {i}",
+            "propietario_id": miembros[0],
+            "fecha_creacion": inicio + alta * i / args.hogares,
+        })
+        filas_miembro.extend(
+            {
+                "id": _uuid(aleatorio),
+                "usuario_id": usuario_id,
+                "hogar_id": hogar_id,
+                "rol": "propietario" if j == 0 else "miembro",
+            }
+            for j, usuario_id in enumerate(miembros)
+        )
+    db = s.db_config.SessionLocal()
+    try:
+        insertar(db, s.models.HogarDB, filas_hogar)
+        insertar(db, s.models.MiembroHogarDB, filas_miembro)
+    finally:
+        db.close()
+    logger.info("%d hogares, %d miembros", len(filas_hogar), len(filas_miembro))
+    return hogares
+
+# --- Tareas ---
+def _tarea(aleatorio: random.Random, hogar_id: str, miembros: list, creada: datetime, hasta: datetime) -> dict:
+    titulo = f"{aleatorio.choice(TAREAS)} {aleatorio.choice(LUGARES)}".strip()
+    fecha_limite = None
+    if aleatorio.random() < 0.6:
+        fecha_limite = (creada + timedelta(days=aleatorio.randint(1, 21))).replace(minute=0, second=0, microsecond=0)
+    # Lo antiguo casi siempre está hecho; lo reciente, menos
+    antiguedad = (hasta - creada).days
+    fecha_completada = None
+    if aleatorio.random() < (0.9 if antiguedad > 30 else 0.35):
+        # A veces a tiempo y a veces con retraso respecto a la fecha límite
+        fecha_completada = min(hasta, creada + timedelta(hours=aleatorio.expovariate(1 / 72)))
+    return {
+        "id": _uuid(aleatorio),
+        "titulo": titulo,
+        "descripcion": f"Generada para pruebas de rendimiento ({titulo.lower()})" if aleatorio.random() < 0.3 else None,
+        "fecha_asignacion": creada,
+        "fecha_limite": fecha_limite,
+        "completada": fecha_completada is not None,
+        "fecha_completada": fecha_completada,
+        "creador_id": aleatorio.choice(miembros),
+        "hogar_id": hogar_id,
+        "padre_id": None,
+        "total_subtareas": 0,
+        "subtareas_completadas": 0,
+    }
+
+def generar_tareas(s, args, aleatorio: random.Random, hogares: dict, desde: datetime, hasta: datetime) -> None:
+    orden = s.importar("orden")
+    subtareas = s.importar("subtareas")
+    conteos = s.importar("conteos")
+    estadisticas = s.importar("estadisticas")
+    models = s.models
+
+    # Unos pocos hogares concentran buena parte de las tareas
+    hogar_ids = list(hogares)
+    pesos = list(accumulate(len(hogares[h]) * aleatorio.paretovariate(1.5) for h in hogar_ids))
+    ultimas_claves = {}
+    cambios = defaultdict(lambda: [0, 0])  # (hogar_id, fecha_limite): [abiertas, completadas]
+    asignaciones = 0
+    periodo = hasta - desde
+
+    db = s.db_config.SessionLocal()
+    try:
+        for inicio_lote in range(0, args.tareas, TAMANO_LOTE):
+            tareas, filas_asignacion = [], []
+            for n in range(inicio_lote, min(args.tareas, inicio_lote + TAMANO_LOTE)):
+                hogar_id = hogar_ids[bisect(pesos, aleatorio.random() * pesos[-1])]
+                miembros = hogares[hogar_id]
+                # Creadas en orden cronológico: su clave de orden manual sigue ese orden
+                tarea = _tarea(aleatorio, hogar_id, miembros, desde + periodo * n / args.tareas, hasta)
+                tarea["rango"] = ultimas_claves[hogar_id] = orden.clave_entre(ultimas_claves.get(hogar_id), None)
+                tareas.append(tarea)
+                _, fecha_limite, abiertas, completadas = conteos.estado(hogar_id, tarea["fecha_limite"], tarea["completada"])
+                cambio = cambios[(hogar_id, fecha_limite if abiertas else None)]
+                cambio[0] += abiertas
+                cambio[1] += completadas
+                cantidad = aleatorio.choices((0, 1, 2), weights=(30, 55, 15))[0]
+                filas_asignacion.extend(
+                    {"id": _uuid(aleatorio), "tarea_id": tarea["id"], "usuario_id": usuario_id}
+                    for usuario_id in aleatorio.sample(miembros, min(cantidad, len(miembros)))
+                )
+            db.execute(insert(models.TareaDB.__table__), tareas)
+            subtareas.registrar_raices(db, [tarea["id"] for tarea in tareas])
+            db.execute(insert(models.AsignacionDB.__table__), filas_asignacion)
+            db.commit()
+            asignaciones += len(filas_asignacion)
+            logger.info("%d/%d tareas", inicio_lote + len(tareas), args.tareas)
+
+        conteos.aplicar(db, (
+            (hogar_id, fecha_limite, abiertas, completadas)
+            for (hogar_id, fecha_limite), (abiertas, completadas) in cambios.items()
+        ))
+        db.commit()
+        logger.info("%d tareas, %d asignaciones, contadores de %d hogares", args.tareas, asignaciones,
+                    len({hogar_id for hogar_id, _ in cambios}))
+        estadisticas.recalcular(db)
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--usuarios", type=int, default=100_000)
+    parser.add_argument("--hogares", type=int, default=40_000)
+    parser.add_argument("--tareas", type=int, default=1_000_000)
+    parser.add_argument("--dias", type=int, default=365, help="Días de historial de tareas")
+    parser.add_argument("--hasta", type=datetime.fromisoformat, default=datetime(2026, 1, 1),
+                        help="Fecha de la última tarea (ISO); fija para que los datos sean reproducibles")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--contraseña", default="secreta123")
+    parser.add_argument("--db-url", help="URL de base de datos con {base} (por defecto, la de cada servicio)")
+    parser.add_argument("--vaciar", action="store_true", help="Borra y crea de nuevo las tablas antes de cargar")
+    args = parser.parse_args()
+    logging.basicConfig(format="%(asctime)s %(message)s")
+    logger.setLevel(logging.INFO)
+    # Los INSERT de miles de filas no son "sentencias lentas" que haya que avisar
+    os.environ.setdefault("PERFIL_MODO", "apagado")
+
+    def url_bd(base_datos):
+        return args.db_url.format(base=base_datos) if args.db_url else None
+
+    aleatorio = random.Random(args.semilla)
+    # Usuarios y hogares se dan de alta en el primer mes; las tareas cubren todo el periodo
+    desde = args.hasta - timedelta(days=args.dias)
+    alta = timedelta(days=min(30, args.dias))
+    comienzo = time.perf_counter()
+    with servicio("GestUsuarios", url_bd("gestusuarios"), args.vaciar) as s:
+        usuarios = generar_usuarios(s, args, aleatorio, desde - alta, alta)
+    with servicio("GestHogares", url_bd("gesthogares"), args.vaciar) as s:
+        hogares = generar_hogares(s, args, aleatorio, usuarios, desde - alta, alta)
+    with servicio("GestTareas", url_bd("gesttareas"), args.vaciar) as s:
+        generar_tareas(s, args, aleatorio, hogares, desde, args.hasta)
+    logger.info("Terminado en %.0f s", time.perf_counter() - comienzo)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Memoria y CPU por petición del listado de tareas de un hogar grande.
+
+Crea en un SQLite temporal un hogar con `--tareas` tareas (con descripciones
+de varios KB) y mide la lectura de una página de `--limite` filas más su
+serialización por tres caminos:
+
+- entidades: select(TareaDB), objetos ORM completos en el mapa de identidad;
+- columnas: solo las columnas de TareaResponse menos la descripción, como
+  filas simples (lo que hace GET /tareas/ por defecto);
+- columnas+descripcion: lo mismo con la descripción (?incluir_descripcion=true).
+
+Para cada uno: tiempo de CPU (mediana) y pico de memoria asignada durante la
+petición (tracemalloc).
+
+    python benchmarks/listados.py --tareas 20000 --limite 1000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import insert, select
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))  # Paquete comun
+HOGAR = "hogar-grande"
+
+def sembrar(db_config, models, tareas: int) -> None:
+    aleatorio = random.Random(1)
+    inicio = datetime(2025, 1, 1)
+    db = db_config.SessionLocal()
+    for desde in range(0, tareas, 5000):
+        db.execute(insert(models.TareaDB.__table__), [
+            {
+                "id": f"t{n:08d}", "titulo": f"Tarea {n}",
+                "descripcion": "Pasos a seguir. " * aleatorio.randint(60, 250),
+                "fecha_asignacion": inicio + timedelta(minutes=n), "completada": n % 3 == 0,
+                "creador_id": "usuario-1", "hogar_id": HOGAR, "rango": f"a{n:08d}",
+                "total_subtareas": 0, "subtareas_completadas": 0,
+            }
+            for n in range(desde, min(tareas, desde + 5000))
+        ])
+    db.commit()
+    db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tareas", type=int, default=20000)
+    parser.add_argument("--limite", type=int, default=1000)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix="listados")
+    os.environ["DB_URL"] = f"sqlite:///{directorio}/gesttareas.db"
+    os.environ.setdefault("PERFIL_MODO", "apagado")
+    sys.path.insert(0, str(RAIZ / "GestTareas"))
+    import app  # noqa: F401  (crea las tablas)
+    import archivo
+    import db_config
+    import models
+    from comun import paginacion
+    from comun import serializacion
+    from fastapi import Response
+
+    sembrar(db_config, models, args.tareas)
+    TareaDB = models.TareaDB
+    caminos = {
+        "entidades": ([(select(TareaDB).where(TareaDB.hogar_id == HOGAR), TareaDB.fecha_asignacion, TareaDB.id)], ()),
+        "columnas": (archivo.fuentes_tareas(HOGAR, excluir=("descripcion",)), ("descripcion",)),
+        "columnas+descripcion": (archivo.fuentes_tareas(HOGAR), ()),
+    }
+
+    def peticion(fuentes, excluir) -> int:
+        db = db_config.SessionLocal()
+        try:
+            pagina = paginacion.paginar(db, fuentes, None, args.limite)
+            return len(serializacion.listado(Response(), models.TareaResponse, pagina.filas, excluir=excluir).body)
+        finally:
+            db.close()
+
+    print(f"Hogar con {args.tareas} tareas, página de {args.limite} filas")
+    print(f"{'camino':<22} {'CPU ms':>8} {'memoria KB':>11} {'cuerpo KB':>10}")
+    for nombre, (fuentes, excluir) in caminos.items():
+        peticion(fuentes, excluir)  # Calentamiento (caché de sentencias compiladas)
+        tiempos = []
+        for _ in range(args.repeticiones):
+            inicio = time.process_time()
+            cuerpo = peticion(fuentes, excluir)
+            tiempos.append(time.process_time() - inicio)
+        tracemalloc.start()
+        peticion(fuentes, excluir)
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{nombre:<22} {statistics.median(tiempos) * 1000:>8.1f} {pico / 1024:>11.0f} {cuerpo / 1024:>10.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Microbenchmark de la serialización de respuestas de listado.
+
+Para cada esquema de listado construye `--filas` objetos ORM en memoria (sin
+base de datos) y mide el tiempo de CPU de convertirlos en el cuerpo JSON de
+la respuesta por tres caminos:
+
+- fastapi: el de siempre con response_model=List[...] (validación de cada fila,
+  conversión a tipos JSON y json.dumps), usando el campo de respuesta de la
+  ruta real;
+- validado: serializacion.listado(..., validar=True), un TypeAdapter en caché
+  que valida y vuelca la lista entera;
+- rapido: serializacion.listado(...), sin validar y con orjson.
+
+Comprueba además que los tres producen el mismo JSON.
+
+    python benchmarks/serializacion.py --filas 1000 --repeticiones 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from uuid import uuid4
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))  # Paquete comun
+
+def _usuario(models, i, inicio):
+    return models.UsuarioDB(
+        id=str(uuid4()), nombre=f"Usuario {i}", correo=f"usuario{i}@ejemplo.com",
+        contraseña="x" * 60, fecha_registro=inicio + timedelta(seconds=i)
+    )
+
+def _hogar(models, i, inicio):
+    return models.HogarDB(
+        id=str(uuid4()), nombre=f"Hogar {i}", propietario_id=str(uuid4()),
+        fecha_creacion=inicio + timedelta(seconds=i)
+    )
+
+def _miembro(models, i, inicio):
+    return models.MiembroHogarDB(
+        id=str(uuid4()), usuario_id=str(uuid4()), hogar_id="hogar-1",
+        rol="propietario" if i == 0 else "miembro"
+    )
+
+def _tarea(models, i, inicio):
+    return models.TareaDB(
+        id=str(uuid4()), titulo=f"Tarea {i}", descripcion="Descripción de la tarea" if i % 3 else None,
+        fecha_asignacion=inicio + timedelta(minutes=i),
+        fecha_limite=inicio + timedelta(days=i % 30) if i % 2 else None,
+        completada=i % 4 == 0, fecha_completada=inicio + timedelta(days=1) if i % 4 == 0 else None,
+        creador_id=str(uuid4()), hogar_id="hogar-1", rango=f"a{i:06d}", padre_id=None,
+        total_subtareas=0, subtareas_completadas=0
+    )
+
+def _asignacion(models, i, inicio):
+    return models.AsignacionDB(id=str(uuid4()), tarea_id="tarea-1", usuario_id=str(uuid4()))
+
+# servicio: [(ruta GET, fábrica de filas)]
+CASOS = {
+    "GestUsuarios": [("/usuarios/", _usuario)],
+    "GestHogares": [("/hogares/", _hogar), ("/hogares/{hogar_id}/miembros", _miembro)],
+    "GestTareas": [("/tareas/", _tarea), ("/tareas/{tarea_id}/asignaciones", _asignacion)],
+}
+
+def _importar(directorio: str):
+    """Importa app y serializacion de un servicio aislado de los demás (comparten nombres de módulo)."""
+    ruta = RAIZ / directorio
+    modulos = {fichero.stem for fichero in ruta.glob("*.py")}
+    for modulo in [m for m in sys.modules if m in modulos or m.split(".")[0] == "comun"]:
+        del sys.modules[modulo]
+    sys.path.insert(0, str(ruta))
+    try:
+        import app
+        import models
+        from comun import serializacion
+        return app.app, models, serializacion
+    finally:
+        sys.path.remove(str(ruta))
+        for modulo in [m for m in sys.modules if m in modulos or m.split(".")[0] == "comun"]:
+            del sys.modules[modulo]
+
+def _cpu(funcion, repeticiones: int) -> list:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.process_time()
+        funcion()
+        tiempos.append(time.process_time() - inicio)
+    return tiempos
+
+def medir(directorio: str, args) -> list:
+    from fastapi import Response
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+
+    app, models, serializacion = _importar(directorio)
+    rutas = {ruta.path: ruta for ruta in app.routes if "GET" in getattr(ruta, "methods", ())}
+    inicio = datetime(2026, 1, 1)
+    resultados = []
+    for path, fabrica in CASOS[directorio]:
+        ruta = rutas[path]
+        esquema = ruta.response_model.__args__[0]
+        filas = [fabrica(models, i, inicio) for i in range(args.filas)]
+        bucle = asyncio.new_event_loop()
+
+        def fastapi():
+            contenido = bucle.run_until_complete(
+                serialize_response(field=ruta.response_field, response_content=filas, is_coroutine=True)
+            )
+            return JSONResponse(contenido).body
+
+        caminos = {
+            "fastapi": fastapi,
+            "validado": lambda: serializacion.listado(Response(), esquema, filas, validar=True).body,
+            "rapido": lambda: serializacion.listado(Response(), esquema, filas).body,
+        }
+        referencia = json.loads(fastapi())
+        for nombre, camino in caminos.items():
+            assert json.loads(camino()) == referencia, f"{path}: {nombre} no produce el mismo JSON"
+        tiempos = {nombre: _cpu(camino, args.repeticiones) for nombre, camino in caminos.items()}
+        bucle.close()
+        resultados.append((f"GET {path}", esquema.__name__, tiempos))
+    return resultados
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filas", type=int, default=1000)
+    parser.add_argument("--repeticiones", type=int, default=50)
+    args = parser.parse_args()
+    # Sin base de datos real: los objetos ORM se crean en memoria
+    os.environ["DB_URL"] = "sqlite://"
+    os.environ.setdefault("PERFIL_MODO", "apagado")
+
+    print(f"CPU por respuesta de {args.filas} filas (mediana de {args.repeticiones}), ms")
+    print(f"{'ruta':<36} {'esquema':<22} {'fastapi':>8} {'validado':>9} {'rapido':>8} {'mejora':>7}")
+    for directorio in CASOS:
+        for ruta, esquema, tiempos in medir(directorio, args):
+            medianas = {nombre: statistics.median(valores) * 1000 for nombre, valores in tiempos.items()}
+            print(f"{ruta:<36} {esquema:<22} {medianas['fastapi']:>8.2f} {medianas['validado']:>9.2f} "
+                  f"{medianas['rapido']:>8.2f} {medianas['fastapi'] / medianas['rapido']:>6.1f}x")
+
+if __name__ == "__main__":
+    main()
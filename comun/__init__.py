@@ -0,0 +1,14 @@
+"""Código compartido por GestUsuarios, GestHogares y GestTareas.
+
+Cada servicio importa estos módulos desde el paquete (`from comun.actualizacion
+import actualizar_parcial`) en lugar de tener su propia copia. El paquete se
+instala en el entorno de cada servicio desde la raíz del repositorio:
+
+    pip install -e ..      (desde el directorio del servicio)
+
+El requirements.txt de cada servicio ya incluye esa línea, así que basta con
+`pip install -r <servicio>/requirements.txt` ejecutado desde el directorio
+del servicio.
+
+Las pruebas y los benchmarks lo importan directamente desde la raíz.
+"""
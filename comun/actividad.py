@@ -0,0 +1,172 @@
+"""Registro de actividad por hogar (tabla de eventos de solo inserción).
+
+Cada cambio se registra en la misma transacción que lo produce. La lectura
+de los últimos eventos de un hogar es un único recorrido por el índice
+(hogar_id, id); los eventos antiguos se compactan en resúmenes por día.
+
+Cada servicio declara sus tablas con las columnas de ColumnasActividad y
+ColumnasResumen sobre su propia Base y usa un Registro ligado a ellas:
+    actividad = Registro(models.ActividadDB, models.ResumenActividadDB)
+
+Compactación (cron, desde el directorio del servicio):
+    python -m comun.actividad --dias 30
+"""
+import argparse
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, List, Optional
+
+from pydantic import BaseModel
+from sqlalchemy import (
+    TIMESTAMP, BigInteger, Column, Date, Index, Integer, String, and_, delete, func, insert, literal, select
+)
+from sqlalchemy.orm import Session, declared_attr
+
+logger = logging.getLogger(__name__)
+
+# --- Tablas ---
+class ColumnasActividad:
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    hogar_id = Column(String(36), nullable=False)
+    tipo = Column(String(50), nullable=False)
+    entidad_id = Column(String(36))
+    usuario_id = Column(String(36))
+    detalle = Column(String(255))
+    fecha = Column(TIMESTAMP, server_default=func.now(), index=True)
+
+    @declared_attr
+    def __table_args__(cls):
+        # Últimos eventos del hogar: un recorrido de rango por este índice
+        return (Index("ix_actividad_hogar_id", "hogar_id", "id"),)
+
+class ColumnasResumen:
+    hogar_id = Column(String(36), primary_key=True)
+    dia = Column(Date, primary_key=True)
+    tipo = Column(String(50), primary_key=True)
+    cantidad = Column(Integer, nullable=False, default=0)
+
+# --- Esquemas de respuesta ---
+class ActividadResponse(BaseModel):
+    id: int
+    hogar_id: str
+    tipo: str
+    entidad_id: Optional[str] = None
+    usuario_id: Optional[str] = None
+    detalle: Optional[str] = None
+    fecha: datetime
+
+    class Config:
+        from_attributes = True
+
+class PaginaActividad(BaseModel):
+    eventos: List[ActividadResponse]
+    siguiente_cursor: Optional[int] = None
+
+class ResumenActividadResponse(BaseModel):
+    dia: date
+    tipo: str
+    cantidad: int
+
+    class Config:
+        from_attributes = True
+
+class Registro:
+    """Lectura, escritura y compactación de la actividad sobre las tablas de un servicio."""
+    def __init__(self, evento, resumen):
+        self.evento = evento
+        self.resumen = resumen
+
+    def registrar(
+        self,
+        db: Session,
+        hogar_id: str,
+        tipo: str,
+        entidad_id: Optional[str] = None,
+        usuario_id: Optional[str] = None,
+        detalle: Optional[str] = None
+    ) -> None:
+        """Añade un evento a la transacción en curso (no hace commit)."""
+        db.add(self.evento(
+            hogar_id=hogar_id,
+            tipo=tipo,
+            entidad_id=entidad_id,
+            usuario_id=usuario_id,
+            detalle=detalle[:255] if detalle else detalle
+        ))
+
+    def registrar_varios(self, db: Session, eventos: Iterable[dict]) -> None:
+        """Inserta varios eventos con un solo INSERT multi-fila."""
+        eventos = list(eventos)
+        if eventos:
+            db.execute(insert(self.evento), eventos)
+
+    def listar(self, db: Session, hogar_id: str, cursor: Optional[int] = None, limite: int = 50) -> list:
+        """Eventos del hogar del más reciente al más antiguo, anteriores a `cursor` (id del último visto)."""
+        evento = self.evento
+        consulta = select(evento).where(evento.hogar_id == hogar_id)
+        if cursor is not None:
+            consulta = consulta.where(evento.id < cursor)
+        consulta = consulta.order_by(evento.id.desc()).limit(limite)
+        return db.execute(consulta).scalars().all()
+
+    def listar_resumen(self, db: Session, hogar_id: str, desde=None, hasta=None) -> list:
+        resumen = self.resumen
+        consulta = select(resumen).where(resumen.hogar_id == hogar_id)
+        if desde is not None:
+            consulta = consulta.where(resumen.dia >= desde)
+        if hasta is not None:
+            consulta = consulta.where(resumen.dia <= hasta)
+        return db.execute(consulta.order_by(resumen.dia.desc())).scalars().all()
+
+    # --- Compactación ---
+    def compactar(self, db: Session, dias: int = 30) -> int:
+        """Resume por (hogar, día, tipo) los eventos de días completos con más de `dias` días
+        de antigüedad y borra los eventos originales. Un día por transacción."""
+        evento = self.evento
+        limite = datetime.combine(datetime.now().date() - timedelta(days=dias), time.min)
+        compactados = 0
+        while True:
+            primero = db.execute(
+                select(evento.fecha).where(evento.fecha < limite)
+                .order_by(evento.fecha).limit(1)
+            ).scalar()
+            if primero is None:
+                break
+            inicio = datetime.combine(primero.date(), time.min)
+            fin = inicio + timedelta(days=1)
+            en_el_dia = and_(evento.fecha >= inicio, evento.fecha < fin)
+
+            db.execute(
+                insert(self.resumen).from_select(
+                    ["hogar_id", "dia", "tipo", "cantidad"],
+                    select(
+                        evento.hogar_id,
+                        literal(inicio.date(), Date),
+                        evento.tipo,
+                        func.count()
+                    ).where(en_el_dia).group_by(evento.hogar_id, evento.tipo)
+                )
+            )
+            borrados = db.execute(delete(evento).where(en_el_dia)).rowcount
+            db.commit()
+            compactados += borrados
+            logger.info("Día %s compactado (%d eventos)", inicio.date(), borrados)
+        return compactados
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compacta la actividad antigua en resúmenes diarios")
+    parser.add_argument("--dias", type=int, default=30, help="Días de actividad detallada que se conservan")
+    args = parser.parse_args()
+
+    # Módulos del servicio desde cuyo directorio se lanza
+    import db_config
+    import models
+
+    logging.basicConfig(level=logging.INFO)
+    db_config.Base.metadata.create_all(bind=db_config.engine)
+    db = db_config.SessionLocal()
+    try:
+        total = Registro(models.ActividadDB, models.ResumenActividadDB).compactar(db, args.dias)
+    finally:
+        db.close()
+    print(f"Eventos compactados: {total}")
@@ -0,0 +1,36 @@
+"""Actualización parcial con un único UPDATE.
+
+Los PATCH de los servicios aplican solo los campos enviados con
+`UPDATE ... WHERE id = :id [AND condiciones]` en lugar de cargar la fila,
+modificarla y volver a leerla tras el commit. Si el dialecto admite
+UPDATE ... RETURNING (SQLite, PostgreSQL) la fila actualizada vuelve en la
+misma sentencia; si no (MySQL, MariaDB) se relee por clave primaria solo si
+el UPDATE tocó alguna fila.
+"""
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+def actualizar_parcial(db: Session, modelo, id_: str, valores: dict, condiciones: list = ()):
+    """Aplica `valores` con un único UPDATE a la fila `id_` si cumple además `condiciones` y
+    devuelve la fila actualizada, o None si no coincide. El commit lo hace quien llama."""
+    condiciones = [modelo.id == id_, *condiciones]
+    if not valores:
+        return db.query(modelo).filter(*condiciones).first()
+
+    sentencia = (
+        update(modelo).where(*condiciones).values(**valores)
+        .execution_options(synchronize_session=False)
+    )
+    if db.bind.dialect.update_returning:
+        # El driver devuelve la fila en la misma sentencia (sin SELECT extra)
+        fila = db.execute(sentencia.returning(modelo)).scalar_one_or_none()
+    elif db.execute(sentencia).rowcount:
+        # Solo por clave primaria: tras el UPDATE las condiciones pueden haber dejado de cumplirse
+        fila = db.get(modelo, id_, populate_existing=True)
+    else:
+        fila = None
+
+    # Desvincular la fila para que el commit no la expire y no haga falta refrescarla
+    if fila is not None:
+        db.expunge(fila)
+    return fila
@@ -0,0 +1,70 @@
+"""Endpoints asíncronos sobre el motor async (DB_MODO=async).
+
+En modo síncrono cada petición ocupa un hilo del threadpool de AnyIO mientras
+espera a MySQL. Con DB_MODO=async, la clase de `ruta(db_config)` convierte
+al registrarlo cada endpoint que dependa de `db_config.get_db` en un
+`async def` que recibe una AsyncSession (driver aiomysql) y ejecuta el
+cuerpo original con `AsyncSession.run_sync`: el código sigue usando la API
+síncrona de la sesión, pero cada consulta cede el bucle de eventos en lugar
+de bloquear un hilo.
+
+Los endpoints que gastan CPU (p. ej. bcrypt) se marcan con @en_hilo y siguen
+en el threadpool con el motor síncrono, que existe en ambos modos. Las
+exportaciones en streaming, el escritor por lotes y las tareas en segundo
+plano también usan el motor síncrono.
+
+Cada servicio la instala con su db_config:
+    app.router.route_class = asincrono.ruta(db_config)
+"""
+import functools
+import inspect
+from types import ModuleType
+from typing import Callable, Type
+
+from fastapi import Depends, params
+from fastapi.routing import APIRoute
+
+def en_hilo(endpoint: Callable) -> Callable:
+    """Mantiene el endpoint síncrono (en el threadpool) también en modo asíncrono."""
+    endpoint.en_hilo = True
+    return endpoint
+
+def _parametro_db(endpoint: Callable, db_config: ModuleType):
+    for parametro in inspect.signature(endpoint).parameters.values():
+        if isinstance(parametro.default, params.Depends) and parametro.default.dependency is db_config.get_db:
+            return parametro
+    return None
+
+def envolver(endpoint: Callable, db_config: ModuleType) -> Callable:
+    """Versión async del endpoint: misma firma, pero con AsyncSession en lugar de Session."""
+    firma = inspect.signature(endpoint)
+    nombre_db = _parametro_db(endpoint, db_config).name
+
+    async def envoltura(**kwargs):
+        db = kwargs.pop(nombre_db)
+        return await db.run_sync(lambda sesion: endpoint(**kwargs, **{nombre_db: sesion}))
+
+    functools.update_wrapper(envoltura, endpoint)
+    del envoltura.__wrapped__  # FastAPI debe leer la firma nueva, no la del original
+    envoltura.__signature__ = firma.replace(parameters=[
+        parametro.replace(default=Depends(db_config.get_db_async)) if parametro.name == nombre_db else parametro
+        for parametro in firma.parameters.values()
+    ])
+    return envoltura
+
+class RutaAsincrona(APIRoute):
+    db_config: ModuleType  # Lo fija ruta()
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if (
+            self.db_config.MODO_ASYNC
+            and not inspect.iscoroutinefunction(endpoint)
+            and not getattr(endpoint, "en_hilo", False)
+            and _parametro_db(endpoint, self.db_config) is not None
+        ):
+            endpoint = envolver(endpoint, self.db_config)
+        super().__init__(path, endpoint, **kwargs)
+
+def ruta(db_config: ModuleType) -> Type[RutaAsincrona]:
+    """Clase de ruta ligada al db_config del servicio (get_db, get_db_async y MODO_ASYNC)."""
+    return type("RutaAsincrona", (RutaAsincrona,), {"db_config": db_config})
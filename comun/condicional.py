@@ -0,0 +1,77 @@
+"""Peticiones condicionales (ETag / If-None-Match) en las lecturas.
+
+Los clientes vuelven a pedir las mismas entidades y páginas una y otra vez,
+casi siempre sin cambios. Cada lectura lleva un ETag fuerte derivado de
+versiones baratas de obtener, y con If-None-Match se responde 304 sin leer
+ni serializar el cuerpo:
+
+- una entidad: su columna `version`, que sube con cada UPDATE (también los
+  de Core); basta leerla por clave primaria;
+- un listado: los parámetros de la consulta, el total anunciado, el cursor
+  siguiente y el id y la versión de cada fila de la página. Con
+  If-None-Match se lee primero la página solo con esas columnas (`estrechar`)
+  y el resto de columnas solo si ha cambiado.
+
+`Cache-Control: no-cache` permite a los clientes y proxies guardar la
+respuesta, pero obliga a revalidarla en cada uso.
+"""
+import hashlib
+from typing import List, Optional
+
+from fastapi import Request, Response, status
+
+from comun.paginacion import Fuente, Pagina
+
+def etag(*partes) -> str:
+    """ETag fuerte: resumen de las partes (ids, versiones, parámetros de la consulta)."""
+    return '"%s"' % hashlib.blake2b(repr(partes).encode(), digest_size=12).hexdigest()
+
+def coincide(if_none_match: Optional[str], valor: str) -> bool:
+    """Comparación débil de If-None-Match (RFC 9110)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidato.strip().removeprefix("W/") == valor
+        for candidato in if_none_match.split(",")
+    )
+
+def anunciar(response: Response, valor: str) -> None:
+    response.headers["ETag"] = valor
+    response.headers["Cache-Control"] = "no-cache"
+
+def comprobar(response: Response, if_none_match: Optional[str], valor: str) -> Optional[Response]:
+    """Anuncia el ETag y devuelve la respuesta 304 si el cliente ya tiene esa versión;
+    None si hay que enviar el cuerpo."""
+    anunciar(response, valor)
+    if not coincide(if_none_match, valor):
+        return None
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={
+        "ETag": valor, "Cache-Control": response.headers["Cache-Control"]
+    })
+
+# --- Listados ---
+def estrechar(fuentes: List[Fuente]) -> List[Fuente]:
+    """Las mismas consultas leyendo solo el id, la clave de orden y, si la leen, la versión."""
+    estrechas = []
+    for consulta, clave, id_ in fuentes:
+        claves = {id_.key, clave.key, "version"}
+        estrechas.append((
+            consulta.with_only_columns(*(c for c in consulta.selected_columns if c.key in claves)),
+            clave, id_
+        ))
+    return estrechas
+
+def _huella(fila) -> tuple:
+    if not hasattr(fila, "_mapping"):
+        return (fila, None)  # Consulta de una sola columna: el id
+    return (fila.id, fila._mapping.get("version"))
+
+def de_pagina(request: Request, response: Response, pagina: Pagina) -> str:
+    """ETag de una página: parámetros, total anunciado, cursor siguiente e id y versión de cada fila.
+    Es el mismo con la consulta completa y con la estrechada."""
+    return etag(
+        request.url.query, response.headers.get("X-Total-Count"), pagina.siguiente,
+        [_huella(fila) for fila in pagina.filas]
+    )
@@ -0,0 +1,140 @@
+"""Respuestas de listado en streaming (JSON, NDJSON o CSV).
+
+El formato se elige con `?formato=json|ndjson|csv` o con la cabecera Accept
+(application/x-ndjson, text/csv). Las filas se leen con un cursor del lado
+del servidor (`yield_per`) y se codifican lote a lote, así que la memoria
+usada depende del tamaño del lote y no del número de filas, y el primer
+byte sale en cuanto llega el primer lote.
+
+Como en los listados (ver comun/serializacion.py), las filas no se validan
+contra el esquema en ningún formato: el CSV sale de `serializacion.volcar`
+y las fechas se escriben en ISO 8601, como en el JSON.
+
+Las filas se leen con una sesión propia que se abre con `sesiones`, la
+fábrica de sesiones del servicio (db_config.SessionLocal).
+"""
+import csv
+import io
+from datetime import date
+from typing import Callable, Iterable, Iterator, List, Optional, Type
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from comun import serializacion
+
+TIPOS = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+# Tipos de Accept que activan el streaming (application/json mantiene la respuesta normal)
+ACEPTADOS = {
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/ndjson": "ndjson",
+    "text/csv": "csv",
+}
+PATRON_FORMATO = "^(json|ndjson|csv)$"
+
+def formato_pedido(formato: Optional[str], accept: Optional[str]) -> Optional[str]:
+    """Formato de streaming pedido, o None para la respuesta JSON de siempre."""
+    if formato:
+        return formato
+    if not accept:
+        return None
+    preferencias = []
+    for orden, parte in enumerate(accept.split(",")):
+        tipo, *parametros = [trozo.strip() for trozo in parte.split(";")]
+        calidad = 1.0
+        for parametro in parametros:
+            if parametro.startswith("q="):
+                try:
+                    calidad = float(parametro[2:])
+                except ValueError:
+                    calidad = 0.0
+        preferencias.append((-calidad, orden, tipo.lower()))
+    for _, _, tipo in sorted(preferencias):
+        if tipo in ACEPTADOS:
+            return ACEPTADOS[tipo]
+        if tipo in ("application/json", "*/*", "application/*"):
+            return None
+    return None
+
+def _filas(sesiones: Callable[[], Session], consultas: List[Select], tamano_lote: int) -> Iterator[list]:
+    # Sesión propia: el generador se consume después de cerrarse la de la petición
+    db = sesiones()
+    try:
+        for consulta in consultas:
+            resultado = db.execute(consulta.execution_options(yield_per=tamano_lote))
+            for lote in resultado.partitions():
+                yield lote
+                db.expunge_all()  # Que el mapa de identidad no retenga los lotes ya enviados
+    finally:
+        db.close()
+
+def _entidades(lote: list) -> list:
+    # select(Modelo) devuelve filas de un elemento; select(col, ...) filas con atributos
+    return [fila[0] if len(fila) == 1 else fila for fila in lote]
+
+def _celda(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, date):  # También datetime
+        return valor.isoformat()
+    return valor
+
+def codificar(
+    sesiones: Callable[[], Session],
+    consultas: List[Select],
+    esquema: Type[BaseModel],
+    formato: str,
+    tamano_lote: int = 1000
+) -> Iterable[bytes]:
+    campos = list(esquema.model_fields)
+    if formato == "json":
+        yield b"["
+    elif formato == "csv":
+        salida = io.StringIO()
+        csv.writer(salida).writerow(campos)
+        yield salida.getvalue().encode("utf-8")
+
+    primero = True
+    for lote in _filas(sesiones, consultas, tamano_lote):
+        entidades = _entidades(lote)
+        if formato == "csv":
+            salida = io.StringIO()
+            escritor = csv.writer(salida)
+            escritor.writerows(
+                [_celda(valores[campo]) for campo in campos] for valores in serializacion.volcar(esquema, entidades)
+            )
+            yield salida.getvalue().encode("utf-8")
+        elif formato == "ndjson":
+            yield b"".join(serializacion.a_json(fila) + b"\n" for fila in serializacion.volcar(esquema, entidades))
+        else:
+            trozo = serializacion.a_json(serializacion.volcar(esquema, entidades))[1:-1]
+            if trozo:
+                yield trozo if primero else b"," + trozo
+                primero = False
+
+    if formato == "json":
+        yield b"]"
+
+def respuesta(
+    sesiones: Callable[[], Session],
+    consultas: List[Select],
+    esquema: Type[BaseModel],
+    formato: str,
+    nombre: str,
+    tamano_lote: int = 1000
+) -> StreamingResponse:
+    cabeceras = {}
+    if formato == "csv":
+        cabeceras["Content-Disposition"] = f'attachment; filename="{nombre}.csv"'
+    return StreamingResponse(
+        codificar(sesiones, consultas, esquema, formato, tamano_lote),
+        media_type=TIPOS[formato],
+        headers=cabeceras
+    )
@@ -0,0 +1,309 @@
+"""Métricas de las peticiones en formato de exposición de Prometheus (GET /metrics).
+
+Por cada ruta (método y plantilla, p. ej. GET /tareas/{tarea_id}) se cuentan
+las peticiones por clase de estado y se guardan histogramas de latencia,
+tamaño de respuesta y sentencias SQL ejecutadas, además de las peticiones en
+curso. También se exporta la ocupación del threadpool de AnyIO (donde corren
+los endpoints síncronos) y las métricas de los pools de conexiones de
+comun/conexiones.py.
+
+Todos los valores viven en un bloque de doubles reservado al arrancar: cada
+ruta tiene sus posiciones fijas y registrar una petición son unas pocas
+sumas sobre ese bloque, sin locks ni reservas de memoria.
+
+Con varios workers de uvicorn hay que definir METRICAS_DIR (un directorio
+vacío al desplegar): cada proceso guarda su bloque en un fichero mapeado en
+memoria `<pid>.bin` y /metrics suma los de todos los procesos. Los contadores
+de procesos terminados se conservan para que los totales no retrocedan; los
+indicadores instantáneos (en curso, hilos, conexiones en uso) solo se suman
+de procesos vivos.
+
+Cada servicio lo instala con una llamada, `metricas.instalar(app)`; el
+bloque y las posiciones de las rutas se guardan en `app.state`.
+"""
+import bisect
+import glob
+import mmap
+import os
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from anyio import to_thread
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from comun import conexiones
+
+LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # segundos
+TAMANO = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)  # bytes
+SENTENCIAS = (0, 1, 2, 5, 10, 20, 50, 100)
+ESTADOS = ("1xx", "2xx", "3xx", "4xx", "5xx")
+POOLS = ("sync", "async")
+CAMPOS_POOL = ("en_uso", "desbordamiento", "checkouts", "agotados", "abiertas", "cerradas", "invalidadas", "espera_total")
+
+SIN_RUTA = ("*", "(sin ruta)")
+
+METRICAS_POOL = (
+    ("en_uso", "db_pool_en_uso", "gauge", "Conexiones entregadas."),
+    ("desbordamiento", "db_pool_desbordamiento", "gauge", "Conexiones abiertas por encima de DB_POOL_SIZE."),
+    ("agotados", "db_pool_agotados_total", "counter", "Checkouts que agotaron DB_POOL_TIMEOUT."),
+    ("abiertas", "db_pool_conexiones_abiertas_total", "counter", "Conexiones abiertas."),
+    ("cerradas", "db_pool_conexiones_cerradas_total", "counter", "Conexiones cerradas."),
+    ("invalidadas", "db_pool_conexiones_invalidadas_total", "counter", "Conexiones invalidadas."),
+)
+
+# --- Disposición del bloque ---
+# Globales: peticiones en curso, hilos en uso, máximo de hilos, tareas
+# esperando hilo, y por cada pool sus campos y las cubetas de espera
+G_EN_CURSO, G_HILOS_EN_USO, G_HILOS_MAXIMO, G_HILOS_ESPERANDO = 0, 1, 2, 3
+G_POOLS = 4
+POR_POOL = len(CAMPOS_POOL) + len(conexiones.CUBETAS_ESPERA)
+GLOBALES = G_POOLS + POR_POOL * len(POOLS)
+
+# Por ruta: peticiones por estado y tres histogramas (cubetas + desbordamiento + suma)
+R_ESTADO = 0
+R_LATENCIA = R_ESTADO + len(ESTADOS)
+R_TAMANO = R_LATENCIA + len(LATENCIA) + 2
+R_SENTENCIAS = R_TAMANO + len(TAMANO) + 2
+POR_RUTA = R_SENTENCIAS + len(SENTENCIAS) + 2
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Sentencias SQL de la petición en curso. La lista se comparte con el hilo del
+# threadpool porque AnyIO copia el contexto, que guarda la misma referencia
+_sentencias: ContextVar[Optional[list]] = ContextVar("sentencias_sql", default=None)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _contar_sentencia(conn, cursor, statement, parameters, context, executemany):
+    contador = _sentencias.get()
+    if contador is not None:
+        contador[0] += 1
+
+def _vivo(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class Bloque:
+    """Valores de un proceso: la cabecera (posición 0) guarda el número de posiciones."""
+    def __init__(self, rutas: List[Tuple[str, str]], directorio: Optional[str] = None):
+        self.rutas = rutas
+        self.posiciones = 1 + GLOBALES + POR_RUTA * len(rutas)
+        tamano = self.posiciones * 8
+        if directorio:
+            self.fichero = os.path.join(directorio, f"{os.getpid()}.bin")
+            with open(self.fichero, "wb") as f:
+                f.write(b"\0" * tamano)
+            with open(self.fichero, "r+b") as f:
+                self._memoria = mmap.mmap(f.fileno(), tamano)
+        else:
+            self.fichero = None
+            self._memoria = bytearray(tamano)
+        self.v = memoryview(self._memoria).cast("d")
+        self.v[0] = self.posiciones
+
+    def base(self, indice: int) -> int:
+        return 1 + GLOBALES + POR_RUTA * indice
+
+class MiddlewareMetricas:
+    """Middleware ASGI que registra cada petición en el bloque del proceso."""
+    def __init__(self, app, fastapi_app: FastAPI):
+        self.app = app
+        self.fastapi_app = fastapi_app
+        self._ultimo_pool = 0.0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        bloque, indices = preparar(self.fastapi_app)
+        v = bloque.v
+        limitador = to_thread.current_default_thread_limiter()
+        v[1 + G_HILOS_EN_USO] = limitador.borrowed_tokens
+        v[1 + G_HILOS_MAXIMO] = limitador.total_tokens
+        v[1 + G_HILOS_ESPERANDO] = limitador.statistics().tasks_waiting
+
+        estado = [500, 0]  # código y bytes enviados
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado[0] = mensaje["status"]
+            elif mensaje["type"] == "http.response.body":
+                estado[1] += len(mensaje.get("body", b""))
+            await send(mensaje)
+
+        contador = [0]
+        token = _sentencias.set(contador)
+        # La ruta solo se conoce cuando el router la resuelve: el indicador de en curso es global
+        v[1 + G_EN_CURSO] += 1
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracion = time.perf_counter() - inicio
+            _sentencias.reset(token)
+            v[1 + G_EN_CURSO] -= 1
+            base = bloque.base(indices.get(id(scope.get("route")), 0))
+            v[base + R_ESTADO + min(max(estado[0] // 100, 1), 5) - 1] += 1
+            v[base + R_LATENCIA + bisect.bisect_left(LATENCIA, duracion)] += 1
+            v[base + R_LATENCIA + len(LATENCIA) + 1] += duracion
+            v[base + R_TAMANO + bisect.bisect_left(TAMANO, estado[1])] += 1
+            v[base + R_TAMANO + len(TAMANO) + 1] += estado[1]
+            v[base + R_SENTENCIAS + bisect.bisect_left(SENTENCIAS, contador[0])] += 1
+            v[base + R_SENTENCIAS + len(SENTENCIAS) + 1] += contador[0]
+            v[1 + G_HILOS_EN_USO] = limitador.borrowed_tokens
+            ahora = time.monotonic()
+            if ahora - self._ultimo_pool > 1.0:
+                self._ultimo_pool = ahora
+                volcar_pools(bloque)
+
+def preparar(app: FastAPI) -> Tuple[Bloque, Dict[int, int]]:
+    """Reserva el bloque de la app en la primera petición, cuando ya están todas las rutas registradas."""
+    preparado = getattr(app.state, "metricas", None)
+    if preparado is None:
+        rutas, indices = [SIN_RUTA], {}
+        for ruta in app.routes:
+            metodos = getattr(ruta, "methods", None)
+            if metodos:
+                indices[id(ruta)] = len(rutas)  # las rutas definen __eq__ y no son hashables
+                rutas.append((",".join(sorted(metodos)), ruta.path))
+        preparado = app.state.metricas = (Bloque(rutas, os.getenv("METRICAS_DIR")), indices)
+    return preparado
+
+def volcar_pools(bloque: Bloque) -> None:
+    for datos in conexiones.estado():
+        if datos["pool"] not in POOLS:
+            continue
+        base = 1 + G_POOLS + POR_POOL * POOLS.index(datos["pool"])
+        for i, campo in enumerate(CAMPOS_POOL):
+            bloque.v[base + i] = datos[campo] or 0
+        for i, cantidad in enumerate(datos["cubetas_espera"].values()):
+            bloque.v[base + len(CAMPOS_POOL) + i] = cantidad
+
+# --- Exposición ---
+def _bloques(propio: Bloque) -> List[Tuple[memoryview, bool]]:
+    """(valores, vivo) de cada proceso con la misma disposición que el propio."""
+    if not propio.fichero:
+        return [(propio.v, True)]
+    bloques = []
+    for fichero in glob.glob(os.path.join(os.path.dirname(propio.fichero), "*.bin")):
+        try:
+            pid = int(os.path.basename(fichero)[:-4])
+            with open(fichero, "rb") as f:
+                datos = f.read()
+        except (ValueError, OSError):
+            continue
+        if len(datos) != propio.posiciones * 8:
+            continue
+        valores = memoryview(datos).cast("d")
+        if valores[0] == propio.posiciones:
+            bloques.append((valores, _vivo(pid)))
+    return bloques
+
+def _numero(valor: float) -> str:
+    return str(int(valor)) if valor == int(valor) else repr(valor)
+
+def _etiquetas(**etiquetas) -> str:
+    partes = []
+    for nombre, valor in etiquetas.items():
+        valor = str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        partes.append(f'{nombre}="{valor}"')
+    return "{" + ",".join(partes) + "}"
+
+def _histograma(lineas: List[str], nombre: str, etiquetas: dict, limites, cubetas, suma) -> None:
+    acumulado = 0
+    for limite, cantidad in zip(limites, cubetas):
+        acumulado += cantidad
+        lineas.append(f"{nombre}_bucket{_etiquetas(**etiquetas, le=_numero(limite))} {_numero(acumulado)}")
+    acumulado += cubetas[len(limites)]
+    lineas.append(f"{nombre}_bucket{_etiquetas(**etiquetas, le='+Inf')} {_numero(acumulado)}")
+    lineas.append(f"{nombre}_sum{_etiquetas(**etiquetas)} {_numero(suma)}")
+    lineas.append(f"{nombre}_count{_etiquetas(**etiquetas)} {_numero(acumulado)}")
+
+def exponer(bloque: Bloque) -> str:
+    volcar_pools(bloque)
+    bloques = _bloques(bloque)
+    total = [0.0] * bloque.posiciones
+    vivos = [0.0] * bloque.posiciones
+    for valores, vivo in bloques:
+        for i in range(1, bloque.posiciones):
+            total[i] += valores[i]
+            if vivo:
+                vivos[i] += valores[i]
+
+    lineas = [
+        "# HELP http_peticiones_total Peticiones atendidas por ruta y clase de estado.",
+        "# TYPE http_peticiones_total counter",
+    ]
+    for indice, (metodo, ruta) in enumerate(bloque.rutas):
+        base = bloque.base(indice)
+        for i, clase in enumerate(ESTADOS):
+            if total[base + R_ESTADO + i]:
+                lineas.append(f"http_peticiones_total{_etiquetas(metodo=metodo, ruta=ruta, estado=clase)} {_numero(total[base + R_ESTADO + i])}")
+
+    histogramas = (
+        ("http_peticion_duracion_segundos", "Latencia de las peticiones.", R_LATENCIA, LATENCIA),
+        ("http_respuesta_tamano_bytes", "Tamaño del cuerpo de las respuestas.", R_TAMANO, TAMANO),
+        ("http_peticion_sentencias_sql", "Sentencias SQL ejecutadas por petición.", R_SENTENCIAS, SENTENCIAS),
+    )
+    for nombre, ayuda, desplazamiento, limites in histogramas:
+        lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} histogram"]
+        for indice, (metodo, ruta) in enumerate(bloque.rutas):
+            inicio = bloque.base(indice) + desplazamiento
+            cubetas = total[inicio:inicio + len(limites) + 1]
+            if any(cubetas):
+                _histograma(lineas, nombre, {"metodo": metodo, "ruta": ruta}, limites, cubetas, total[inicio + len(limites) + 1])
+
+    lineas += [
+        "# HELP http_peticiones_en_curso Peticiones en curso.",
+        "# TYPE http_peticiones_en_curso gauge",
+        f"http_peticiones_en_curso {_numero(vivos[1 + G_EN_CURSO])}",
+        "# HELP threadpool_hilos_en_uso Hilos del threadpool de AnyIO ocupados.",
+        "# TYPE threadpool_hilos_en_uso gauge",
+        f"threadpool_hilos_en_uso {_numero(vivos[1 + G_HILOS_EN_USO])}",
+        "# HELP threadpool_hilos_maximo Tamaño del threadpool de AnyIO.",
+        "# TYPE threadpool_hilos_maximo gauge",
+        f"threadpool_hilos_maximo {_numero(vivos[1 + G_HILOS_MAXIMO])}",
+        "# HELP threadpool_tareas_esperando Llamadas esperando un hilo libre.",
+        "# TYPE threadpool_tareas_esperando gauge",
+        f"threadpool_tareas_esperando {_numero(vivos[1 + G_HILOS_ESPERANDO])}",
+    ]
+
+    activos = [pool for pool in conexiones.MOTORES if pool in POOLS]
+    for campo, nombre, tipo, ayuda in METRICAS_POOL:
+        lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} {tipo}"]
+        valores = vivos if tipo == "gauge" else total
+        for pool in activos:
+            i = 1 + G_POOLS + POR_POOL * POOLS.index(pool) + CAMPOS_POOL.index(campo)
+            lineas.append(f"{nombre}{_etiquetas(pool=pool)} {_numero(valores[i])}")
+    lineas += [
+        "# HELP db_pool_espera_segundos Espera para obtener una conexión del pool.",
+        "# TYPE db_pool_espera_segundos histogram",
+    ]
+    for pool in activos:
+        base = 1 + G_POOLS + POR_POOL * POOLS.index(pool)
+        acumuladas = total[base + len(CAMPOS_POOL):base + POR_POOL]
+        # conexiones.py guarda las cubetas ya acumuladas; se pasan a cantidades por cubeta
+        cubetas = [acumuladas[0]] + [b - a for a, b in zip(acumuladas, acumuladas[1:])]
+        cubetas.append(total[base + CAMPOS_POOL.index("checkouts")] - acumuladas[-1])
+        _histograma(
+            lineas, "db_pool_espera_segundos", {"pool": pool}, conexiones.CUBETAS_ESPERA,
+            cubetas, total[base + CAMPOS_POOL.index("espera_total")]
+        )
+    return "\n".join(lineas) + "\n"
+
+def instalar(app: FastAPI) -> None:
+    """Añade el middleware de métricas y la ruta GET /metrics."""
+    app.add_middleware(MiddlewareMetricas, fastapi_app=app)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        bloque, _ = preparar(app)
+        return PlainTextResponse(exponer(bloque), media_type=CONTENT_TYPE)
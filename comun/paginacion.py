@@ -0,0 +1,129 @@
+"""Paginación por clave (keyset) para los listados.
+
+Cada listado se ordena por (clave, id) con un índice que empieza por esas
+columnas. El cursor es opaco (JSON en base64) y guarda la clave y el id de
+la última fila enviada, así que la página siguiente es un recorrido de rango
+desde ese punto: la página N cuesta lo mismo que la primera, a diferencia de
+OFFSET. Un listado puede encadenar varias consultas (p. ej. tareas activas y
+archivadas); el cursor recuerda además por cuál va.
+
+La página siguiente se anuncia en las cabeceras `Link` (rel="next") y
+`X-Siguiente-Cursor`; el cuerpo sigue siendo la lista de filas.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response, status
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+LIMITE_POR_DEFECTO = 100
+LIMITE_MAXIMO = 1000
+
+FECHA_SQLITE = "%Y-%m-%d %H:%M:%f"
+
+# (consulta sin ORDER BY, columna de ordenación, columna id). La consulta puede ser de
+# una entidad o de columnas (filas simples); en ese caso debe incluir las dos columnas
+Fuente = Tuple[Select, Any, Any]
+
+@dataclass
+class Pagina:
+    filas: list
+    siguiente: Optional[str] = None
+
+def _a_json(valor):
+    return valor.isoformat() if isinstance(valor, (date, datetime)) else valor
+
+def _de_json(valor, columna):
+    if valor is None:
+        return None
+    tipo = columna.type.python_type
+    if tipo is datetime:
+        return datetime.fromisoformat(valor)
+    if tipo is date:
+        return date.fromisoformat(valor)
+    return tipo(valor)
+
+def codificar_cursor(fase: int, clave, id_) -> str:
+    datos = json.dumps([fase, _a_json(clave), id_], separators=(",", ":"))
+    return base64.urlsafe_b64encode(datos.encode()).decode().rstrip("=")
+
+def decodificar_cursor(cursor: str) -> Tuple[int, Any, Any]:
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        fase, clave, id_ = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        return int(fase), clave, id_
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor no válido"
+        )
+
+def ordenar(fuente: Fuente) -> Select:
+    consulta, clave, id_ = fuente
+    # Ordenar dos veces por id impide a SQLite usar el índice para el ORDER BY
+    if clave is id_:
+        return consulta.order_by(id_)
+    return consulta.order_by(clave, id_)
+
+def _comparable(db: Session, clave):
+    # SQLite guarda las fechas como texto y CURRENT_TIMESTAMP no lleva fracción de
+    # segundo: se comparan en un formato común para que las igualdades coincidan
+    if db.bind.dialect.name == "sqlite" and clave.type.python_type is datetime:
+        return func.strftime(FECHA_SQLITE, clave)
+    return clave
+
+def _despues_de(clave, id_, valor, valor_id):
+    if clave is id_:
+        return id_ > valor_id
+    # MySQL y SQLite ordenan los NULL primero en orden ascendente
+    if valor is None:
+        return or_(clave.is_not(None), and_(clave.is_(None), id_ > valor_id))
+    return or_(clave > valor, and_(clave == valor, id_ > valor_id))
+
+def paginar(db: Session, fuentes: List[Fuente], cursor: Optional[str], limite: int) -> Pagina:
+    """Devuelve hasta `limite` filas a partir del cursor y el cursor de la página siguiente."""
+    fase_inicial, valor, valor_id = decodificar_cursor(cursor) if cursor else (0, None, None)
+    if not 0 <= fase_inicial < len(fuentes):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor no válido"
+        )
+
+    filas: List[Tuple[int, Any]] = []
+    for fase in range(fase_inicial, len(fuentes)):
+        consulta, clave, id_ = fuentes[fase]
+        comparable = _comparable(db, clave)
+        if cursor and fase == fase_inicial:
+            valor_clave = _de_json(valor, clave)
+            if comparable is not clave and valor_clave is not None:
+                valor_clave = func.strftime(FECHA_SQLITE, valor_clave)
+            consulta = consulta.where(_despues_de(comparable, id_, valor_clave, valor_id))
+        # Una fila de más para saber si hay página siguiente
+        restantes = limite + 1 - len(filas)
+        filas += [
+            (fase, fila[0] if len(fila) == 1 else fila) for fila in
+            db.execute(ordenar((consulta, comparable, id_)).limit(restantes)).all()
+        ]
+        if len(filas) > limite:
+            break
+
+    siguiente = None
+    if len(filas) > limite:
+        fase, ultima = filas[limite - 1]
+        _, clave, id_ = fuentes[fase]
+        siguiente = codificar_cursor(fase, getattr(ultima, clave.key), getattr(ultima, id_.key))
+    return Pagina([fila for _, fila in filas[:limite]], siguiente)
+
+def anunciar(request: Request, response: Response, pagina: Pagina) -> list:
+    """Pone las cabeceras de la página siguiente y devuelve las filas."""
+    if pagina.siguiente:
+        url = request.url.include_query_params(cursor=pagina.siguiente)
+        response.headers["Link"] = f'<{url}>; rel="next"'
+        response.headers["X-Siguiente-Cursor"] = pagina.siguiente
+    return pagina.filas
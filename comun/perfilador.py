@@ -0,0 +1,156 @@
+"""Perfil de las consultas SQL de cada petición y detección de N+1.
+
+Con los eventos before_cursor_execute/after_cursor_execute de SQLAlchemy se
+mide cada sentencia y se acumula en el perfil de la petición en curso:
+número de sentencias, tiempo total en la base de datos, las más lentas y
+cuántas veces se repite cada forma de sentencia (el SQL con parámetros, con
+las listas de IN colapsadas).
+
+PERFIL_MODO elige el comportamiento:
+
+- "desarrollo": se perfilan todas las peticiones. Una forma repetida
+  PERFIL_REPETICIONES veces o más (5) en una petición se registra como
+  posible N+1 junto con la ruta, y la respuesta lleva la cabecera
+  Server-Timing con el tiempo de base de datos.
+- "produccion" (por defecto): se perfila una fracción PERFIL_MUESTREO de las
+  peticiones (0.01) y se registra su resumen; en todas se mide cada sentencia
+  y se avisa de las que superan PERFIL_LENTA milisegundos (200).
+- "apagado": no se registra ningún evento.
+"""
+import heapq
+import logging
+import os
+import random
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+
+from fastapi import FastAPI
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+DESARROLLO = "desarrollo"
+PRODUCCION = "produccion"
+APAGADO = "apagado"
+
+MODO = os.getenv("PERFIL_MODO", PRODUCCION)
+MUESTREO = float(os.getenv("PERFIL_MUESTREO", "0.01"))
+LENTA = float(os.getenv("PERFIL_LENTA", "200")) / 1000
+REPETICIONES = int(os.getenv("PERFIL_REPETICIONES", "5"))
+MAS_LENTAS = 5
+
+_PARAMETROS = re.compile(r"(\?|%s|%\(\w+\)s|:\w+)(\s*,\s*(\?|%s|%\(\w+\)s|:\w+))+")
+
+def forma(sentencia: str) -> str:
+    """SQL con las listas de parámetros colapsadas: `IN (?, ?, ?)` y `IN (?)` son la misma forma."""
+    return _PARAMETROS.sub(r"\1, ...", " ".join(sentencia.split()))
+
+class Perfil:
+    def __init__(self, completo: bool = True):
+        self.completo = completo  # False: solo se vigilan las sentencias lentas
+        self.sentencias = 0
+        self.tiempo = 0.0
+        self.formas: Counter = Counter()
+        self._lentas: List[Tuple[float, int, str]] = []
+
+    def registrar(self, sentencia: str, duracion: float) -> None:
+        self.sentencias += 1
+        self.tiempo += duracion
+        if not self.completo:
+            return
+        self.formas[forma(sentencia)] += 1
+        entrada = (duracion, self.sentencias, sentencia)
+        if len(self._lentas) < MAS_LENTAS:
+            heapq.heappush(self._lentas, entrada)
+        elif duracion > self._lentas[0][0]:
+            heapq.heapreplace(self._lentas, entrada)
+
+    @property
+    def lentas(self) -> List[Tuple[float, str]]:
+        return [(duracion, sentencia) for duracion, _, sentencia in sorted(self._lentas, reverse=True)]
+
+    def repetidas(self, minimo: int = REPETICIONES) -> List[Tuple[str, int]]:
+        return [(sql, veces) for sql, veces in self.formas.most_common() if veces >= minimo]
+
+_perfil: ContextVar[Optional[Perfil]] = ContextVar("perfil_sql", default=None)
+
+def _antes(conn, cursor, statement, parameters, context, executemany):
+    if _perfil.get() is not None:
+        conn.info.setdefault("perfil_inicio", []).append(time.perf_counter())
+
+def _despues(conn, cursor, statement, parameters, context, executemany):
+    perfil = _perfil.get()
+    if perfil is None:
+        return
+    inicios = conn.info.get("perfil_inicio")
+    if not inicios:
+        return
+    duracion = time.perf_counter() - inicios.pop()
+    perfil.registrar(statement, duracion)
+    if duracion >= LENTA:
+        logger.warning("Sentencia lenta (%.1f ms): %s", duracion * 1000, " ".join(statement.split()))
+
+if MODO != APAGADO:
+    event.listen(Engine, "before_cursor_execute", _antes)
+    event.listen(Engine, "after_cursor_execute", _despues)
+
+@contextmanager
+def perfilar(completo: bool = True) -> Iterator[Perfil]:
+    """Perfila las sentencias ejecutadas dentro del bloque (también desde el threadpool)."""
+    perfil = Perfil(completo)
+    token = _perfil.set(perfil)
+    try:
+        yield perfil
+    finally:
+        _perfil.reset(token)
+
+def _nombre_ruta(scope) -> str:
+    ruta = scope.get("route")
+    if ruta is not None and hasattr(ruta, "methods"):
+        return f"{','.join(sorted(ruta.methods))} {ruta.path} ({ruta.name})"
+    return f"{scope.get('method', '')} {scope.get('path', '')}"
+
+def informar(scope, perfil: Perfil) -> None:
+    ruta = _nombre_ruta(scope)
+    if MODO == DESARROLLO:
+        for sql, veces in perfil.repetidas():
+            logger.warning("Posible N+1 en %s: %d veces la misma sentencia: %s", ruta, veces, sql)
+        logger.debug("%s: %d sentencias, %.1f ms en la base de datos", ruta, perfil.sentencias, perfil.tiempo * 1000)
+    elif perfil.completo:
+        logger.info(
+            "%s: %d sentencias, %.1f ms en la base de datos; más lentas: %s",
+            ruta, perfil.sentencias, perfil.tiempo * 1000,
+            "; ".join(f"{duracion * 1000:.1f} ms {' '.join(sql.split())}" for duracion, sql in perfil.lentas)
+        )
+
+class MiddlewarePerfil:
+    """Middleware ASGI que abre un perfil por petición y lo resume al terminar."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        completo = MODO == DESARROLLO or random.random() < MUESTREO
+
+        with perfilar(completo) as perfil:
+            async def enviar(mensaje):
+                if MODO == DESARROLLO and mensaje["type"] == "http.response.start":
+                    cabecera = f'db;dur={perfil.tiempo * 1000:.1f};desc="{perfil.sentencias} sentencias"'
+                    mensaje["headers"] = list(mensaje.get("headers", [])) + [(b"server-timing", cabecera.encode())]
+                await send(mensaje)
+
+            try:
+                await self.app(scope, receive, enviar)
+            finally:
+                informar(scope, perfil)
+
+def instalar(app: FastAPI) -> None:
+    if MODO != APAGADO:
+        app.add_middleware(MiddlewarePerfil)
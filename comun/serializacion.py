@@ -0,0 +1,85 @@
+"""Serialización rápida de los listados.
+
+Con `response_model=List[Esquema]` FastAPI valida cada fila contra el esquema,
+la convierte a tipos JSON y después la codifica con json.dumps; con listas de
+cientos o miles de filas eso se lleva la mayor parte de la CPU de la petición.
+
+Las filas de los listados salen de nuestras propias consultas, así que aquí
+no se validan: se copian los campos del esquema a diccionarios y se
+codifican de una vez con orjson (si está instalado; si no, con el codificador
+de pydantic-core). El endpoint conserva su response_model para la
+documentación. Para datos que no son de confianza, `validar=True` pasa la
+lista entera por un TypeAdapter (uno por tipo, reutilizado).
+
+Los listados leen además solo las columnas del esquema (`columnas`) como
+filas simples, sin crear objetos ORM ni pasar por el mapa de identidad.
+
+Medición: python benchmarks/serializacion.py y benchmarks/listados.py
+"""
+from functools import lru_cache
+from typing import Any, Iterable, List, Tuple, Type
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import to_json
+
+try:
+    import orjson  # Dependencia opcional
+except ImportError:
+    orjson = None
+
+def a_json(contenido: Any) -> bytes:
+    """JSON compacto; datetime, date, Enum y UUID se codifican igual que con pydantic."""
+    if orjson is not None:
+        return orjson.dumps(contenido)
+    return to_json(contenido)
+
+class RespuestaJSON(JSONResponse):
+    """JSONResponse con el codificador rápido."""
+    def render(self, content: Any) -> bytes:
+        return a_json(content)
+
+@lru_cache(maxsize=None)
+def adaptador(tipo) -> TypeAdapter:
+    return TypeAdapter(tipo)
+
+@lru_cache(maxsize=None)
+def _campos(esquema: Type[BaseModel]) -> Tuple[str, ...]:
+    return tuple(esquema.model_fields)
+
+def columnas(modelo, esquema: Type[BaseModel], excluir: Iterable[str] = ()) -> list:
+    """Columnas de `modelo` que necesita `esquema`, para select(*columnas)."""
+    atributos = modelo.__mapper__.column_attrs
+    return [getattr(modelo, campo) for campo in _campos(esquema) if campo in atributos and campo not in excluir]
+
+def volcar(esquema: Type[BaseModel], filas: Iterable, excluir: Iterable[str] = ()) -> List[dict]:
+    """Campos del esquema de cada fila (objeto ORM o fila de columnas), sin validar."""
+    campos = [campo for campo in _campos(esquema) if campo not in excluir]
+    return [{campo: getattr(fila, campo) for campo in campos} for fila in filas]
+
+def listado(
+    response: Response,
+    esquema: Type[BaseModel],
+    filas: list,
+    validar: bool = False,
+    excluir: Iterable[str] = ()
+) -> Response:
+    """Respuesta JSON de una lista de filas con las cabeceras ya puestas en `response`
+    (FastAPI no las copia cuando el endpoint devuelve su propia Response).
+    Los campos de `excluir` no aparecen en la respuesta."""
+    if validar:
+        tipo = adaptador(List[esquema])
+        contenido = tipo.dump_python(
+            tipo.validate_python(filas, from_attributes=True),
+            mode="json",
+            exclude={"__all__": set(excluir)} if excluir else None
+        )
+    else:
+        contenido = volcar(esquema, filas, excluir)
+    respuesta = RespuestaJSON(contenido, status_code=response.status_code or 200)
+    respuesta.raw_headers.extend(
+        (clave, valor) for clave, valor in response.raw_headers
+        if clave not in (b"content-length", b"content-type")
+    )
+    return respuesta
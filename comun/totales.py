@@ -0,0 +1,59 @@
+"""Totales baratos para los listados paginados (cabecera X-Total-Count).
+
+Según el listado se usa la forma más barata que da un número útil, y la
+cabecera X-Total-Count-Tipo dice cuál fue:
+
+- "exacto": COUNT sobre el conjunto filtrado, limitado a TOPE_EXACTO filas;
+- "minimo": el conjunto filtrado tiene más de TOPE_EXACTO filas y el total
+  es solo una cota inferior (no se sigue contando);
+- "contador": leído de una tabla de contadores mantenida al escribir;
+- "estimado": estimación del optimizador (information_schema.TABLES) para
+  los totales globales sin filtro.
+"""
+from typing import List, Tuple
+
+from fastapi import Response
+from sqlalchemy import func, literal, select, text
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+EXACTO = "exacto"
+MINIMO = "minimo"
+CONTADOR = "contador"
+ESTIMADO = "estimado"
+
+TOPE_EXACTO = 10_000
+
+Total = Tuple[int, str]
+
+def exacto(db: Session, consultas: List[Select], tope: int = TOPE_EXACTO) -> Total:
+    """Cuenta las filas de las consultas sin pasar de `tope` (recorre como mucho tope + 1 filas)."""
+    total = 0
+    for consulta in consultas:
+        restantes = tope + 1 - total
+        acotada = (
+            consulta.with_only_columns(literal(1), maintain_column_froms=True)
+            .order_by(None).limit(restantes).subquery()
+        )
+        total += db.execute(select(func.count()).select_from(acotada)).scalar()
+        if total > tope:
+            return tope, MINIMO
+    return total, EXACTO
+
+def estimado(db: Session, modelo) -> Total:
+    """Filas estimadas de toda la tabla. Fuera de MySQL se cuenta con tope."""
+    if db.bind.dialect.name == "mysql":
+        filas = db.execute(
+            text(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :tabla"
+            ),
+            {"tabla": modelo.__tablename__}
+        ).scalar()
+        if filas is not None:
+            return int(filas), ESTIMADO
+    return exacto(db, [select(modelo)])
+
+def anunciar(response: Response, total: Total) -> None:
+    response.headers["X-Total-Count"] = str(total[0])
+    response.headers["X-Total-Count-Tipo"] = total[1]
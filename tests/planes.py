@@ -0,0 +1,126 @@
+"""Revisión de los planes de consulta (EXPLAIN) de las sentencias de cada ruta.
+
+Mientras corren las pruebas de un servicio se guarda cada sentencia ejecutada
+durante una petición junto con su ruta (método y plantilla) y sus
+parámetros. Al final del módulo de pruebas se pide el plan de cada SELECT,
+UPDATE y DELETE distinto y se informa por ruta de:
+
+- recorridos completos de una tabla sin ningún índice utilizable;
+- ordenaciones sin índice (filesort / "USE TEMP B-TREE FOR ORDER BY");
+- tablas temporales (GROUP BY o DISTINCT sin índice).
+
+Con MySQL (TEST_DB_URL) se usa EXPLAIN; con SQLite, EXPLAIN QUERY PLAN. En
+MySQL un recorrido completo solo cuenta si no había ninguna clave posible:
+con tablas de prueba pequeñas el optimizador prefiere a veces recorrerlas
+aunque exista el índice.
+
+Los recorridos intencionados se declaran en la lista de permitidos de cada
+módulo: {(ruta, tabla, problema): motivo}; "*" como ruta vale para todas.
+Los que solo se dan en SQLite (p. ej. la paginación por fecha, que allí
+ordena por strftime(fecha), ver comun/paginacion.py) van en una segunda lista
+que solo se aplica con SQLite, ruta por ruta.
+"""
+import re
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+import pytest
+from sqlalchemy import event
+
+RECORRIDO = "recorrido completo"
+FILESORT = "ordenación sin índice"
+TEMPORAL = "tabla temporal"
+
+Hallazgo = Tuple[str, str, str]  # (tabla, problema, detalle)
+
+_scope: ContextVar[Optional[dict]] = ContextVar("scope_peticion", default=None)
+
+class Envoltura:
+    """Aplicación ASGI que deja el scope de la petición a mano de los eventos de SQLAlchemy.
+    El router de Starlette completa ese mismo dict con la ruta resuelta."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        token = _scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _scope.reset(token)
+
+def _ruta(scope: dict) -> str:
+    ruta = scope.get("route")
+    if ruta is not None and getattr(ruta, "methods", None):
+        return f"{','.join(sorted(ruta.methods))} {ruta.path}"
+    return f"{scope.get('method', '')} {scope.get('path', '')}"
+
+class Captura:
+    """Sentencias ejecutadas durante peticiones, por ruta (la primera vez que aparece cada una)."""
+    def __init__(self, engine):
+        self.sentencias: Dict[Tuple[str, str], object] = {}
+        event.listen(engine, "before_cursor_execute", self._sentencia)
+
+    def _sentencia(self, conn, cursor, statement, parameters, context, executemany):
+        scope = _scope.get()
+        if scope is None or scope.get("type") != "http":
+            return
+        if executemany:
+            parameters = parameters[0] if parameters else None
+        self.sentencias.setdefault((_ruta(scope), statement), parameters)
+
+_TABLA_SQLITE = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+
+def _explicar_sqlite(conexion, sentencia: str, parametros) -> List[Hallazgo]:
+    hallazgos = []
+    for fila in conexion.exec_driver_sql(f"EXPLAIN QUERY PLAN {sentencia}", parametros or ()):
+        detalle = fila[-1]
+        recorrido = _TABLA_SQLITE.match(detalle)
+        # anon_N son subconsultas en el FROM (p. ej. el COUNT acotado de totales.py), no tablas
+        if recorrido and not recorrido.group(1).startswith("anon_"):
+            hallazgos.append((recorrido.group(1), RECORRIDO, detalle))
+        elif "TEMP B-TREE FOR" in detalle and "ORDER BY" in detalle:
+            hallazgos.append(("*", FILESORT, detalle))
+        elif "TEMP B-TREE FOR" in detalle:
+            hallazgos.append(("*", TEMPORAL, detalle))
+    return hallazgos
+
+def _explicar_mysql(conexion, sentencia: str, parametros) -> List[Hallazgo]:
+    hallazgos = []
+    for fila in conexion.exec_driver_sql(f"EXPLAIN {sentencia}", parametros or ()).mappings():
+        tabla = fila.get("table") or "*"
+        extra = fila.get("Extra") or ""
+        detalle = f"type={fila.get('type')} key={fila.get('key')} Extra={extra}"
+        if fila.get("type") == "ALL" and not fila.get("possible_keys"):
+            hallazgos.append((tabla, RECORRIDO, detalle))
+        if "Using filesort" in extra:
+            hallazgos.append((tabla, FILESORT, detalle))
+        if "Using temporary" in extra:
+            hallazgos.append((tabla, TEMPORAL, detalle))
+    return hallazgos
+
+def explicar(engine, sentencia: str, parametros) -> List[Hallazgo]:
+    explicador = _explicar_mysql if engine.dialect.name == "mysql" else _explicar_sqlite
+    with engine.connect() as conexion:
+        return explicador(conexion, sentencia, parametros)
+
+def _permitido(permitidos: dict, ruta: str, tabla: str, problema: str) -> bool:
+    return (ruta, tabla, problema) in permitidos or ("*", tabla, problema) in permitidos
+
+def revisar(captura: Captura, engine, permitidos: dict, permitidos_sqlite: Optional[dict] = None) -> List[str]:
+    """Problemas no permitidos, uno por línea: ruta, tabla, problema, detalle y sentencia."""
+    if engine.dialect.name == "sqlite":
+        permitidos = {**permitidos, **(permitidos_sqlite or {})}
+    informe = []
+    for (ruta, sentencia), parametros in captura.sentencias.items():
+        if sentencia.lstrip().split(None, 1)[0].upper() not in ("SELECT", "UPDATE", "DELETE"):
+            continue
+        for tabla, problema, detalle in explicar(engine, sentencia, parametros):
+            if not _permitido(permitidos, ruta, tabla, problema):
+                informe.append(f"{ruta}: {problema} en {tabla} ({detalle})\n    {' '.join(sentencia.split())}")
+    return informe
+
+def comprobar(servicio, permitidos: dict, permitidos_sqlite: Optional[dict] = None) -> None:
+    if not servicio.captura.sentencias:
+        pytest.skip("No se ha ejecutado ninguna petición en este módulo")
+    informe = revisar(servicio.captura, servicio.db_config.engine, permitidos, permitidos_sqlite)
+    assert not informe, "Accesos sin índice:\n" + "\n".join(informe)
@@ -0,0 +1,248 @@
+"""Cotas de sentencias SQL y filas cargadas por endpoint de GestHogares."""
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import planes
+
+HOGARES = 40
+MIEMBROS = 8
+PROPIETARIO = "propietario-1"
+
+@pytest.fixture(scope="module")
+def sembrado(hogares):
+    """Hogares con varios miembros y algo de actividad, insertados directamente."""
+    models = hogares.models
+    inicio = datetime(2026, 1, 1)
+    db = hogares.db_config.SessionLocal()
+    ids = [f"h{i:04d}" for i in range(HOGARES)]
+    db.add_all(
+        models.HogarDB(id=id_, nombre=f"Hogar {i}", propietario_id=PROPIETARIO, fecha_creacion=inicio + timedelta(hours=i))
+        for i, id_ in enumerate(ids)
+    )
+    for id_ in ids:
+        db.add(models.MiembroHogarDB(id=f"{id_}-m0", usuario_id=PROPIETARIO, hogar_id=id_, rol="propietario"))
+        db.add_all(
+            models.MiembroHogarDB(id=f"{id_}-m{j}", usuario_id=f"usuario-{j}", hogar_id=id_, rol="miembro")
+            for j in range(1, MIEMBROS)
+        )
+        db.add_all(
+            models.ActividadDB(hogar_id=id_, tipo="miembro_invitado", entidad_id=f"{id_}-m{j}", usuario_id=f"usuario-{j}")
+            for j in range(1, MIEMBROS)
+        )
+    db.commit()
+    db.close()
+    return ids
+
+def test_crear_hogar(hogares, sembrado):
+    with hogares.contador.medir() as contador:
+        r = hogares.cliente.post("/hogares/", params={"usuario_id": PROPIETARIO}, json={"nombre": "Hogar nuevo"})
+    assert r.status_code == 201
+    # Nombre repetido, INSERT del hogar, refresh, INSERT del miembro y de la actividad
+    # (con RETURNING los INSERT del hogar y de la actividad devuelven una fila cada uno)
+    contador.comprobar(sentencias=6, filas=4, objetos=2)
+
+def test_listar_hogares(hogares, sembrado):
+    with hogares.contador.medir() as contador:
+        r = hogares.cliente.get("/hogares/", params={"limite": 20})
+    assert r.status_code == 200 and len(r.json()) == 20
+    contador.comprobar(sentencias=1, filas=21, objetos=0)
+
+def test_listar_hogares_no_modificado(hogares, sembrado):
+    r = hogares.cliente.get("/hogares/", params={"limite": 20})
+    with hogares.contador.medir() as contador:
+        r = hogares.cliente.get("/hogares/", params={"limite": 20}, headers={"If-None-Match": r.headers["etag"]})
+    assert r.status_code == 304
+    # Solo ids, claves y versiones de la página
+    contador.comprobar(sentencias=1, filas=21, objetos=0)
+
+def test_listar_hogares_con_total(hogares, sembrado):
+    with hogares.contador.medir() as contador:
+        r = hogares.cliente.get("/hogares/", params={"limite": 20, "total": True})
+    assert r.status_code == 200 and "x-total-count" in r.headers
+    contador.comprobar(sentencias=2, filas=22, objetos=0)
+
+def test_obtener_hogar(hogares, sembrado):
+    with hogares.contador.medir() as contador:
+        r = hogares.cliente.get(f"/hogares/{sembrado[0]}")
+    assert r.status_code == 200
+    contador.comprobar(sentencias=1, filas=1)
+
+def test_obtener_hogar_no_modificado(hogares, sembrado):
+    r = hogares.cliente.get(f"/hogares/{sembrado[6]}")
+    with hogares.contador.medir() as contador:
+        no_modificado = hogares.cliente.get(f"/hogares/{sembrado[6]}", headers={"If-None-Match": r.headers["etag"]})
+    assert no_modificado.status_code == 304 and no_modificado.headers["etag"] == r.headers["etag"]
+    # Solo la versión, por clave primaria
+    contador.comprobar(sentencias=1, filas=1, objetos=0)
+    hogares.cliente.patch(f"/hogares/{sembrado[6]}", params={"usuario_actual_id": PROPIETARIO}, json={"nombre": "Otro nombre"})
+    r2 = hogares.cliente.get(f"/hogares/{sembrado[6]}", headers={"If-None-Match": r.headers["etag"]})
+    assert r2.status_code == 200 and r2.json()["nombre"] == "Otro nombre" and r2.headers["etag"] != r.headers["etag"]
+
+def test_actualizar_hogar(hogares, sembrado):
+    with hogares.contador.medir() as contador:
+        r = hogares.cliente.patch(
+            f"/hogares/{sembrado[1]}", params={"usuario_actual_id": PROPIETARIO}, json={"nombre": "Renombrado"}
+        )
+    assert r.status_code == 200
+    # UPDATE con el permiso en el WHERE (más SELECT sin RETURNING) e INSERT de actividad
+    contador.comprobar(sentencias=3, filas=2, objetos=1)
+
+def test_actualizar_hogar_inexistente(hogares, sembrado):
+    with hogares.contador.medir() as contador:
+        r = hogares.cliente.patch(
+            "/hogares/no-existe", params={"usuario_actual_id": PROPIETARIO}, json={"nombre": "Nada"}
+        )
+    assert r.status_code == 404
+    # UPDATE sin filas y comprobación de existencia
+    contador.comprobar(sentencias=2, filas=0)
+
+def test_actualizar_hogar_sin_permisos(hogares, sembrado):
+    r = hogares.cliente.patch(
+        f"/hogares/{sembrado[1]}", params={"usuario_actual_id": "usuario-1"}, json={"nombre": "Ajeno"}
+    )
+    assert r.status_code == 403
+    assert hogares.cliente.get(f"/hogares/{sembrado[1]}").json()["nombre"] != "Ajeno"
+
+def test_invitar_miembro(hogares, sembrado):
+    with hogares.contador.medir() as contador:
+        r = hogares.cliente.post(
+            f"/hogares/{sembrado[2]}/miembros/invitar",
+            params={"usuario_actual_id": PROPIETARIO},
+            json={"email_invitado": "invitado@ejemplo.com"}
+        )
+    assert r.status_code == 200
+    # Hogar, permiso, membresía previa, dos INSERT y refresh
+    contador.comprobar(sentencias=6, filas=4, objetos=3)
+
+def test_listar_miembros(hogares, sembrado):
+    with hogares.contador.medir() as contador:
+        r = hogares.cliente.get(f"/hogares/{sembrado[3]}/miembros")
+    assert r.status_code == 200 and len(r.json()) == MIEMBROS
+    contador.comprobar(sentencias=1, filas=MIEMBROS, objetos=0)
+
+def test_listar_miembros_no_modificado(hogares, sembrado):
+    r = hogares.cliente.get(f"/hogares/{sembrado[3]}/miembros")
+    with hogares.contador.medir() as contador:
+        r = hogares.cliente.get(f"/hogares/{sembrado[3]}/miembros", headers={"If-None-Match": r.headers["etag"]})
+    assert r.status_code == 304
+    contador.comprobar(sentencias=1, filas=MIEMBROS, objetos=0)
+
+def test_exportar_miembros(hogares, sembrado):
+    with hogares.contador.medir() as contador:
+        r = hogares.cliente.get(f"/hogares/{sembrado[3]}/miembros", params={"formato": "csv"})
+    assert r.status_code == 200 and len(r.text.splitlines()) == MIEMBROS + 1
+    contador.comprobar(sentencias=1, filas=MIEMBROS, objetos=0)
+
+def test_listar_actividad(hogares, sembrado):
+    with hogares.contador.medir() as contador:
+        r = hogares.cliente.get(f"/hogares/{sembrado[4]}/actividad", params={"limite": 5})
+    assert r.status_code == 200 and len(r.json()["eventos"]) == 5
+    contador.comprobar(sentencias=1, filas=5)
+
+def test_resumen_actividad(hogares, sembrado):
+    with hogares.contador.medir() as contador:
+        r = hogares.cliente.get(f"/hogares/{sembrado[4]}/actividad/resumen")
+    assert r.status_code == 200
+    contador.comprobar(sentencias=1, filas=0)
+
+def test_eliminar_hogar(hogares, sembrado):
+    with hogares.contador.medir() as contador:
+        r = hogares.cliente.delete(f"/hogares/{sembrado[5]}", params={"usuario_actual_id": PROPIETARIO})
+    assert r.status_code == 204
+    # Los miembros y la actividad se borran con un DELETE cada uno, sin cargarlos
+    contador.comprobar(sentencias=5, filas=1)
+
+def test_presencia(hogares, sembrado):
+    with hogares.contador.medir() as contador:
+        r = hogares.cliente.post(f"/hogares/{sembrado[7]}/presencia/latido", params={"usuario_id": "usuario-1"})
+        assert r.status_code == 204
+        r = hogares.cliente.get(f"/hogares/{sembrado[7]}/presencia")
+    assert [u["usuario_id"] for u in r.json()["en_linea"]] == ["usuario-1"]
+    # Solo memoria (o Redis): ninguna consulta a la base de datos
+    contador.comprobar(sentencias=0)
+
+def test_historial_chat(hogares, sembrado):
+    hogar = sembrado[8]
+    enviados = [
+        hogares.cliente.post(
+            f"/hogares/{hogar}/chat/mensajes", params={"usuario_id": "usuario-1"}, json={"contenido": f"Mensaje {i}"}
+        )
+        for i in range(3)
+    ]
+    assert [r.status_code for r in enviados] == [201] * 3
+    ids = [r.json()["id"] for r in enviados]
+    with hogares.contador.medir() as contador:
+        r = hogares.cliente.get(f"/hogares/{hogar}/chat/mensajes", params={"limite": 2})
+    assert r.status_code == 200
+    pagina = r.json()
+    # Del más reciente al más antiguo
+    assert [m["id"] for m in pagina["mensajes"]] == ids[:0:-1] and pagina["siguiente_cursor"]
+    contador.comprobar(sentencias=1, filas=2)
+    r = hogares.cliente.get(
+        f"/hogares/{hogar}/chat/mensajes", params={"limite": 2, "cursor": pagina["siguiente_cursor"]}
+    )
+    pagina = r.json()
+    assert [m["id"] for m in pagina["mensajes"]] == ids[:1] and pagina["siguiente_cursor"] is None
+
+    r = hogares.cliente.get(f"/hogares/{hogar}/chat/mensajes", params={"cursor": "no-es-un-cursor"})
+    assert r.status_code == 400
+
+def test_chat_difunde_a_todas_las_conexiones(hogares, sembrado):
+    hogar = sembrado[9]
+    hub = hogares.app.chat.hub
+    with hogares.cliente.websocket_connect(f"/hogares/{hogar}/chat?usuario_id=usuario-1") as uno, \
+            hogares.cliente.websocket_connect(f"/hogares/{hogar}/chat?usuario_id=usuario-2") as dos:
+        # El servidor registra cada conexión justo después de aceptarla
+        limite = time.monotonic() + 5
+        while hub.conexiones(hogar) < 2 and time.monotonic() < limite:
+            time.sleep(0.01)
+        uno.send_text("Hola a todos")
+        recibidos = [json.loads(ws.receive_text()) for ws in (uno, dos)]
+    assert [m["contenido"] for m in recibidos] == ["Hola a todos"] * 2
+    assert recibidos[0]["id"] == recibidos[1]["id"] and recibidos[0]["usuario_id"] == "usuario-1"
+    assert hub.conexiones(hogar) == 0
+
+def test_chat_cierra_clientes_lentos(hogares):
+    """Con la cola del cliente llena, difundir cierra su conexión con 1013 en vez de esperarle."""
+    chat = hogares.app.chat
+
+    class SocketLento:
+        codigo = None
+
+        async def send_text(self, texto):
+            await asyncio.Event().wait()  # No termina nunca de enviar
+
+        async def close(self, code):
+            self.codigo = code
+
+    mensaje = chat.MensajeResponse(
+        id=1, hogar_id="hogar-lento", usuario_id="usuario-1", contenido="Hola", fecha_creacion=datetime(2026, 1, 1)
+    )
+
+    async def difundir():
+        hub = chat.HubChat()
+        socket = SocketLento()
+        hub.salas["hogar-lento"] = {chat.Conexion(socket, max_pendientes=1)}
+        entregados = [hub.difundir("hogar-lento", mensaje) for _ in range(2)]
+        await asyncio.sleep(0)  # Deja correr el cierre
+        return entregados, socket.codigo, hub.conexiones("hogar-lento")
+
+    assert asyncio.run(difundir()) == ([1, 0], 1013, 0)
+
+# Recorridos y ordenaciones sin índice intencionados: {(ruta, tabla, problema): motivo}
+PERMITIDOS = {}
+
+# Solo en SQLite, que compara las fechas como texto normalizado
+PERMITIDOS_SQLITE = {
+    ("GET /hogares/", "Hogar", planes.RECORRIDO):
+        "Listado sin filtro ordenado por strftime(fecha_creacion): SQLite no puede leerlo por el índice",
+    ("GET /hogares/", "*", planes.FILESORT):
+        "Orden por strftime(fecha) para la paginación (ver comun/paginacion.py); en MySQL, por el índice",
+}
+
+def test_planes_de_consulta(hogares):
+    planes.comprobar(hogares, PERMITIDOS, PERMITIDOS_SQLITE)
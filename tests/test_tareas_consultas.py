@@ -0,0 +1,411 @@
+"""Cotas de sentencias SQL y filas cargadas por endpoint de GestTareas."""
+import csv
+import io
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import planes
+
+HOGAR = "hogar-1"
+TAREAS = 30
+SUBTAREAS = 6
+MIEMBROS = 4
+
+@pytest.fixture(scope="module")
+def sembrado(tareas):
+    """Tareas de un hogar creadas por la API (para que contadores y agregados cuadren),
+    con fechas límite, una tarea con subtareas anidadas y varias asignaciones."""
+    cliente = tareas.cliente
+    inicio = datetime(2026, 1, 5, 9)
+    ids = [
+        cliente.post("/tareas/", json={
+            "titulo": f"Tarea {i}",
+            "hogar_id": HOGAR,
+            "fecha_limite": (inicio + timedelta(days=i)).isoformat() if i % 2 else None
+        }).json()["id"]
+        for i in range(TAREAS)
+    ]
+    padre = ids[0]
+    arbol = [padre]
+    for i in range(SUBTAREAS):
+        arbol.append(cliente.post("/tareas/", json={
+            "titulo": f"Subtarea {i}", "hogar_id": HOGAR, "padre_id": arbol[i // 2]
+        }).json()["id"])
+    asignaciones = [
+        cliente.post(f"/tareas/{ids[1]}/asignar", json={"tarea_id": ids[1], "usuario_id": f"usuario-{j}"}).json()["id"]
+        for j in range(MIEMBROS)
+    ]
+    for tarea_id in ids[2:6]:
+        cliente.put(f"/tareas/{tarea_id}/completar")
+    return {"tareas": ids, "arbol": arbol, "asignaciones": asignaciones}
+
+def test_crear_tarea(tareas, sembrado):
+    with tareas.contador.medir() as contador:
+        r = tareas.cliente.post("/tareas/", json={"titulo": "Nueva", "hogar_id": HOGAR})
+    assert r.status_code == 201
+    # Rango máximo del hogar, RETURNING de los INSERT de la tarea y de la actividad y refresh
+    contador.comprobar(sentencias=6, filas=4, objetos=1)
+
+def test_crear_subtarea(tareas, sembrado):
+    with tareas.contador.medir() as contador:
+        r = tareas.cliente.post("/tareas/", json={
+            "titulo": "Subtarea nueva", "hogar_id": HOGAR, "padre_id": sembrado["arbol"][-1]
+        })
+    assert r.status_code == 201
+    # Además el padre y los contadores de los ancestros (no depende de la profundidad)
+    contador.comprobar(sentencias=9, filas=5, objetos=1)
+
+def test_listar_tareas(tareas, sembrado):
+    with tareas.contador.medir() as contador:
+        r = tareas.cliente.get("/tareas/", params={"hogar_id": HOGAR, "limite": 20})
+    assert r.status_code == 200 and len(r.json()) == 20
+    # Versión del hogar (ETag) y la página, con una fila de más para saber si hay siguiente
+    contador.comprobar(sentencias=2, filas=22, objetos=0)
+
+def test_listar_tareas_descripcion(tareas, sembrado):
+    r = tareas.cliente.get("/tareas/", params={"hogar_id": HOGAR, "limite": 5})
+    assert "descripcion" not in r.json()[0]
+    r = tareas.cliente.get("/tareas/", params={"hogar_id": HOGAR, "limite": 5, "incluir_descripcion": True})
+    assert "descripcion" in r.json()[0]
+
+def test_listar_tareas_pagina_siguiente(tareas, sembrado):
+    primera = tareas.cliente.get("/tareas/", params={"hogar_id": HOGAR, "limite": 20})
+    with tareas.contador.medir() as contador:
+        r = tareas.cliente.get("/tareas/", params={
+            "hogar_id": HOGAR, "limite": 20, "cursor": primera.headers["x-siguiente-cursor"]
+        })
+    assert r.status_code == 200
+    # Versión del hogar (ETag) y la página
+    contador.comprobar(sentencias=2, filas=22, objetos=0)
+
+def test_listar_tareas_con_historial_y_total(tareas, sembrado):
+    with tareas.contador.medir() as contador:
+        r = tareas.cliente.get("/tareas/", params={
+            "hogar_id": HOGAR, "limite": 20, "total": True, "incluir_historial": True
+        })
+    assert r.status_code == 200 and r.headers["x-total-count-tipo"] == "contador"
+    # Versión, contador, tareas activas y (si no se llenó la página) archivadas
+    contador.comprobar(sentencias=4, filas=23, objetos=0)
+
+def test_listar_tareas_orden_manual(tareas, sembrado):
+    with tareas.contador.medir() as contador:
+        r = tareas.cliente.get("/tareas/", params={"hogar_id": HOGAR, "limite": 20, "orden_manual": True})
+    assert r.status_code == 200
+    # Versión del hogar (ETag) y la página
+    contador.comprobar(sentencias=2, filas=22, objetos=0)
+
+def test_listar_tareas_no_modificado(tareas, sembrado):
+    params = {"hogar_id": HOGAR, "limite": 20}
+    r = tareas.cliente.get("/tareas/", params=params)
+    with tareas.contador.medir() as contador:
+        no_modificado = tareas.cliente.get("/tareas/", params=params, headers={"If-None-Match": r.headers["etag"]})
+    assert no_modificado.status_code == 304
+    # Solo la versión del hogar
+    contador.comprobar(sentencias=1, filas=1, objetos=0)
+    tareas.cliente.patch(f"/tareas/{sembrado['tareas'][14]}", json={"titulo": "Otro título"})
+    r2 = tareas.cliente.get("/tareas/", params=params, headers={"If-None-Match": r.headers["etag"]})
+    assert r2.status_code == 200 and r2.headers["etag"] != r.headers["etag"]
+
+def test_exportar_tareas(tareas, sembrado):
+    with tareas.contador.medir() as contador:
+        r = tareas.cliente.get("/tareas/", params={"hogar_id": HOGAR, "formato": "ndjson"})
+    assert r.status_code == 200 and len(r.text.splitlines()) >= TAREAS
+    contador.comprobar(sentencias=1, filas=len(r.text.splitlines()), objetos=0)
+
+def test_exportar_tareas_csv(tareas, sembrado):
+    """Mismos valores que en NDJSON; las fechas en ISO 8601 y los nulos vacíos."""
+    params = {"hogar_id": HOGAR}
+    with tareas.contador.medir() as contador:
+        r = tareas.cliente.get("/tareas/", params={**params, "formato": "csv"})
+    assert r.status_code == 200
+    contador.comprobar(sentencias=1, filas=len(r.text.splitlines()) - 1, objetos=0)
+    filas = list(csv.DictReader(io.StringIO(r.text)))
+    lineas = tareas.cliente.get("/tareas/", params={**params, "formato": "ndjson"}).text.splitlines()
+    assert len(filas) == len(lineas)
+    for fila, linea in zip(filas, lineas):
+        assert fila == {campo: "" if valor is None else str(valor) for campo, valor in json.loads(linea).items()}
+    assert any(fila["fecha_limite"] for fila in filas)
+
+def test_conteos_por_hogar(tareas, sembrado):
+    with tareas.contador.medir() as contador:
+        r = tareas.cliente.get("/tareas/conteos", params={"hogar_ids": f"{HOGAR},otro,tercero"})
+    assert r.status_code == 200
+    # Como mucho una fila por hogar pedido
+    contador.comprobar(sentencias=1, filas=3, objetos=0)
+
+def test_obtener_tarea(tareas, sembrado):
+    with tareas.contador.medir() as contador:
+        r = tareas.cliente.get(f"/tareas/{sembrado['tareas'][7]}")
+    assert r.status_code == 200
+    contador.comprobar(sentencias=1, filas=1)
+
+def test_obtener_tarea_no_modificado(tareas, sembrado):
+    tarea_id = sembrado["tareas"][15]
+    r = tareas.cliente.get(f"/tareas/{tarea_id}")
+    with tareas.contador.medir() as contador:
+        no_modificado = tareas.cliente.get(f"/tareas/{tarea_id}", headers={"If-None-Match": r.headers["etag"]})
+    assert no_modificado.status_code == 304
+    contador.comprobar(sentencias=1, filas=1, objetos=0)
+    tareas.cliente.put(f"/tareas/{tarea_id}/completar")
+    r2 = tareas.cliente.get(f"/tareas/{tarea_id}", headers={"If-None-Match": r.headers["etag"]})
+    assert r2.status_code == 200 and r2.json()["completada"] and r2.headers["etag"] != r.headers["etag"]
+
+def test_obtener_subarbol(tareas, sembrado):
+    with tareas.contador.medir() as contador:
+        r = tareas.cliente.get(f"/tareas/{sembrado['arbol'][0]}/subtareas")
+    assert r.status_code == 200 and len(r.json()["subtareas"]) == 2
+    # Una sola consulta para todo el árbol
+    contador.comprobar(sentencias=1, filas=SUBTAREAS + 2)
+
+def test_completar_tarea(tareas, sembrado):
+    with tareas.contador.medir() as contador:
+        r = tareas.cliente.put(f"/tareas/{sembrado['tareas'][9]}/completar")
+    assert r.status_code == 200 and r.json()["completada"]
+    # Sin RETURNING (MySQL) el UPDATE necesita un SELECT más
+    contador.comprobar(sentencias=8, filas=2, objetos=1)
+
+def test_completar_subtarea(tareas, sembrado):
+    with tareas.contador.medir() as contador:
+        r = tareas.cliente.put(f"/tareas/{sembrado['arbol'][-1]}/completar")
+    assert r.status_code == 200
+    contador.comprobar(sentencias=7, filas=2, objetos=1)
+
+def test_completar_subtarea_sin_returning(tareas, monkeypatch):
+    """Como en MySQL: el UPDATE no devuelve la fila y se relee después."""
+    cliente = tareas.cliente
+    hogar = "hogar-sin-returning"
+    padre = cliente.post("/tareas/", json={"titulo": "Padre", "hogar_id": hogar}).json()["id"]
+    hija = cliente.post("/tareas/", json={"titulo": "Hija", "hogar_id": hogar, "padre_id": padre}).json()["id"]
+    monkeypatch.setattr(tareas.db_config.engine.dialect, "update_returning", False)
+    r = cliente.put(f"/tareas/{hija}/completar")
+    assert r.status_code == 200 and r.json()["completada"]
+    # La transición mueve los contadores del hogar y los completados del padre
+    conteo = cliente.get("/tareas/conteos", params={"hogar_ids": hogar}).json()[0]
+    assert (conteo["abiertas"], conteo["completadas"]) == (1, 1)
+    assert cliente.get(f"/tareas/{padre}").json()["subtareas_completadas"] == 1
+    assert cliente.get(f"/hogares/{hogar}/actividad").json()["eventos"][0]["tipo"] == "tarea_completada"
+
+def test_actualizar_tarea(tareas, sembrado):
+    with tareas.contador.medir() as contador:
+        r = tareas.cliente.patch(f"/tareas/{sembrado['tareas'][11]}", json={
+            "titulo": "Cambiada", "fecha_limite": datetime(2026, 3, 1).isoformat()
+        })
+    assert r.status_code == 200
+    contador.comprobar(sentencias=6, filas=3, objetos=1)
+
+def test_mover_tarea(tareas, sembrado):
+    ids = sembrado["tareas"]
+    with tareas.contador.medir() as contador:
+        r = tareas.cliente.put(f"/tareas/{ids[12]}/mover", json={"anterior_id": ids[20], "siguiente_id": ids[21]})
+    assert r.status_code == 200
+    # La tarea y sus dos vecinas en una consulta y el UPDATE ... RETURNING
+    contador.comprobar(sentencias=4, filas=4, objetos=1)
+
+def test_asignar_tarea(tareas, sembrado):
+    tarea_id = sembrado["tareas"][13]
+    with tareas.contador.medir() as contador:
+        r = tareas.cliente.post(f"/tareas/{tarea_id}/asignar", json={"tarea_id": tarea_id, "usuario_id": "usuario-9"})
+    assert r.status_code == 200
+    contador.comprobar(sentencias=4, filas=3, objetos=2)
+
+def test_listar_asignaciones(tareas, sembrado):
+    with tareas.contador.medir() as contador:
+        r = tareas.cliente.get(f"/tareas/{sembrado['tareas'][1]}/asignaciones", params={"total": True})
+    assert r.status_code == 200 and len(r.json()) == MIEMBROS
+    contador.comprobar(sentencias=2, filas=MIEMBROS + 1, objetos=0)
+
+def test_listar_asignaciones_no_modificado(tareas, sembrado):
+    ruta = f"/tareas/{sembrado['tareas'][1]}/asignaciones"
+    r = tareas.cliente.get(ruta)
+    with tareas.contador.medir() as contador:
+        r = tareas.cliente.get(ruta, headers={"If-None-Match": r.headers["etag"]})
+    assert r.status_code == 304
+    contador.comprobar(sentencias=1, filas=MIEMBROS, objetos=0)
+
+def test_eliminar_asignacion(tareas, sembrado):
+    with tareas.contador.medir() as contador:
+        r = tareas.cliente.delete(f"/asignaciones/{sembrado['asignaciones'][0]}")
+    assert r.status_code == 204
+    contador.comprobar(sentencias=4, filas=3, objetos=2)
+
+def test_estadisticas_hogar(tareas, sembrado):
+    with tareas.contador.medir() as contador:
+        r = tareas.cliente.get(f"/hogares/{HOGAR}/estadisticas", params={"por_miembro": True})
+    assert r.status_code == 200
+    contador.comprobar(sentencias=1, filas=0)
+
+def test_listar_actividad(tareas, sembrado):
+    with tareas.contador.medir() as contador:
+        r = tareas.cliente.get(f"/hogares/{HOGAR}/actividad", params={"limite": 10})
+    assert r.status_code == 200 and len(r.json()["eventos"]) == 10
+    contador.comprobar(sentencias=1, filas=10)
+
+def test_calendario(tareas, sembrado):
+    with tareas.contador.medir() as contador:
+        r = tareas.cliente.get(f"/hogares/{HOGAR}/calendario.ics")
+    assert r.status_code == 200
+    # Versión del hogar y lectura de las tareas con fecha límite
+    contador.comprobar(sentencias=2, filas=1 + TAREAS // 2, objetos=0)
+    with tareas.contador.medir() as contador:
+        r = tareas.cliente.get(f"/hogares/{HOGAR}/calendario.ics", headers={"If-None-Match": r.headers["etag"]})
+    assert r.status_code == 304
+    contador.comprobar(sentencias=0, filas=0)
+
+def test_cache_calendario_generaciones(tareas):
+    cache = tareas.app.calendario.CacheCalendario(max_entradas=2)
+    generacion = cache.generacion("h1")
+    cache.invalidar(["h1"])  # Commit mientras se generaba el feed
+    cache.guardar("h1", 1, b"antiguo", generacion)
+    assert cache.vigente("h1") is None
+
+    # Solo se recuerdan los últimos hogares invalidados
+    generacion = cache.generacion("h5")
+    cache.invalidar(["h2", "h3", "h4", "h5", "h6", "h7"])
+    assert list(cache._generaciones) == ["h6", "h7"]
+    cache.guardar("h5", 1, b"antiguo", generacion)  # Olvidado, pero invalidado después de leer
+    assert cache.vigente("h5") is None
+    cache.guardar("h1", 2, b"nuevo", cache.generacion("h1"))
+    assert cache.vigente("h1").cuerpo == b"nuevo"
+
+def _fila_ingesta(id_: str) -> dict:
+    return {"id": id_, "titulo": id_, "hogar_id": "hogar-ingesta", "creador_id": "usuario-1", "completada": False}
+
+def test_ingesta_aisla_filas_erroneas(tareas, sembrado):
+    """Una fila que falla (id repetido) no arrastra al resto de su lote."""
+    escritor = type(tareas.app.escritor)(tareas.db_config.SessionLocal, pausa_reintento=0)
+    lote = [_fila_ingesta(f"ingesta-{i}") for i in range(4)]
+    lote.insert(2, _fila_ingesta(sembrado["tareas"][16]))
+    escritor._volcar(lote)
+    assert [escritor.estado(fila["id"]) for fila in lote] == ["persistida"] * 2 + ["error"] + ["persistida"] * 2
+    estadisticas = escritor.estadisticas()
+    assert (estadisticas["persistidas"], estadisticas["errores"], estadisticas["reintentos"]) == (4, 1, 1)
+
+def test_ingesta_cola_llena(tareas, monkeypatch):
+    escritor = type(tareas.app.escritor)(tareas.db_config.SessionLocal, max_pendientes=1)
+    monkeypatch.setattr(escritor, "iniciar", lambda: None)  # Sin hilo escritor: la cola no se vacía
+    escritor.encolar(_fila_ingesta("en-cola"))
+    with pytest.raises(tareas.app.ColaLlena):
+        escritor.encolar(_fila_ingesta("rechazada"))
+    assert escritor.estado("rechazada") is None
+
+    monkeypatch.setattr(tareas.app, "escritor", escritor)
+    r = tareas.cliente.post("/tareas/", params={"async": True}, json={"titulo": "Sin sitio", "hogar_id": HOGAR})
+    assert r.status_code == 503 and r.headers["retry-after"] == "1"
+    assert escritor.estadisticas()["rechazadas"] == 2
+
+def test_estado_ingesta_sin_estado_local(tareas, sembrado, monkeypatch):
+    """Otro proceso (u otro worker) la encoló: se responde desde la tabla."""
+    escritor = type(tareas.app.escritor)(tareas.db_config.SessionLocal)
+    monkeypatch.setattr(tareas.app, "escritor", escritor)
+    with tareas.contador.medir() as contador:
+        r = tareas.cliente.get(f"/ingesta/tareas/{sembrado['tareas'][0]}")
+    assert r.status_code == 200 and r.json()["estado"] == "persistida"
+    contador.comprobar(sentencias=1, filas=1, objetos=0)
+    assert tareas.cliente.get("/ingesta/tareas/no-existe").status_code == 404
+
+def test_ingesta_detener_vuelca_lo_encolado(tareas):
+    """Al apagar no se pierden filas ya aceptadas con 202."""
+    escritor = type(tareas.app.escritor)(tareas.db_config.SessionLocal, max_filas=1)
+    escritor.al_preparar.append(lambda db, filas: time.sleep(0.02))
+    filas = [_fila_ingesta(f"al-apagar-{i}") for i in range(5)]
+    for fila in filas:
+        escritor.encolar(fila)
+    assert escritor.detener() == 0
+    assert [escritor.estado(fila["id"]) for fila in filas] == ["persistida"] * 5
+
+def test_ingesta_detener_con_timeout(tareas, caplog):
+    escritor = type(tareas.app.escritor)(tareas.db_config.SessionLocal, max_filas=1)
+    seguir = threading.Event()
+    escritor.al_preparar.append(lambda db, filas: seguir.wait(5))
+    for i in range(3):
+        escritor.encolar(_fila_ingesta(f"sin-tiempo-{i}"))
+    hilo = escritor._hilo
+    # Una fila en curso y dos en la cola
+    assert escritor.detener(timeout=0.05) == 3
+    assert "3 tareas aceptadas quedan sin escribir" in caplog.text
+    seguir.set()
+    hilo.join()
+
+def test_eliminar_tarea_con_subtareas(tareas, sembrado):
+    with tareas.contador.medir() as contador:
+        r = tareas.cliente.delete(f"/tareas/{sembrado['arbol'][0]}")
+    assert r.status_code == 204
+    # El subárbol se lee una vez (con la subtarea de test_crear_subtarea) y se borra
+    # con sentencias por conjunto, no una por subtarea
+    contador.comprobar(sentencias=9, filas=SUBTAREAS + 3, objetos=0)
+
+def test_archivar_lote_comprueba_las_raices(tareas):
+    """Las candidatas que cambian antes de su lote (reabiertas o con una subtarea nueva) no se archivan."""
+    cliente = tareas.cliente
+    hogar = "hogar-archivo"
+    ids = [cliente.post("/tareas/", json={"titulo": f"Raíz {i}", "hogar_id": hogar}).json()["id"] for i in range(3)]
+    for id_ in ids:
+        cliente.put(f"/tareas/{id_}/completar")
+    cliente.patch(f"/tareas/{ids[0]}", json={"completada": False})
+    cliente.post("/tareas/", json={"titulo": "Hija pendiente", "hogar_id": hogar, "padre_id": ids[1]})
+    db = tareas.db_config.SessionLocal()
+    try:
+        movidas = tareas.app.archivo.archivar_lote(db, ids, datetime.now() + timedelta(days=1))
+        db.commit()
+    finally:
+        db.close()
+    assert movidas == 1
+    assert [cliente.get(f"/tareas/{id_}").status_code for id_ in ids] == [200, 200, 404]
+
+def _estadisticas(tareas) -> dict:
+    db = tareas.db_config.SessionLocal()
+    try:
+        return {
+            (fila.hogar_id, fila.usuario_id, fila.semana): (fila.completadas, fila.con_limite, fila.a_tiempo, fila.retraso_total)
+            for fila in db.query(tareas.models.EstadisticaSemanalDB) if fila.completadas
+        }
+    finally:
+        db.close()
+
+def test_recalcular_estadisticas(tareas, sembrado):
+    """La reconstrucción por lotes de hogares coincide con el mantenimiento incremental,
+    también con tareas archivadas, asignadas y completadas a tiempo."""
+    cliente = tareas.cliente
+    cliente.put(f"/tareas/{sembrado['tareas'][1]}/completar")  # Con asignaciones, fuera de plazo
+    a_tiempo = cliente.post("/tareas/", json={
+        "titulo": "A tiempo", "hogar_id": "hogar-a-tiempo", "fecha_limite": datetime(2099, 1, 1).isoformat()
+    }).json()["id"]
+    cliente.post(f"/tareas/{a_tiempo}/asignar", json={"tarea_id": a_tiempo, "usuario_id": "usuario-1"})
+    cliente.put(f"/tareas/{a_tiempo}/completar")
+    db = tareas.db_config.SessionLocal()
+    try:
+        assert tareas.app.archivo.archivar_tareas(db, dias=-1, pausa=0) > 0
+    finally:
+        db.close()
+    esperado = _estadisticas(tareas)
+    assert any(usuario_id for _, usuario_id, _ in esperado)
+    assert any(valores[2] for valores in esperado.values()) and any(valores[3] for valores in esperado.values())
+
+    db = tareas.db_config.SessionLocal()
+    try:
+        contadas = tareas.app.estadisticas.recalcular(db, tamano_lote=2)
+    finally:
+        db.close()
+    assert _estadisticas(tareas) == esperado
+    assert contadas == sum(valores[0] for (_, usuario_id, _), valores in esperado.items() if not usuario_id)
+
+# Recorridos y ordenaciones sin índice intencionados: {(ruta, tabla, problema): motivo}
+PERMITIDOS = {
+    ("GET /tareas/{tarea_id}/subtareas", "*", planes.FILESORT):
+        "Ordena por columnas de dos tablas; solo las filas del subárbol",
+    ("GET /hogares/{hogar_id}/estadisticas", "*", planes.FILESORT):
+        "Como mucho una fila por semana y miembro, leídas por clave primaria",
+}
+
+# Solo en SQLite, que compara las fechas como texto normalizado
+PERMITIDOS_SQLITE = {
+    ("GET /tareas/", "*", planes.FILESORT):
+        "Filtra por el índice del hogar, pero ordena por strftime(fecha_asignacion) (ver comun/paginacion.py)",
+}
+
+def test_planes_de_consulta(tareas):
+    planes.comprobar(tareas, PERMITIDOS, PERMITIDOS_SQLITE)
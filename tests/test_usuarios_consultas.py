@@ -0,0 +1,150 @@
+"""Cotas de sentencias SQL y filas cargadas por endpoint de GestUsuarios."""
+from datetime import datetime, timedelta
+
+import pytest
+
+import planes
+
+USUARIOS = 60
+CONTRASENA = "secreta123"
+
+@pytest.fixture(scope="module")
+def sembrado(usuarios):
+    """Usuarios con una sesión activa cada uno (el hash se calcula una sola vez)."""
+    models = usuarios.models
+    hash_ = usuarios.app.obtener_hashed_contraseña(CONTRASENA)
+    inicio = datetime(2026, 1, 1)
+    db = usuarios.db_config.SessionLocal()
+    ids = [f"u{i:04d}" for i in range(USUARIOS)]
+    db.add_all(
+        models.UsuarioDB(
+            id=id_, nombre=f"Usuario {i}", correo=f"usuario{i}@ejemplo.com",
+            contraseña=hash_, fecha_registro=inicio + timedelta(minutes=i)
+        )
+        for i, id_ in enumerate(ids)
+    )
+    db.add_all(
+        models.SessionDB(usuario_id=id_, token=f"token-{id_}", fecha_expiracion=inicio + timedelta(days=1))
+        for id_ in ids
+    )
+    db.commit()
+    db.close()
+    return ids
+
+def test_crear_usuario(usuarios, sembrado):
+    with usuarios.contador.medir() as contador:
+        r = usuarios.cliente.post("/usuarios/", json={
+            "nombre": "Nuevo", "correo": "nuevo@ejemplo.com", "contraseña": CONTRASENA
+        })
+    assert r.status_code == 201
+    contador.comprobar(sentencias=3, filas=1)
+
+def test_listar_usuarios(usuarios, sembrado):
+    with usuarios.contador.medir() as contador:
+        r = usuarios.cliente.get("/usuarios/", params={"limite": 20})
+    assert r.status_code == 200 and len(r.json()) == 20
+    # Una fila de más para saber si hay página siguiente; solo las columnas de
+    # la respuesta, como filas simples: ningún objeto ORM
+    contador.comprobar(sentencias=1, filas=21, objetos=0)
+
+def test_listar_usuarios_pagina_siguiente(usuarios, sembrado):
+    primera = usuarios.cliente.get("/usuarios/", params={"limite": 20})
+    with usuarios.contador.medir() as contador:
+        r = usuarios.cliente.get("/usuarios/", params={
+            "limite": 20, "cursor": primera.headers["x-siguiente-cursor"]
+        })
+    assert r.status_code == 200 and len(r.json()) == 20
+    contador.comprobar(sentencias=1, filas=21, objetos=0)
+
+def test_listar_usuarios_no_modificado(usuarios, sembrado):
+    r = usuarios.cliente.get("/usuarios/", params={"limite": 20, "total": True})
+    with usuarios.contador.medir() as contador:
+        r = usuarios.cliente.get("/usuarios/", params={"limite": 20, "total": True}, headers={"If-None-Match": r.headers["etag"]})
+    assert r.status_code == 304
+    # Total y página solo con ids, claves y versiones
+    contador.comprobar(sentencias=2, filas=22, objetos=0)
+
+def test_listar_usuarios_con_total(usuarios, sembrado):
+    with usuarios.contador.medir() as contador:
+        r = usuarios.cliente.get("/usuarios/", params={"limite": 20, "total": True})
+    assert r.status_code == 200 and "x-total-count" in r.headers
+    contador.comprobar(sentencias=2, filas=22, objetos=0)
+
+def test_exportar_usuarios(usuarios, sembrado):
+    with usuarios.contador.medir() as contador:
+        r = usuarios.cliente.get("/usuarios/", params={"formato": "ndjson"})
+    assert r.status_code == 200 and len(r.text.splitlines()) >= USUARIOS
+    contador.comprobar(sentencias=1, filas=USUARIOS + 1, objetos=0)
+
+def test_obtener_usuario(usuarios, sembrado):
+    with usuarios.contador.medir() as contador:
+        r = usuarios.cliente.get(f"/usuarios/{sembrado[0]}")
+    assert r.status_code == 200
+    contador.comprobar(sentencias=1, filas=1)
+
+def test_obtener_usuario_no_modificado(usuarios, sembrado):
+    r = usuarios.cliente.get(f"/usuarios/{sembrado[7]}")
+    with usuarios.contador.medir() as contador:
+        no_modificado = usuarios.cliente.get(f"/usuarios/{sembrado[7]}", headers={"If-None-Match": r.headers["etag"]})
+    assert no_modificado.status_code == 304
+    contador.comprobar(sentencias=1, filas=1, objetos=0)
+    usuarios.cliente.patch(f"/usuarios/{sembrado[7]}", json={"nombre": "Con otro nombre"})
+    r2 = usuarios.cliente.get(f"/usuarios/{sembrado[7]}", headers={"If-None-Match": r.headers["etag"]})
+    assert r2.status_code == 200 and r2.headers["etag"] != r.headers["etag"]
+
+def test_iniciar_sesion(usuarios, sembrado):
+    with usuarios.contador.medir() as contador:
+        r = usuarios.cliente.post("/login/", params={"correo": "usuario1@ejemplo.com", "contraseña": CONTRASENA})
+    assert r.status_code == 200
+    # Usuario, UPDATE de sesiones anteriores, INSERT (RETURNING) y refresh de la nueva
+    contador.comprobar(sentencias=4, filas=3, objetos=2)
+
+def test_iniciar_sesion_incorrecta(usuarios, sembrado):
+    with usuarios.contador.medir() as contador:
+        r = usuarios.cliente.post("/login/", params={"correo": "usuario2@ejemplo.com", "contraseña": "otra"})
+    assert r.status_code == 401
+    contador.comprobar(sentencias=1, filas=1)
+
+def test_cerrar_sesion(usuarios, sembrado):
+    sesion = usuarios.cliente.post(
+        "/login/", params={"correo": "usuario3@ejemplo.com", "contraseña": CONTRASENA}
+    ).json()
+    with usuarios.contador.medir() as contador:
+        r = usuarios.cliente.post("/logout/", params={"session_id": sesion["id"]})
+    assert r.status_code == 200
+    contador.comprobar(sentencias=2, filas=1)
+
+def test_actualizar_usuario(usuarios, sembrado):
+    with usuarios.contador.medir() as contador:
+        r = usuarios.cliente.put(f"/usuarios/{sembrado[4]}", json={
+            "nombre": "Cambiado", "correo": "cambiado4@ejemplo.com", "contraseña": CONTRASENA
+        })
+    assert r.status_code == 200
+    contador.comprobar(sentencias=4, filas=2)
+
+def test_actualizar_usuario_parcial(usuarios, sembrado):
+    with usuarios.contador.medir() as contador:
+        r = usuarios.cliente.patch(f"/usuarios/{sembrado[5]}", json={"nombre": "Parcial"})
+    assert r.status_code == 200
+    # UPDATE ... RETURNING, o UPDATE y SELECT si el driver no lo soporta
+    contador.comprobar(sentencias=2, filas=1)
+
+def test_eliminar_usuario(usuarios, sembrado):
+    with usuarios.contador.medir() as contador:
+        r = usuarios.cliente.delete(f"/usuarios/{sembrado[6]}")
+    assert r.status_code == 204
+    contador.comprobar(sentencias=3, filas=1)
+
+# Recorridos y ordenaciones sin índice intencionados: {(ruta, tabla, problema): motivo}
+PERMITIDOS = {}
+
+# Solo en SQLite, que compara las fechas como texto normalizado
+PERMITIDOS_SQLITE = {
+    ("GET /usuarios/", "Usuario", planes.RECORRIDO):
+        "Listado sin filtro ordenado por strftime(fecha_registro): SQLite no puede leerlo por el índice",
+    ("GET /usuarios/", "*", planes.FILESORT):
+        "Orden por strftime(fecha) para la paginación (ver comun/paginacion.py); en MySQL, por el índice",
+}
+
+def test_planes_de_consulta(usuarios):
+    planes.comprobar(usuarios, PERMITIDOS, PERMITIDOS_SQLITE)